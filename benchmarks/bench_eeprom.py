@@ -0,0 +1,43 @@
+"""
+EEPROM programmer: whole-device reads and page-sized writes of a simulated 24LC256. The
+simulated part has no write cycle time and the programmer is told so, so writes measure the
+host and the bus rather than the EEPROM.
+"""
+
+from common import benchmark, EEPROM_PART, EEPROM_PAGE_SIZE, EEPROM_SIZE
+
+from binho.programmers.eeprom import EEPROM
+
+WRITE_SIZE = 4096
+
+
+def _connect(session):
+
+    adapter = session.connect()
+    adapter.operationMode = "I2C"
+    eeprom = EEPROM(adapter.i2c, EEPROM_PART)
+    eeprom.write_cycle_length = 0
+    return eeprom
+
+
+@benchmark("eeprom.readBytes[32KiB]", operations=EEPROM_SIZE, unit="bytes")
+def eeprom_read_bytes(session):
+
+    eeprom = _connect(session)
+
+    def run():
+        eeprom.readBytes(0, EEPROM_SIZE - 1)
+
+    return run
+
+
+@benchmark("eeprom.writeBytes[4KiB]", operations=WRITE_SIZE // EEPROM_PAGE_SIZE, unit="pages")
+def eeprom_write_bytes(session):
+
+    eeprom = _connect(session)
+    data = bytes(index & 0xFF for index in range(WRITE_SIZE))
+
+    def run():
+        eeprom.writeBytes(0, data)
+
+    return run
@@ -0,0 +1,37 @@
+"""
+GPIO: setting and reading pin values through GPIOPin, one command per operation.
+"""
+
+from common import benchmark
+
+OPERATIONS = 200
+
+
+@benchmark("gpio.set", operations=OPERATIONS)
+def gpio_set(session):
+
+    adapter = session.connect()
+    adapter.operationMode = "IO"
+    pin = adapter.gpio_pins["IO1"]
+    pin.mode = "DOUT"
+
+    def run():
+        for index in range(OPERATIONS):
+            pin.value = index & 1
+
+    return run
+
+
+@benchmark("gpio.get", operations=OPERATIONS)
+def gpio_get(session):
+
+    adapter = session.connect()
+    adapter.operationMode = "IO"
+    pin = adapter.gpio_pins["IO2"]
+    pin.mode = "DIN"
+
+    def run():
+        for _ in range(OPERATIONS):
+            pin.value  # pylint: disable=pointless-statement
+
+    return run
@@ -0,0 +1,38 @@
+"""
+I2C: register reads from the simulated EEPROM with binhoI2CDriver.writeToReadFrom.
+"""
+
+from common import benchmark
+
+OPERATIONS = 100
+
+
+def _connect(session):
+
+    adapter = session.connect()
+    adapter.operationMode = "I2C"
+    return adapter.apis.i2c
+
+
+@benchmark("i2c.writeToReadFrom[16]", operations=OPERATIONS)
+def i2c_write_to_read_from(session):
+
+    i2c = _connect(session)
+
+    def run():
+        for _ in range(OPERATIONS):
+            i2c.writeToReadFrom(0x50, True, 16, 2, b"\x00\x00")
+
+    return run
+
+
+@benchmark("i2c.writeToReadFrom[256]", operations=OPERATIONS)
+def i2c_write_to_read_from_large(session):
+
+    i2c = _connect(session)
+
+    def run():
+        for _ in range(OPERATIONS):
+            i2c.writeToReadFrom(0x50, True, 256, 2, b"\x00\x00")
+
+    return run
@@ -0,0 +1,22 @@
+"""
+1-Wire: scratchpad reads from the simulated device with binho1WireDriver.exchangeBytes.
+"""
+
+from common import benchmark
+
+OPERATIONS = 100
+
+
+@benchmark("oneWire.exchangeBytes", operations=OPERATIONS)
+def one_wire_exchange_bytes(session):
+
+    adapter = session.connect()
+    adapter.operationMode = "1WIRE"
+    oneWire = adapter.apis.oneWire
+    oneWire.begin(0, True)
+
+    def run():
+        for _ in range(OPERATIONS):
+            oneWire.exchangeBytes("SKIP", b"\xbe", 9)
+
+    return run
@@ -0,0 +1,213 @@
+"""
+Compares the blocking SerialPortManager against the previous busy-polling loop,
+and binhoComms round trips through the threaded manager against direct I/O.
+
+All engines talk to a pty-backed fake device that answers every command with
+"-OK", so no hardware is needed. For each engine the script reports the CPU
+time burned while the connection sits idle and the command round-trip time.
+
+As part of the suite (benchmarks/run.py), the binhoComms round trips are measured against the
+simulated device instead.
+
+Usage:
+    python benchmarks/bench_serial_manager.py [--idle SECONDS] [--commands N]
+"""
+
+import argparse
+import os
+import queue
+import statistics
+import threading
+import time
+import tty
+
+import serial
+
+from binho.comms.comms import SerialPortManager, binhoComms
+
+from common import benchmark
+
+ROUND_TRIPS = 200
+
+
+class PollingSerialPortManager(SerialPortManager):
+    """ The previous engine, which polls in_waiting and the transmit queue in a tight loop. """
+
+    def _transceive(self, comport):
+
+        if comport.in_waiting > 0:
+            receivedData = comport.readline().strip()
+
+            if len(receivedData) > 0:
+                if receivedData[:1] == b"!":
+                    self.intQueue.put(receivedData.decode("utf-8"))
+                elif receivedData[:1] == b"-":
+                    self.rxdQueue.put(receivedData)
+
+        if not self.txdQueue.empty():
+            serialCommand = self.txdQueue.get()
+            if serialCommand is not None:
+                comport.write(serialCommand + b"\n")
+
+    def run(self):
+        comport = serial.Serial(self.serialPort, baudrate=1000000, timeout=0.025, write_timeout=0.05)
+        try:
+            while not self.stopper.is_set():
+                self._transceive(comport)
+        finally:
+            comport.close()
+
+
+class FakeDevice:
+    """ Minimal pty-backed device that acknowledges every command line. """
+
+    def __init__(self):
+        self._master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self._slave = slave
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        pending = b""
+        while True:
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                return
+            if not data:
+                return
+            pending += data
+            while b"\n" in pending:
+                _, pending = pending.split(b"\n", 1)
+                os.write(self._master, b"-OK\n")
+
+    def close(self):
+        os.close(self._master)
+        os.close(self._slave)
+
+
+def run_engine(engine, port, idle_seconds, commands):
+
+    txdQueue, rxdQueue, intQueue = queue.Queue(), queue.Queue(), queue.Queue()
+    stopper = threading.Event()
+    manager = engine(port, txdQueue, rxdQueue, intQueue, stopper)
+    manager.start()
+
+    # Make sure the port is open before we start measuring.
+    txdQueue.put(b"+PING")
+    rxdQueue.get(timeout=2)
+
+    cpuStart, wallStart = time.process_time(), time.perf_counter()
+    time.sleep(idle_seconds)
+    idleCpu = (time.process_time() - cpuStart) / (time.perf_counter() - wallStart)
+
+    roundTrips = []
+    for _ in range(commands):
+        start = time.perf_counter()
+        txdQueue.put(b"+PING")
+        rxdQueue.get(timeout=2)
+        roundTrips.append(time.perf_counter() - start)
+
+    if isinstance(manager, PollingSerialPortManager):
+        stopper.set()
+    else:
+        manager.stop()
+    manager.join()
+
+    result = summarize(roundTrips)
+    result["idle_cpu_percent"] = idleCpu * 100
+
+    return result
+
+
+def run_comms(port, commands, directIO):
+
+    comms = binhoComms(port, directIO=directIO)
+    comms.start()
+
+    comms.sendCommand("+PING")
+    comms.readResponse()
+
+    roundTrips = []
+    for _ in range(commands):
+        start = time.perf_counter()
+        comms.sendCommand("+PING")
+        comms.readResponse()
+        roundTrips.append(time.perf_counter() - start)
+
+    comms.close()
+
+    return summarize(roundTrips)
+
+
+def _comms_round_trips(session, directIO):
+
+    session.disconnect()
+    comms = session.own(binhoComms(session.port, directIO=directIO))
+    comms.start()
+
+    def run():
+        for _ in range(ROUND_TRIPS):
+            comms.sendCommand("+PING")
+            comms.readResponse()
+
+    return run
+
+
+@benchmark("comms.roundTrip[threaded]", operations=ROUND_TRIPS, unit="commands")
+def comms_round_trip_threaded(session):
+    return _comms_round_trips(session, directIO=False)
+
+
+@benchmark("comms.roundTrip[direct]", operations=ROUND_TRIPS, unit="commands")
+def comms_round_trip_direct(session):
+    return _comms_round_trips(session, directIO=True)
+
+
+def summarize(roundTrips):
+
+    return {
+        "round_trip_mean_us": statistics.mean(roundTrips) * 1e6,
+        "round_trip_median_us": statistics.median(roundTrips) * 1e6,
+        "round_trip_p99_us": sorted(roundTrips)[int(len(roundTrips) * 0.99) - 1] * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--idle", type=float, default=3.0, help="seconds to measure idle CPU use over")
+    parser.add_argument("--commands", type=int, default=2000, help="number of round trips to time")
+    args = parser.parse_args()
+
+    for name, engine in (("polling", PollingSerialPortManager), ("blocking", SerialPortManager)):
+        device = FakeDevice()
+        try:
+            result = run_engine(engine, device.port, args.idle, args.commands)
+        finally:
+            device.close()
+
+        print(
+            f"{name:>9}: idle CPU {result['idle_cpu_percent']:6.1f}%  "
+            f"round trip mean {result['round_trip_mean_us']:7.1f} us  "
+            f"median {result['round_trip_median_us']:7.1f} us  "
+            f"p99 {result['round_trip_p99_us']:7.1f} us"
+        )
+
+    for name, directIO in (("threaded", False), ("direct", True)):
+        device = FakeDevice()
+        try:
+            result = run_comms(device.port, args.commands, directIO)
+        finally:
+            device.close()
+
+        print(
+            f"{name:>9}: binhoComms round trip mean {result['round_trip_mean_us']:7.1f} us  "
+            f"median {result['round_trip_median_us']:7.1f} us  "
+            f"p99 {result['round_trip_p99_us']:7.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
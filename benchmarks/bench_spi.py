@@ -0,0 +1,94 @@
+"""
+SPI: SPIBus.transfer of short and buffer-sized exchanges, SPIDevice.readinto of a bulk
+read into a preallocated buffer, with IO0 as chip select, and a poll of eight devices on IO0
+and IO4 with one transfer each, and as one SPIBus.transaction().
+"""
+
+from common import benchmark
+
+from binho.interfaces.spiDevice import SPIDevice
+
+OPERATIONS = 100
+
+
+def _connect(session):
+
+    adapter = session.connect()
+    adapter.operationMode = "SPI"
+    return adapter.spi, adapter.gpio_pins["IO0"]
+
+
+@benchmark("spi.transfer[4]", operations=OPERATIONS)
+def spi_transfer(session):
+
+    spi, chipSelect = _connect(session)
+
+    def run():
+        for _ in range(OPERATIONS):
+            spi.transfer(b"\x9f", 4, chip_select=chipSelect)
+
+    return run
+
+
+@benchmark("spi.transfer[1024]", operations=OPERATIONS, unit="transfers")
+def spi_transfer_large(session):
+
+    spi, chipSelect = _connect(session)
+    command = b"\x03\x00\x00\x00"
+
+    def run():
+        for _ in range(OPERATIONS):
+            spi.transfer(command, 1024, chip_select=chipSelect)
+
+    return run
+
+
+@benchmark("spi.readinto[64KiB]", operations=64 * 1024, unit="bytes")
+def spi_readinto(session):
+
+    spi, chipSelect = _connect(session)
+    device = SPIDevice(spi, chipSelect)
+    buffer = bytearray(64 * 1024)
+
+    def run():
+        device.readinto(buffer, b"\x03\x00\x00\x00")
+
+    return run
+
+
+POLLED_DEVICES = 8
+
+
+def _poll_devices(session):
+
+    spi, chipSelect = _connect(session)
+    otherChipSelect = session.adapter.gpio_pins["IO4"]
+
+    return spi, [SPIDevice(spi, chipSelect), SPIDevice(spi, otherChipSelect)] * (POLLED_DEVICES // 2)
+
+
+@benchmark("spi.poll[8]", operations=OPERATIONS, unit="polls")
+def spi_poll(session):
+
+    spi, devices = _poll_devices(session)
+
+    def run():
+        for _ in range(OPERATIONS):
+            for device in devices:
+                spi.transfer(b"\x9f", 4, chip_select=device.chip_select, spi_mode=device.spi_mode)
+
+    return run
+
+
+@benchmark("spi.transaction[8]", operations=OPERATIONS, unit="polls")
+def spi_transaction(session):
+
+    spi, devices = _poll_devices(session)
+
+    def run():
+        for _ in range(OPERATIONS):
+            with spi.transaction() as transaction:
+                for device in devices:
+                    transaction.add(device, b"\x9f", 4)
+
+    return run
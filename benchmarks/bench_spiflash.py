@@ -0,0 +1,44 @@
+"""
+SPI flash programmer: bulk reads and page programs of the simulated 2 MiB flash.
+"""
+
+from common import benchmark
+
+from binho.programmers.spiFlash import SPIFlash
+
+READ_SIZE = 64 * 1024
+PROGRAM_PAGES = 16
+
+
+def _connect(session):
+
+    adapter = session.connect()
+    adapter.operationMode = "SPI"
+    return SPIFlash(adapter, chip_select_pin=adapter.gpio_pins["IO0"])
+
+
+@benchmark("spiFlash.readBytes[64KiB]", operations=READ_SIZE, unit="bytes")
+def spi_flash_read_bytes(session):
+
+    flash = _connect(session)
+
+    def run():
+        flash.readBytes(0, READ_SIZE)
+
+    return run
+
+
+@benchmark("spiFlash.pageProgram", operations=PROGRAM_PAGES, unit="pages")
+def spi_flash_page_program(session):
+
+    flash = _connect(session)
+    pageSize = flash.pageSizeBytes
+    data = [index & 0xFF for index in range(pageSize)]
+
+    def run():
+        # Programming can only clear bits, so every run writes over freshly erased pages.
+        session.flash.memory[: PROGRAM_PAGES * pageSize] = b"\xff" * (PROGRAM_PAGES * pageSize)
+        for page in range(PROGRAM_PAGES):
+            flash.pageProgram(page * pageSize, data)
+
+    return run
@@ -0,0 +1,47 @@
+"""
+Startup: the time to import the package in a fresh interpreter, and to open (and close) a
+connection to a device, both fully initialised and with fast=True.
+"""
+
+import subprocess
+import sys
+
+from common import REPOSITORY_ROOT, benchmark
+
+from binho import binhoHostAdapter
+
+
+@benchmark("startup.import", unit="imports")
+def startup_import(session):  # pylint: disable=unused-argument
+
+    # The interpreter's own startup is measured separately and taken off.
+    def interpreter():
+        subprocess.run([sys.executable, "-c", "pass"], cwd=REPOSITORY_ROOT, check=True)
+
+    # Run from the checkout, so that its package is the one imported.
+    def run():
+        subprocess.run([sys.executable, "-c", "import binho"], cwd=REPOSITORY_ROOT, check=True)
+
+    return run, interpreter
+
+
+@benchmark("startup.open", unit="opens")
+def startup_open(session):
+
+    session.disconnect()
+
+    def run():
+        binhoHostAdapter(port=session.port).close()
+
+    return run
+
+
+@benchmark("startup.open[fast]", unit="opens")
+def startup_open_fast(session):
+
+    session.disconnect()
+
+    def run():
+        binhoHostAdapter(port=session.port, fast=True).close()
+
+    return run
@@ -0,0 +1,147 @@
+"""
+Shared plumbing for the benchmark suite: the benchmark registry, the simulated device every
+benchmark runs against, and the timing and result bookkeeping used by run.py.
+"""
+
+import os
+import statistics
+import sys
+import time
+
+# The benchmarks run against the checkout they are in, whether or not the package is installed.
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_ROOT)
+
+from binho import binhoHostAdapter  # pylint: disable=wrong-import-position
+from binho.sim import (  # pylint: disable=wrong-import-position
+    SimulatedNova,
+    I2CEEPROM,
+    SPINORFlash,
+    OneWireDevice,
+    USB_FRAME_INTERVAL,
+)
+
+# Every benchmark registered with @benchmark, in registration order.
+BENCHMARKS = []
+
+EEPROM_PART = "24LC256"
+EEPROM_SIZE = 32768
+EEPROM_PAGE_SIZE = 64
+FLASH_SIZE = 2 * 1024 * 1024
+
+
+class Benchmark:
+    """ One registered benchmark: a setup function returning the callable to time. """
+
+    def __init__(self, name, setup, operations, unit):
+
+        self.name = name
+        self.setup = setup
+        self.operations = operations
+        self.unit = unit
+
+
+def benchmark(name, operations=1, unit="ops"):
+    """
+    Registers a benchmark. The decorated function receives a Session and returns a callable
+    performing `operations` operations; only the calls to that callable are timed. It may
+    instead return a (callable, baseline) pair, in which case the time of the baseline callable
+    is taken off every measurement.
+    """
+
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name, setup, operations, unit))
+        return setup
+
+    return register
+
+
+class Session:
+    """
+    A simulated Nova, with an EEPROM on I2C, an SPI flash with IO0 as chip select and a 1-Wire
+    device, plus a fresh binhoHostAdapter connected to it for every benchmark.
+
+    :param latency: Seconds the simulated adapter takes to process each command.
+    :param usbFrames: If True, responses are sent at USB full-speed frame boundaries.
+    """
+
+    def __init__(self, latency=0.0, usbFrames=False):
+
+        self.latency = latency
+        self.usbFrames = usbFrames
+        self.sim = SimulatedNova(latency=latency, frameInterval=USB_FRAME_INTERVAL if usbFrames else 0.0)
+        self.eeprom = self.sim.addPeripheral(I2CEEPROM(address=0x50, size=EEPROM_SIZE, pageSize=EEPROM_PAGE_SIZE))
+        self.flash = self.sim.addPeripheral(SPINORFlash(size=FLASH_SIZE, csPin=0))
+        self.oneWire = self.sim.addPeripheral(OneWireDevice())
+        self.adapter = None
+        self._resources = []
+
+    def __enter__(self):
+        self.sim.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disconnect()
+        self.sim.close()
+
+    @property
+    def port(self):
+        return self.sim.port
+
+    def connect(self):
+        """ Returns a new binhoHostAdapter on the simulated device, closing the previous one. """
+
+        self.disconnect()
+        self.adapter = binhoHostAdapter(port=self.sim.port)
+        return self.adapter
+
+    def own(self, resource):
+        """ Has the given connection, or anything else with a close() method, closed by disconnect(). """
+
+        self._resources.append(resource)
+        return resource
+
+    def disconnect(self):
+
+        if self.adapter is not None:
+            self.adapter.close()
+            self.adapter = None
+
+        while self._resources:
+            self._resources.pop().close()
+
+    def config(self):
+        return {"latency": self.latency, "usbFrames": self.usbFrames}
+
+
+def _time(function):
+
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def measure(run, operations, repeat, warmup=1, baseline=None):
+    """ Times `repeat` calls of run after `warmup` untimed ones; returns the result entry. """
+
+    for _ in range(warmup):
+        run()
+
+    times = []
+    for _ in range(repeat):
+        elapsed = _time(run)
+        if baseline is not None:
+            elapsed = max(0.0, elapsed - _time(baseline))
+        times.append(elapsed)
+
+    mean = statistics.mean(times)
+
+    return {
+        "operations": operations,
+        "repeat": repeat,
+        "mean": mean,
+        "min": min(times),
+        "max": max(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "opsPerSec": operations / mean if mean else 0.0,
+    }
@@ -0,0 +1,167 @@
+"""
+Runs the benchmark suite against a simulated Nova and stores the results as JSON.
+
+Every bench_*.py module next to this script registers its benchmarks with
+common.benchmark. Each benchmark gets a fresh connection to a simulated adapter
+(binho.sim.SimulatedNova) on a pseudo-terminal, so no hardware is needed; the
+adapter's per-command latency and USB framing can be set to approximate a real one.
+
+The package is imported from the checkout the script is in, so it needn't be installed.
+
+Results hold the package version, the interpreter, the platform, the git commit
+and the simulation settings, so that runs of different releases can be compared:
+
+    python benchmarks/run.py --output results-1.0.9.json
+    python benchmarks/run.py --output results-new.json --compare results-1.0.9.json
+
+With --compare, benchmarks at least --threshold slower than in the given results
+are reported as regressions, and the exit status is 1 if there are any.
+
+Usage:
+    python benchmarks/run.py [--latency SECONDS] [--usb-frames] [--repeat N]
+                             [--filter TEXT ...] [--output FILE] [--compare FILE]
+                             [--threshold FRACTION] [--list]
+"""
+
+import argparse
+import datetime
+import glob
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from common import BENCHMARKS, Session, measure
+
+import binho
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_benchmarks():
+
+    for path in sorted(glob.glob(os.path.join(BENCHMARK_DIRECTORY, "bench_*.py"))):
+        importlib.import_module(os.path.splitext(os.path.basename(path))[0])
+
+    return BENCHMARKS
+
+
+def git_commit():
+
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BENCHMARK_DIRECTORY, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return result.stdout.strip()
+
+
+def run_benchmarks(benchmarks, session, repeat):
+
+    results = {}
+
+    for entry in benchmarks:
+        run = entry.setup(session)
+        baseline = None
+        if isinstance(run, tuple):
+            run, baseline = run
+
+        try:
+            result = measure(run, entry.operations, repeat, baseline=baseline)
+        finally:
+            session.disconnect()
+
+        result["unit"] = entry.unit
+        results[entry.name] = result
+
+        print(
+            f"{entry.name:<30} {result['opsPerSec']:12.1f} {entry.unit}/s  "
+            f"mean {result['mean'] * 1e3:9.3f} ms  min {result['min'] * 1e3:9.3f} ms  "
+            f"stdev {result['stdev'] * 1e3:8.3f} ms"
+        )
+
+    return results
+
+
+def compare(results, previous, threshold):
+    """ Prints the change of every benchmark found in both runs; returns the names of the regressions. """
+
+    regressions = []
+
+    print()
+    print(f"Compared with {previous.get('version')} ({previous.get('commit') or 'unknown commit'}):")
+
+    for name, result in results.items():
+        if name not in previous["benchmarks"]:
+            continue
+
+        before = previous["benchmarks"][name]["opsPerSec"]
+        if not before:
+            continue
+
+        change = result["opsPerSec"] / before - 1
+        flag = ""
+        if change <= -threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+
+        print(f"{name:<30} {change * 100:+8.1f}%{flag}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the simulated adapter takes per command")
+    parser.add_argument("--usb-frames", action="store_true", help="send responses at USB full-speed frame boundaries")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs of every benchmark")
+    parser.add_argument("--filter", action="append", default=[], help="only run benchmarks whose name contains TEXT")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown reported as a regression (0.1 = 10%%)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args()
+
+    benchmarks = [
+        entry for entry in load_benchmarks() if not args.filter or any(text in entry.name for text in args.filter)
+    ]
+
+    if args.list:
+        for entry in benchmarks:
+            print(entry.name)
+        return 0
+
+    with Session(latency=args.latency, usbFrames=args.usb_frames) as session:
+        results = run_benchmarks(benchmarks, session, args.repeat)
+        config = session.config()
+
+    report = {
+        "version": binho.__version__,
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": dict(config, repeat=args.repeat),
+        "benchmarks": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as resultsFile:
+            json.dump(report, resultsFile, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as previousFile:
+            previous = json.load(previousFile)
+
+        if compare(results, previous, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,6 +18,8 @@ def binhoHostAdapter(**board_identifiers):
     Accepts the same arguments as pyusb's usb.find() method, allowing narrowing
     to a more specific binhoHostAdapter by e.g. serial number. Like usb.find(), providing
     find_all will return a list of all found devices.
+    Passing autoReconnect=True makes the connection survive the device being reset or
+    briefly unplugged; see binhoComms.enableAutoReconnect().
     Throws a DeviceNotFoundError if no device is avaiable and find_all is not set.
     """
     if not board_identifiers:
@@ -46,7 +48,7 @@ def binhoHostAdapterSingleton(serial=None):
     # If we already have a binhoHostAdapter with the given serial,
     if serial in active_connections:
         device = active_connections[serial]
-        if device.comms.still_connected():
+        if device.comms.isConnected():
             return device
 
     # Otherwise, try to create a new binhoHostAdapter instance.
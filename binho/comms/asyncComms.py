@@ -0,0 +1,389 @@
+import os
+import asyncio
+import collections
+
+import serial
+
+from binho.errors import DeviceError, DriverCapabilityError
+
+from .interrupts import InterruptDispatcher
+from .comms import (
+    SERIAL_TIMEOUT,
+    PIPELINE_DEPTH,
+    ERROR_RESPONSE,
+    LineFramer,
+    binhoComms,
+    _to_bytes,
+)
+
+
+class AsyncBinhoComms:  # pylint: disable=too-many-instance-attributes
+    """
+    asyncio transport for a Binho host adapter.
+
+    Instead of a thread per device, the serial port's file descriptor is registered with the
+    running event loop: responses are read with non-blocking os.read() calls when the port
+    becomes readable, and commands are written without blocking. One event loop can therefore
+    drive many adapters concurrently.
+
+    Like binhoComms, responses are matched to commands in FIFO order, and up to pipelineDepth
+    commands may be awaiting a response at once. Only event loops that support add_reader() on
+    file descriptors can be used, which excludes the Windows proactor loop.
+    """
+
+    def __init__(self, serialPort):
+
+        self.serialPort = serialPort
+        self.pipelineDepth = PIPELINE_DEPTH
+        self.interrupts = InterruptDispatcher()
+
+        self._comport = None
+        self._fd = None
+        self._loop = None
+        self._window = None
+        self._framer = LineFramer()
+        self._pending = collections.deque()
+        self._txdBuffer = bytearray()
+        self._exception = None
+        self._debug = os.getenv("BINHO_NOVA_DEBUG")
+        # See binhoComms.settingsEpoch.
+        self.settingsEpoch = 0
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Private functions
+
+    def _onReadable(self):
+
+        try:
+            receivedData = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._fail(e)
+            return
+
+        if not receivedData:
+            self._fail(DeviceError("Connection with device lost"))
+            return
+
+        for line in self._framer.feed(receivedData):
+            self._dispatchLine(line)
+
+    def _dispatchLine(self, receivedData):
+
+        lineType = receivedData[:1]
+
+        if lineType == b"!":
+            self.interrupts.put(receivedData.decode("utf-8"))
+
+        elif lineType == b"-":
+
+            # Every response belongs to the oldest command awaiting one. A future whose caller gave
+            # up waiting still holds its place, so that its late response is dropped here instead
+            # of being handed to the next command.
+            if self._pending:
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_result(receivedData)
+
+    def _onWritable(self):
+
+        try:
+            written = os.write(self._fd, self._txdBuffer)
+        except BlockingIOError:
+            written = 0
+        except OSError as e:
+            self._fail(e)
+            return
+
+        del self._txdBuffer[:written]
+
+        if not self._txdBuffer:
+            self._loop.remove_writer(self._fd)
+
+    def _write(self, data):
+
+        if self._exception is not None:
+            raise DeviceError(f"Connection with device lost: {self._exception}")
+
+        wasIdle = not self._txdBuffer
+        self._txdBuffer += data
+
+        if wasIdle:
+            self._onWritable()
+            if self._txdBuffer:
+                self._loop.add_writer(self._fd, self._onWritable)
+
+    def _fail(self, exception):
+
+        if self._exception is None:
+            self._exception = exception
+
+        self._detach()
+
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_result(ERROR_RESPONSE)
+
+    def _detach(self):
+
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._loop.remove_writer(self._fd)
+            self._fd = None
+
+    # Communication Management
+
+    async def open(self):
+        """ Opens the serial port and starts servicing it from the running event loop. """
+
+        if os.name == "nt":
+            raise DriverCapabilityError("AsyncBinhoComms requires an event loop that can watch file descriptors.")
+
+        self._loop = asyncio.get_running_loop()
+        self._window = asyncio.Semaphore(self.pipelineDepth)
+        self._exception = None
+        self.settingsEpoch += 1
+        self.interrupts.clearAll()
+
+        self._comport = serial.Serial(self.serialPort, baudrate=1000000, timeout=0, write_timeout=0)
+        self._fd = self._comport.fileno()
+        os.set_blocking(self._fd, False)
+
+        self._loop.add_reader(self._fd, self._onReadable)
+
+    def close(self):
+
+        self._detach()
+
+        if self._comport is not None:
+            self._comport.close()
+            self._comport = None
+
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_result(ERROR_RESPONSE)
+
+    def isConnected(self):
+
+        return self._fd is not None
+
+    def isCommError(self):
+
+        return self._exception is not None
+
+    # Public functions
+
+    async def submitCommand(self, command):
+        """
+        Sends a command without waiting for its response.
+
+        Waits only if pipelineDepth commands are already awaiting a response.
+
+        :param command: The command to send, without the line terminator.
+        :type command: Union[str, bytes]
+        :return: A future that resolves to the response line, as bytes.
+        :rtype: asyncio.Future
+        """
+
+        await self._window.acquire()
+
+        future = self._loop.create_future()
+        future.add_done_callback(lambda _: self._window.release())
+        self._pending.append(future)
+
+        if self._debug is not None:
+            print(command)
+
+        command = _to_bytes(command)
+        if command.startswith(b"+MODE"):
+            self.settingsEpoch += 1
+
+        try:
+            self._write(command + b"\n")
+        except DeviceError:
+            self._pending.remove(future)
+            future.cancel()
+            raise
+
+        return future
+
+    async def submitBatch(self, commands):
+        """
+        Sends a sequence of commands without waiting for their responses, in as few writes as the
+        pipelineDepth window allows.
+
+        :param commands: The commands to send, without line terminators.
+        :type commands: Iterable[Union[str, bytes]]
+        :return: One future per command, in the order given, as submitCommand() returns.
+        :rtype: List[asyncio.Future]
+        """
+
+        futures = []
+        unwritten = []
+        data = bytearray()
+
+        try:
+            for command in commands:
+
+                # What is queued is written before waiting for room, as the room comes from its responses.
+                if data and self._window.locked():
+                    self._write(bytes(data))
+                    data.clear()
+                    unwritten.clear()
+
+                await self._window.acquire()
+
+                future = self._loop.create_future()
+                future.add_done_callback(lambda _: self._window.release())
+                self._pending.append(future)
+                futures.append(future)
+                unwritten.append(future)
+
+                if self._debug is not None:
+                    print(command)
+
+                command = _to_bytes(command)
+                if command.startswith(b"+MODE"):
+                    self.settingsEpoch += 1
+
+                data += command + b"\n"
+
+            if data:
+                self._write(bytes(data))
+        except DeviceError:
+            for future in unwritten:
+                self._pending.remove(future)
+                future.cancel()
+            raise
+
+        return futures
+
+    async def execute(self, command, parse=None, raw=False, timeout=SERIAL_TIMEOUT):  # pylint: disable=too-many-arguments
+        """
+        Sends a command and waits for its response.
+
+        :param command: The command to send, without the line terminator.
+        :type command: Union[str, bytes]
+        :param parse: Optional callable applied to the response before it is returned.
+        :param raw: If True, parse receives a memoryview of the undecoded response line instead of a str.
+        :param timeout: Seconds to wait for the response.
+        :return: The response line (as a str), or the result of parse.
+        """
+
+        future = await self.submitCommand(command)
+        response = await self.waitResponse(future, timeout)
+
+        if parse is None:
+            return response.decode("utf-8")
+
+        if raw:
+            return parse(memoryview(response))
+
+        return parse(response.decode("utf-8"))
+
+    async def executeBatch(self, commands, timeout=SERIAL_TIMEOUT):
+        """
+        Sends a sequence of commands back to back and waits for all of their responses.
+
+        :return: The response lines, as strings, in the order the commands were given.
+        :rtype: List[str]
+        """
+
+        futures = [await self.submitCommand(command) for command in commands]
+        results = []
+
+        for future in futures:
+            response = await self.waitResponse(future, timeout)
+            results.append(response.decode("utf-8"))
+
+        return results
+
+    async def waitResponse(self, future, timeout=SERIAL_TIMEOUT):
+        """
+        Waits for the response to a command sent with submitCommand().
+
+        :return: The response line, as bytes, or ERROR_RESPONSE if none arrived within timeout.
+        :rtype: bytes
+        """
+
+        # The future is shielded from the cancellation of a timeout, so that it stays pending, and
+        # keeps its pipeline slot, until its late response turns up.
+        try:
+            response = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            response = ERROR_RESPONSE
+
+        if self._debug is not None:
+            print(response.decode("utf-8"))
+
+        return response
+
+    @classmethod
+    def checkDeviceSuccess(cls, ret_str):
+        return binhoComms.checkDeviceSuccess(ret_str)
+
+    def interruptCount(self):
+
+        return len(self.interrupts.pending())
+
+    def interruptCheck(self, interrupt):
+
+        return self.interrupts.check(interrupt)
+
+    def interruptClear(self, interrupt):
+
+        self.interrupts.clear(interrupt)
+
+    def interruptClearAll(self):
+
+        self.interrupts.clearAll()
+
+    def getInterrupts(self):
+
+        return set(self.interrupts.pending())
+
+    async def waitForInterrupt(self, interrupt, timeout=None):
+        """
+        Waits until the given interrupt is received, unless it is already pending, and clears it.
+
+        :return: The interrupt's event, or None if it didn't arrive in time.
+        :rtype: Optional[InterruptEvent]
+        """
+
+        subscription = self.interrupts.subscribe(interrupt, self._loop)
+
+        try:
+            if not self.interrupts.check(interrupt):
+                await asyncio.wait_for(subscription.get(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.interrupts.unsubscribe(subscription)
+
+        return self.interrupts.take(interrupt)
+
+    def addInterruptCallback(self, callback, interrupt=None):
+
+        self.interrupts.addCallback(callback, interrupt)
+
+    def removeInterruptCallback(self, callback):
+
+        self.interrupts.removeCallback(callback)
+
+    def subscribeInterrupts(self, interrupt=None):
+        """ Returns an asyncio.Queue that receives an InterruptEvent for every matching interrupt from now on. """
+
+        return self.interrupts.subscribe(interrupt, self._loop)
+
+    def unsubscribeInterrupts(self, subscription):
+
+        self.interrupts.unsubscribe(subscription)
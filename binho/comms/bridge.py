@@ -0,0 +1,368 @@
+import os
+import select
+import threading
+import time
+
+from binho.errors import DriverCapabilityError
+
+# Default capacity of the receive buffer used in UART bridge mode: about 10 seconds of data at 1 Mbaud.
+BRIDGE_BUFFER_SIZE = 1 << 20
+
+# Largest chunk moved between the pseudo-terminal and the bridge in one go.
+PTY_CHUNK_SIZE = 65536
+
+# How long the I/O engine waits for a full bridge buffer to be read before it starts dropping data.
+BRIDGE_BACKPRESSURE_TIMEOUT = 1.0
+
+
+class BridgeBuffer:  # pylint: disable=too-many-instance-attributes
+    """
+    Ring buffer holding the data received from the UART bridge until it is read.
+
+    The I/O engine stores whole serial reads at once; readers take as much as they want with
+    read(), readinto() or readline(). When the buffer is full, the I/O engine stops reading from
+    the serial port (which in turn makes USB flow control hold off the adapter) for up to
+    backpressureTimeout seconds, after which the data that doesn't fit is dropped and counted.
+    """
+
+    def __init__(self, capacity=BRIDGE_BUFFER_SIZE, backpressureTimeout=BRIDGE_BACKPRESSURE_TIMEOUT, refill=None):
+        """
+        :param refill: For transports without an I/O thread: called with a timeout, in seconds, to
+            read more data from the port while a reader is waiting. No backpressure is applied then,
+            as there is nobody else to drain the buffer.
+        """
+
+        self._ring = bytearray(capacity)
+        self._capacity = capacity
+        self._head = 0
+        self._size = 0
+        self._closed = False
+        self._refill = refill
+        self._backpressureTimeout = 0 if refill is not None else backpressureTimeout
+
+        self._lock = threading.Lock()
+        self._readable = threading.Condition(self._lock)
+        self._writable = threading.Condition(self._lock)
+
+        self.bytesReceived = 0
+        self.bytesRead = 0
+        self.overflowBytes = 0
+        self.overflows = 0
+        self.stalls = 0
+        self.highWater = 0
+
+    def __len__(self):
+
+        return self._size
+
+    # Producer side
+
+    def write(self, data):
+        """
+        Stores data received from the bridge, waiting for space if the buffer is full.
+
+        :return: The number of bytes stored; the rest was dropped.
+        :rtype: int
+        """
+
+        view = memoryview(data).cast("B")
+        stored = 0
+
+        with self._lock:
+
+            deadline = None
+
+            while len(view) > 0:
+
+                free = self._capacity - self._size
+
+                if free == 0:
+                    if deadline is None:
+                        deadline = time.monotonic() + self._backpressureTimeout
+                        self.stalls += 1
+
+                    remaining = deadline - time.monotonic()
+
+                    if self._closed or remaining <= 0 or not self._writable.wait(remaining):
+                        self.overflowBytes += len(view)
+                        self.overflows += 1
+                        break
+                    continue
+
+                count = min(free, len(view))
+                tail = (self._head + self._size) % self._capacity
+                first = min(count, self._capacity - tail)
+
+                self._ring[tail : tail + first] = view[:first]
+                self._ring[: count - first] = view[first:count]
+
+                self._size += count
+                stored += count
+                view = view[count:]
+
+            self.bytesReceived += stored
+            self.highWater = max(self.highWater, self._size)
+            self._readable.notify_all()
+
+        return stored
+
+    def close(self):
+        """ Wakes up everyone waiting on the buffer; data already stored can still be read. """
+
+        with self._lock:
+            self._closed = True
+            self._readable.notify_all()
+            self._writable.notify_all()
+
+    # Consumer side
+
+    def _wait(self, ready, timeout):
+
+        # Called with the lock held.
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while not ready() and not self._closed:
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+
+            if self._refill is None:
+                self._readable.wait(remaining)
+                continue
+
+            self._lock.release()
+            try:
+                self._refill(0.5 if remaining is None else min(remaining, 0.5))
+            finally:
+                self._lock.acquire()  # pylint: disable=consider-using-with
+
+        return ready()
+
+    def _take(self, destination):
+
+        # Called with the lock held.
+        count = min(len(destination), self._size)
+        first = min(count, self._capacity - self._head)
+
+        destination[:first] = self._ring[self._head : self._head + first]
+        destination[first:count] = self._ring[: count - first]
+
+        self._head = (self._head + count) % self._capacity
+        self._size -= count
+        self.bytesRead += count
+        self._writable.notify_all()
+
+        return count
+
+    def _find(self, byte):
+
+        # Called with the lock held. Returns the offset of byte from the head, or -1.
+        end = self._head + self._size
+
+        index = self._ring.find(byte, self._head, min(end, self._capacity))
+        if index >= 0:
+            return index - self._head
+
+        if end > self._capacity:
+            index = self._ring.find(byte, 0, end - self._capacity)
+            if index >= 0:
+                return index + self._capacity - self._head
+
+        return -1
+
+    def readinto(self, buffer, timeout=None):
+        """
+        Moves received data into buffer, waiting up to timeout seconds for some to arrive.
+
+        :return: The number of bytes stored in buffer, which is 0 on timeout.
+        :rtype: int
+        """
+
+        with memoryview(buffer) as view, view.cast("B") as destination:
+            if len(destination) == 0:
+                return 0
+
+            with self._lock:
+                if not self._wait(lambda: self._size > 0, timeout):
+                    return 0
+
+                return self._take(destination)
+
+    def read(self, size=-1, timeout=None):
+        """
+        Returns up to size received bytes (everything available if size is negative), waiting up to
+        timeout seconds for at least one byte to arrive.
+
+        :rtype: bytes
+        """
+
+        with self._lock:
+            if not self._wait(lambda: self._size > 0, timeout):
+                return b""
+
+            data = bytearray(self._size if size < 0 else min(size, self._size))
+            self._take(data)
+
+        return bytes(data)
+
+    def readline(self, timeout=None):
+        """
+        Returns the next line, including its newline, waiting up to timeout seconds for it to
+        complete. Like pyserial's readline(), a partial line is returned on timeout.
+
+        :rtype: bytes
+        """
+
+        with self._lock:
+            self._wait(lambda: self._find(b"\n") >= 0, timeout)
+
+            lineEnd = self._find(b"\n")
+            data = bytearray(self._size if lineEnd < 0 else lineEnd + 1)
+            self._take(data)
+
+        return bytes(data)
+
+    def stats(self):
+        """ Returns the buffer's throughput and overflow counters. """
+
+        with self._lock:
+            return {
+                "bytesReceived": self.bytesReceived,
+                "bytesRead": self.bytesRead,
+                "buffered": self._size,
+                "highWater": self.highWater,
+                "stalls": self.stalls,
+                "overflows": self.overflows,
+                "overflowBytes": self.overflowBytes,
+            }
+
+
+class PtyBridge:  # pylint: disable=too-many-instance-attributes
+    """
+    Exposes the UART bridge as a local pseudo-terminal, so that any serial tool (minicom, a
+    pyserial-based console...) can be pointed at the UART behind the host adapter.
+
+    Two threads move data in large chunks: one reads what the tool writes to the terminal and
+    sends it over the bridge, the other writes what arrives from the bridge to the terminal. If
+    nobody is reading the terminal, the bridge buffer fills up and backpressure applies as usual.
+    Only available on POSIX systems.
+    """
+
+    def __init__(self, comms, chunkSize=PTY_CHUNK_SIZE):
+
+        self.comms = comms
+        self.port = None
+        self.bytesToDevice = 0
+        self.bytesFromDevice = 0
+
+        self._chunkSize = chunkSize
+        self._master = None
+        self._slave = None
+        self._wakeup = None
+        self._threads = []
+        self._stopper = threading.Event()
+        self._started = None
+        self._stopped = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _toDevice(self):
+
+        while not self._stopper.is_set():
+
+            readable, _, _ = select.select([self._master, self._wakeup[0]], [], [])
+
+            if self._master not in readable:
+                continue
+
+            try:
+                data = os.read(self._master, self._chunkSize)
+            except OSError:
+                break
+
+            self.comms.writeBridgeUART(data)
+            self.bytesToDevice += len(data)
+
+    def _fromDevice(self):
+
+        buffer = bytearray(self._chunkSize)
+
+        with memoryview(buffer) as view:
+            while not self._stopper.is_set():
+
+                count = self.comms.readintoBridgeUART(view, 0.5)
+                written = 0
+
+                try:
+                    while written < count:
+                        written += os.write(self._master, view[written:count])
+                except OSError:
+                    break
+
+                self.bytesFromDevice += count
+
+    def start(self):
+        """ Creates the pseudo-terminal, whose path is then available as the port attribute. """
+
+        if os.name == "nt":
+            raise DriverCapabilityError("Pseudo-terminal bridges are not available on Windows.")
+
+        import tty  # pylint: disable=import-outside-toplevel
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+        # Used to wake the upstream thread out of select() when stopping.
+        self._wakeup = os.pipe()
+
+        self._stopper.clear()
+        self._started = time.monotonic()
+        self._stopped = None
+
+        self._threads = [
+            threading.Thread(target=self._toDevice, daemon=True),
+            threading.Thread(target=self._fromDevice, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+
+        if self._master is None:
+            return
+
+        self._stopper.set()
+        os.write(self._wakeup[1], b"\0")
+
+        for thread in self._threads:
+            thread.join()
+
+        for fd in (self._master, self._slave) + self._wakeup:
+            os.close(fd)
+
+        self._master = self._slave = self._wakeup = None
+        self._threads = []
+        self._stopped = time.monotonic()
+
+    def stats(self):
+        """ Returns the number of bytes moved in each direction, and the average rate in bytes per second. """
+
+        if self._started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._stopped or time.monotonic()) - self._started
+
+        return {
+            "bytesToDevice": self.bytesToDevice,
+            "bytesFromDevice": self.bytesFromDevice,
+            "seconds": elapsed,
+            "toDeviceRate": self.bytesToDevice / elapsed if elapsed else 0.0,
+            "fromDeviceRate": self.bytesFromDevice / elapsed if elapsed else 0.0,
+        }
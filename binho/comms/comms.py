@@ -1,17 +1,119 @@
 import os
 import enum
+import binascii
+import collections
 import threading
 import queue
+import re
 import signal
 import sys
+import time
 import serial
 
 from binho.errors import DeviceError
 
+from .interrupts import InterruptDispatcher
+from .manager import binhoDeviceManager, normalizeDeviceID
+from .hotplug import DeviceMonitor
+from .bridge import BridgeBuffer, PtyBridge
+from .trace import TraceRecorder
+from .stats import CommsStats, formatOpenMetrics
+
 SERIAL_TIMEOUT = 0.5
 
+# Default number of pipelined commands that may be awaiting a response at once.
+PIPELINE_DEPTH = 16
+
+# Response recorded for a command when the device did not answer.
+ERROR_RESPONSE = b"[ERROR]"
+
+# Commands used to find our place in the response stream again after a timeout, with the
+# prefix of the response each of them produces. Any one of them will do, as long as it's not
+# also among the commands whose responses are still outstanding.
+RESYNC_MARKERS = ((b"+ID", b"-ID"), (b"+FWVER", b"-FWVER"), (b"+HWVER", b"-HWVER"))
+
+# How long to wait for the device to answer a resync marker before giving up on the connection.
+RESYNC_TIMEOUT = 2.0
+
+# Put in the receive queue when the I/O thread fails, so that a reader waiting for a response
+# finds out about the lost connection right away rather than when it times out.
+CONNECTION_LOST = object()
+
+# How long, in seconds, an auto-reconnecting binhoComms waits for its device to come back.
+RECONNECT_TIMEOUT = 30.0
+
+# How often the ports are looked at again while waiting for the device to come back, in case
+# its return isn't reported by a DeviceMonitor event.
+RECONNECT_POLL_INTERVAL = 0.5
+
+# The commands configuring the adapter, which an auto-reconnecting binhoComms plays back after
+# reopening it. Group 1 is the setting a command changes: a later command with the same group 1
+# replaces the earlier one. Queries ("?") are not settings.
+SESSION_SETTINGS = re.compile(
+    rb"(\+MODE \d+|I2C\d+ (?:CLK|PULL|ADDR)|SPI\d+ (?:CLK|ORDER|MODE|TXBITS|BEGIN|WHRCS)"
+    rb"|IO\d+ (?:MODE|PWMFREQ|INT|VALUE)|1WIRE\d+ BEGIN|UART\d+ (?:BAUD|DATABITS|PARITY|STOPBITS|ESC))"
+    rb"(?= [^?]|$)"
+)
+
+# The commands ending a bus begun with a recorded BEGIN; group 1 is the bus.
+SESSION_ENDS = re.compile(rb"(SPI\d+|1WIRE\d+) END\b")
+
+
+class LineFramer:
+    """
+    Splits the byte stream received from a Binho host adapter into lines,
+    using a single reusable buffer for partial lines.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Adds received data to the buffer.
+
+        :return: Every line completed by this data, stripped of whitespace.
+        :rtype: List[bytes]
+        """
+
+        lineBuffer = self._buffer
+        lineBuffer += data
+
+        lineEnd = lineBuffer.find(b"\n")
+        if lineEnd < 0:
+            return []
+
+        # Frame every complete line in place, then discard them from the buffer in one go.
+        lines = []
+        lineStart = 0
+
+        with memoryview(lineBuffer) as view:
+            while lineEnd >= 0:
+                lines.append(bytes(view[lineStart:lineEnd]).strip())
+                lineStart = lineEnd + 1
+                lineEnd = lineBuffer.find(b"\n", lineStart)
+
+        del lineBuffer[:lineStart]
+
+        return lines
+
+    def drain(self):
+        """ Empties the buffer, returning any partial line it held. """
 
-class SerialPortManager(threading.Thread):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+
+        return data
+
+
+class SerialPortManager(threading.Thread):  # pylint: disable=too-many-instance-attributes
+    """
+    Background I/O engine for a serial connection to a Binho host adapter.
+
+    The manager thread blocks in the serial port read until data arrives, and a
+    companion writer thread blocks on the transmit queue until there is a
+    command to send. Neither thread wakes up while the connection is idle.
+    """
 
     serialPort = None
     txdQueue = None
@@ -19,6 +121,8 @@ class SerialPortManager(threading.Thread):
     intQueue = None
     stopper = None
     inBridgeMode = False
+    bridgeBuffer = None
+    trace = None
 
     def __init__(self, serialPort, txdQueue, rxdQueue, intQueue, stopper):  # pylint: disable=too-many-arguments
         super().__init__()
@@ -29,51 +133,298 @@ class SerialPortManager(threading.Thread):
         self.stopper = stopper
         self.exception = None
         self.daemon = True
+        self._comport = None
+        self._writer = None
 
-    def _transceive(self, comport: serial.Serial) -> None:
-        if self.inBridgeMode:
+    def _dispatchLine(self, receivedData):
 
-            if comport.in_waiting > 0:
-                receivedData = comport.read().decode("utf-8")
-                self.rxdQueue.put(receivedData)
+        lineType = receivedData[:1]
 
-            if not self.txdQueue.empty():
-                serialData = self.txdQueue.get()
-                comport.write(serialData.encode("utf-8"))
-        else:
+        if lineType == b"!":
+            if self.trace is not None:
+                self.trace.interrupt(receivedData)
+            self.intQueue.put(receivedData.decode("utf-8"))
+        elif lineType == b"-":
+            if self.trace is not None:
+                self.trace.received(receivedData)
+            self.rxdQueue.put(receivedData)
+
+    def _receive(self, comport: serial.Serial) -> None:
+
+        framer = LineFramer()
+
+        while not self.stopper.is_set():
+
+            # With no read timeout, this blocks until at least one byte arrives or stop() cancels the read.
+            receivedData = comport.read(max(1, comport.in_waiting))
+
+            if not receivedData:
+                continue
+
+            if self.inBridgeMode:
+                _bridge(self.bridgeBuffer, framer, receivedData)
+                continue
+
+            for line in framer.feed(receivedData):
+                self._dispatchLine(line)
+
+    def _transmit(self, comport: serial.Serial) -> None:
+
+        try:
+            while not self.stopper.is_set():
+
+                queued = [self.txdQueue.get()]
+
+                # Coalesce everything else that is already waiting into the same write() call.
+                while True:
+                    try:
+                        queued.append(self.txdQueue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                # None entries are only used to wake this thread up when stopping.
+                queued = [serialData for serialData in queued if serialData is not None]
+                if not queued:
+                    continue
+
+                if self.inBridgeMode:
+                    comport.write(b"".join(queued))
+                else:
+                    # Recorded first: the responses may well be received before write() returns.
+                    if self.trace is not None:
+                        self.trace.written(sum(serialData.count(b"\n") + 1 for serialData in queued))
+
+                    comport.write(b"\n".join(queued) + b"\n")
+
+        except Exception as e:  # pylint: disable=broad-except
+            self._fail(e)
 
-            if comport.in_waiting > 0:
-                receivedData = comport.readline().strip().decode("utf-8")
+    def _fail(self, exception):
 
-                if len(receivedData) > 0:
+        if self.exception is None:
+            self.exception = exception
+            self.rxdQueue.put(CONNECTION_LOST)
+        self.stop()
 
-                    if receivedData[0] == "!":
-                        self.intQueue.put(receivedData)
-                    elif receivedData[0] == "-":
-                        self.rxdQueue.put(receivedData)
+    def start(self):
+
+        # The port is opened here rather than on the I/O thread, so that a port that can't be
+        # opened raises an exception in the caller right away.
+        self._comport = serial.Serial(self.serialPort, baudrate=1000000, timeout=None, write_timeout=0.05)
 
-            if not self.txdQueue.empty():
-                serialCommand = self.txdQueue.get() + "\n"
-                comport.write(serialCommand.encode("utf-8"))
+        super().start()
 
     def run(self):
-        comport = None
+        comport = self._comport
         try:
-            comport = serial.Serial(self.serialPort, baudrate=1000000, timeout=0.025, write_timeout=0.05)
-            while not self.stopper.is_set():  # pylint: disable=too-many-nested-blocks
-                self._transceive(comport)
+            self._writer = threading.Thread(target=self._transmit, args=(comport,), daemon=True)
+            self._writer.start()
+
+            self._receive(comport)
         except Exception as e:  # pylint: disable=broad-except
-            self.stopper.set()
-            self.exception = e
+            self._fail(e)
             # print('Comm Error!')
         finally:
+            self.stop()
+            if self._writer is not None:
+                self._writer.join()
             if comport is not None:
                 comport.close()
 
+    def stop(self):
+        """ Stops both I/O threads without waiting for them to finish. """
+
+        self.stopper.set()
+
+        # Wake up the writer, which may be blocked waiting for a command...
+        self.txdQueue.put(None)
+
+        # ... and the reader, which may be blocked waiting for data or for room in the bridge buffer.
+        if self.bridgeBuffer is not None:
+            self.bridgeBuffer.close()
+
+        if self._comport is not None:
+            try:
+                self._comport.cancel_read()
+            except Exception:  # pylint: disable=broad-except
+                pass
+
+    def send(self, data):
+        """ Queues data for the writer thread, which terminates it with a newline outside of bridge mode. """
+
+        self.txdQueue.put(data, timeout=SERIAL_TIMEOUT)
+
+    def receive(self, timeout=SERIAL_TIMEOUT):
+        """
+        Returns the next response line, waiting up to timeout seconds.
+
+        :raises queue.Empty: if nothing was received in time, or the connection was lost
+        """
+
+        receivedData = self.rxdQueue.get(timeout=timeout)
+
+        if receivedData is CONNECTION_LOST:
+            # Leave it for whoever reads next, too.
+            self.rxdQueue.put(receivedData)
+            raise queue.Empty
+
+        return receivedData
+
     def get_exception(self):
         return self.exception
 
-    def startUartBridge(self):
+    def startUartBridge(self, bridgeBuffer):
+        self.bridgeBuffer = bridgeBuffer
+        self.inBridgeMode = True
+
+    def stopUartBridge(self):
+        self.inBridgeMode = False
+
+
+class DirectSerialPort:
+    """
+    Threadless alternative to SerialPortManager.
+
+    Commands are written and responses are read by the calling thread itself, straight
+    from the serial port, which saves two queue handoffs and a thread switch per command.
+    Interrupt lines are only received while waiting for a response, or in waitForInterrupt().
+    This is intended for single-threaded use: only one thread may talk to the device.
+    """
+
+    inBridgeMode = False
+    bridgeBuffer = None
+    trace = None
+
+    def __init__(self, serialPort, intQueue, stopper):
+
+        self.serialPort = serialPort
+        self.intQueue = intQueue
+        self.stopper = stopper
+        self.exception = None
+        self._comport = None
+        self._framer = LineFramer()
+        self._received = collections.deque()
+
+    def _fail(self, exception):
+
+        if self.exception is None:
+            self.exception = exception
+        self.stop()
+
+    def _read(self, timeout):
+
+        comport = self._comport
+
+        # Changing the timeout reconfigures the port, so only do it when it actually changes.
+        if comport.timeout != timeout:
+            comport.timeout = timeout
+
+        receivedData = comport.read(max(1, comport.in_waiting))
+
+        if self.inBridgeMode:
+            _bridge(self.bridgeBuffer, self._framer, receivedData)
+            return
+
+        for line in self._framer.feed(receivedData):
+
+            lineType = line[:1]
+
+            if lineType == b"!":
+                if self.trace is not None:
+                    self.trace.interrupt(line)
+                self.intQueue.put(line.decode("utf-8"))
+            elif lineType == b"-":
+                if self.trace is not None:
+                    self.trace.received(line)
+                self._received.append(line)
+
+    def start(self):
+
+        self.stopper.clear()
+        self._comport = serial.Serial(
+            self.serialPort, baudrate=1000000, timeout=SERIAL_TIMEOUT, write_timeout=0.05
+        )
+
+    def is_alive(self):
+
+        return self._comport is not None and not self.stopper.is_set()
+
+    def join(self, timeout=None):  # pylint: disable=unused-argument
+        pass
+
+    def stop(self):
+
+        self.stopper.set()
+
+        if self._comport is not None:
+            try:
+                self._comport.close()
+            except Exception:  # pylint: disable=broad-except
+                pass
+            self._comport = None
+
+    def send(self, data):
+        """ Writes data to the device, terminating it with a newline outside of bridge mode. """
+
+        if not self.is_alive():
+            return
+
+        try:
+            if self.inBridgeMode:
+                self._comport.write(data)
+            else:
+                if self.trace is not None:
+                    self.trace.written(data.count(b"\n") + 1)
+
+                self._comport.write(data + b"\n")
+        except Exception as e:  # pylint: disable=broad-except
+            self._fail(e)
+
+    def receive(self, timeout=SERIAL_TIMEOUT):
+        """
+        Returns the next response line, waiting up to timeout seconds.
+
+        :raises queue.Empty: if nothing was received in time
+        """
+
+        if self._received:
+            return self._received.popleft()
+
+        deadline = time.monotonic() + timeout
+
+        while self.is_alive():
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                self._read(timeout if remaining == timeout else remaining)
+            except Exception as e:  # pylint: disable=broad-except
+                self._fail(e)
+                break
+
+            if self._received:
+                return self._received.popleft()
+
+        raise queue.Empty
+
+    def poll(self, timeout):
+        """ Reads whatever arrives within timeout seconds, dispatching any interrupts received. """
+
+        if not self.is_alive():
+            return
+
+        try:
+            self._read(timeout)
+        except Exception as e:  # pylint: disable=broad-except
+            self._fail(e)
+
+    def get_exception(self):
+        return self.exception
+
+    def startUartBridge(self, bridgeBuffer):
+        self.bridgeBuffer = bridgeBuffer
         self.inBridgeMode = True
 
     def stopUartBridge(self):
@@ -100,7 +451,7 @@ class SignalHandler:
         This will be called by the python signal module
         https://docs.python.org/3/library/signal.html#signal.signal
         """
-        self.stopper.set()
+        self.manager.stop()
 
         self.manager.join()
 
@@ -108,7 +459,7 @@ class SignalHandler:
 
     def sendStop(self):
 
-        self.stopper.set()
+        self.manager.stop()
 
         self.manager.join()
 
@@ -121,18 +472,100 @@ class oneWireCmd(enum.Enum):
     SKIP = "SKIP"
 
 
-class binhoComms:
-    def __init__(self, serialPort):
+class CommandFuture:
+    """
+    Handle for the response to a command submitted with binhoComms.submitCommand().
+
+    The device answers commands strictly in the order they were sent, so futures are
+    resolved in FIFO order: waiting on one future also collects the responses to every
+    command that was submitted before it.
+    """
+
+    def __init__(self, comms, command, parse=None, raw=False):  # pylint: disable=too-many-arguments
+
+        self.command = command
+        self._comms = comms
+        self._parse = parse
+        self._raw = raw
+        self._response = None
+        self._done = False
+        self._submittedAt = 0
+
+    def done(self):
+        """ Returns True once the response to this command has been received. """
+        return self._done
+
+    def responseBytes(self):
+        """ Returns the response line as bytes, waiting for it if it hasn't arrived yet. """
+
+        if not self._done:
+            self._comms._resolveUntil(self)  # pylint: disable=protected-access
+
+        return self._response
+
+    def response(self):
+        """ Returns the response line as a string, waiting for it if it hasn't arrived yet. """
+
+        return self.responseBytes().decode("utf-8")
+
+    def result(self):
+        """
+        Returns the response, passed through the parser supplied when the command was submitted.
+        Parsers raise DeviceError for unexpected responses, exactly as the synchronous driver calls do.
+        Raw parsers are handed a memoryview of the response line rather than a decoded string.
+        """
+
+        if self._parse is None:
+            return self.response()
+
+        if self._raw:
+            return self._parse(memoryview(self.responseBytes()))
+
+        return self._parse(self.response())
+
+    def _setResponse(self, response):
+
+        self._response = response
+        self._done = True
+
+
+class binhoComms:  # pylint: disable=too-many-instance-attributes
+    def __init__(self, serialPort, directIO=False):
 
         self.serialPort = serialPort
+        self.directIO = directIO
+        self.pipelineDepth = PIPELINE_DEPTH
         self.handler = None
         self.manager = None
-        self.interrupts = None
+        self.interrupts = InterruptDispatcher()
+        self.bridge = None
+        self.bridgePty = None
         self._stopper = None
         self._txdQueue = None
         self._rxdQueue = None
-        self._intQueue = None
+        self._pending = collections.deque()
+        self._unread = collections.deque()
         self._debug = os.getenv("BINHO_NOVA_DEBUG")
+        self.trace = None
+        self._tracePath = os.getenv("BINHO_NOVA_TRACE")
+        self.statsCollector = None
+        # Read by the profiling hooks in binho.hooks to report each operation's commands.
+        self.commandsSent = 0
+        self.lastCommand = None
+        self.lastResponse = None
+        # The last command acknowledged for each setting, see SESSION_SETTINGS; played back by _reconnect().
+        self.sessionState = collections.OrderedDict()
+        self.autoReconnect = False
+        self.reconnectTimeout = RECONNECT_TIMEOUT
+        self.deviceID = None
+        self.reconnects = 0
+        # Incremented whenever the device may have lost or changed settings behind the drivers'
+        # backs: the port was (re)opened, the operation mode was set, or a resync lost track of
+        # which commands were carried out. Drivers that cache settings drop them when it changes.
+        self.settingsEpoch = 0
+
+        if os.getenv("BINHO_NOVA_STATS"):
+            self.enableStats()
 
     # Destructor
     def __del__(self):
@@ -143,39 +576,352 @@ class binhoComms:
             except Exception:  # pylint: disable=broad-except
                 pass
 
+        if self.trace is not None:
+            self.trace.close()
+
     # Private functions
 
-    def _checkInterrupts(self):
+    def _connected(self):
 
-        while not self._intQueue.empty():
-            self.interrupts.add(self._intQueue.get())
+        return self.manager.is_alive() and not self.manager.get_exception()
 
-    # Public functions
+    def _receiveResponse(self):
 
-    def sendCommand(self, command):
-        if self._debug is not None:
-            print(command)
-        self._txdQueue.put(command, timeout=SERIAL_TIMEOUT)
+        if self._connected():
+            try:
+                return self.manager.receive(SERIAL_TIMEOUT)
+            except queue.Empty:
+                pass
 
-    def readResponse(self):
+            if self._connected():
+                if self.trace is not None:
+                    self.trace.timeout()
+                if self.statsCollector is not None:
+                    self.statsCollector.timeouts += 1
+                self._recover()
+                return ERROR_RESPONSE
+
+        # The connection was lost. The outstanding commands are sent again once it's reopened,
+        # so the response being waited for may still turn up.
+        if self.autoReconnect and self._reconnect():
+            return self._receiveResponse()
+
+        # print('Connection with Device Lost!')
+        self.handler.sendStop()
+
+        return ERROR_RESPONSE
+
+    def _recover(self):
+
+        # The late response to the command that timed out may still turn up, followed by the
+        # responses to everything sent after it, so none of the outstanding commands can be
+        # matched to a response anymore: fail them all and skip past their responses.
+        staleCommands = [_to_bytes(future.command) for future in self._pending]
+        self.settingsEpoch += 1
+
+        for future in self._pending:
+            future._setResponse(ERROR_RESPONSE)  # pylint: disable=protected-access
+        self._pending.clear()
+
+        if self._resync(staleCommands):
+            if self.trace is not None:
+                self.trace.resynchronised()
+            if self.statsCollector is not None:
+                self.statsCollector.resyncs += 1
+        elif not (self.autoReconnect and self._reconnect()):
+            # print('Connection with Device Lost!')
+            self.handler.sendStop()
+
+    def _recordSetting(self, command):
+
+        command = _to_bytes(command)
+        setting = SESSION_SETTINGS.match(command)
+
+        if setting is not None:
+            if command.startswith(b"+MODE"):
+                self.settingsEpoch += 1
+
+                # Changing the operation mode ends the busses begun before and
+                # reconfigures the IO pins, so their earlier settings are stale.
+                stale = [key for key in self.sessionState if key.endswith(b" BEGIN") or key.startswith(b"IO")]
+                for key in stale:
+                    del self.sessionState[key]
+
+            self.sessionState[setting.group(1)] = command
+            self.sessionState.move_to_end(setting.group(1))
+            return
+
+        ended = SESSION_ENDS.match(command)
+
+        if ended is not None:
+            self.sessionState.pop(ended.group(1) + b" BEGIN", None)
+
+    def _findDevice(self, previousPort):
+
+        binhoDeviceManager.refreshPorts()
+
+        if self.deviceID is None:
+            return previousPort if previousPort in binhoDeviceManager.listAvailablePorts() else None
+
+        # The device usually comes back on the port it left; only look elsewhere if it isn't there.
+        if binhoDeviceManager.identify(previousPort) == self.deviceID:
+            return previousPort
+
+        return binhoDeviceManager().getPortByDeviceID(self.deviceID)
+
+    def _reconnect(self):
+        """
+        Reopens the device after the connection was lost, on whichever port it comes back, waiting
+        up to reconnectTimeout seconds for it. The settings in sessionState are played back, with
+        the operation mode first, and the commands still awaiting a response are sent again.
+
+        :return: True if the device was reopened, False if it didn't come back in time.
+        :rtype: bool
+        """
+
+        deadline = time.monotonic() + self.reconnectTimeout
+        previousPort = self.serialPort
+
+        self.handler.sendStop()
+        binhoDeviceManager.forgetPort(previousPort)
+
+        monitor = DeviceMonitor(probe=False)
+        monitor.start()
+
+        try:
+            while True:
+                attempted = time.monotonic()
+                port = self._findDevice(previousPort)
+
+                if port is not None:
+                    try:
+                        self.serialPort = port
+                        self._open()
+                        if self._restoreSession():
+                            break
+                    except (OSError, serial.SerialException):
+                        pass
+
+                    self.handler.sendStop()
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+
+                monitor.wait("add", timeout=min(remaining, RECONNECT_POLL_INTERVAL), since=attempted)
+        finally:
+            monitor.stop()
+
+        self.reconnects += 1
+        if self.statsCollector is not None:
+            self.statsCollector.reconnects += 1
 
-        result = "[ERROR]"
+        return True
 
-        if self.manager.is_alive():
-            if not self.manager.get_exception():
+    def _restoreSession(self):
+
+        # A device that was reset has lost its settings; put the operation mode back before the rest.
+        settings = sorted(self.sessionState.values(), key=lambda command: not command.startswith(b"+MODE"))
+
+        if settings:
+            self.manager.send(b"\n".join(settings))
+
+            for _ in settings:
                 try:
-                    result = self._rxdQueue.get(timeout=SERIAL_TIMEOUT)
+                    self.manager.receive(RESYNC_TIMEOUT)
                 except queue.Empty:
-                    # print('Connection with Device Lost!')
-                    self.handler.sendStop()
+                    return False
+
+        # The commands sent before the connection was lost may or may not have been carried out;
+        # they are sent again, so each of them is carried out at least once.
+        if self._pending:
+            self.manager.send(b"\n".join(_to_bytes(future.command) for future in self._pending))
+
+        return self._connected()
+
+    def _resync(self, staleCommands):
+        """
+        Sends a marker command and discards everything received before its response.
+
+        :return: True if the marker's response was found, False if the device stopped answering.
+        :rtype: bool
+        """
+
+        for marker, reply in RESYNC_MARKERS:
+            if not any(command.startswith(marker) for command in staleCommands):
+                break
         else:
-            # print('Connection with Device Lost!')
-            self.handler.sendStop()
+            return False
+
+        self.manager.send(marker)
+        deadline = time.monotonic() + RESYNC_TIMEOUT
+
+        while self.manager.is_alive():
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                receivedData = self.manager.receive(remaining)
+            except queue.Empty:
+                break
+
+            if receivedData.startswith(reply):
+                return True
+
+        return False
+
+    def _resolveNext(self):
+
+        future = self._pending[0]
+        response = self._receiveResponse()
+
+        # After a timeout, every outstanding future has already been failed and dropped.
+        if not future.done():
+            self._pending.popleft()
+            future._setResponse(response)  # pylint: disable=protected-access
+            self.lastResponse = response
+
+            if response[:3] == b"-OK":
+                self._recordSetting(future.command)
+
+            if self.trace is not None:
+                self.trace.delivered()
+            if self.statsCollector is not None:
+                self.statsCollector.answered(future.command, response, future._submittedAt)  # pylint: disable=protected-access
+
+    def _resolveUntil(self, future):
+
+        while not future.done() and self._pending:
+            self._resolveNext()
+
+    # Public functions
+
+    def submitCommand(self, command, parse=None, raw=False):
+        """
+        Sends a command without waiting for its response, and returns a CommandFuture for it.
+
+        Up to pipelineDepth commands may be awaiting a response at once; submitting another
+        one first collects the oldest outstanding response. This lets a caller issue a run of
+        commands with roughly one USB round trip of latency instead of one per command.
+
+        :param command: The command to send, without the line terminator. Commands already
+            assembled as bytes are written as-is, with no encoding step.
+        :type command: Union[str, bytes]
+        :param parse: Optional callable applied to the response line by CommandFuture.result().
+        :type parse: Callable[[str], Any]
+        :param raw: If True, parse receives a memoryview of the undecoded response line instead of a str.
+        :type raw: bool
+        :return: A handle for the command's response.
+        :rtype: CommandFuture
+        """
+
+        while len(self._pending) >= self.pipelineDepth:
+            self._resolveNext()
+
+        future = CommandFuture(self, command, parse, raw)
+        self._pending.append(future)
+        self.commandsSent += 1
+        self.lastCommand = command
+
+        if self._debug is not None:
+            print(_to_str(command))
+        if self.trace is not None:
+            self.trace.command(_to_bytes(command))
+        if self.statsCollector is not None:
+            self.statsCollector.submitted(command, len(self._pending))
+            future._submittedAt = time.perf_counter_ns()  # pylint: disable=protected-access
+        self.manager.send(_to_bytes(command))
+
+        return future
+
+    def submitBatch(self, commands, parse=None, raw=False):
+        """
+        Sends a sequence of commands using as few write() calls as possible, without waiting for
+        their responses.
+
+        Commands are packed into a single buffer per write, up to the free space in the
+        pipelineDepth window; longer batches are written in window-sized pieces as earlier
+        responses are collected.
+
+        :param commands: The commands to send, without line terminators.
+        :type commands: Iterable[Union[str, bytes]]
+        :param parse: Optional response parser applied to every command, or a sequence holding
+            one parser (or None) per command.
+        :param raw: If True, the parsers receive a memoryview of the undecoded response line, as with submitCommand().
+        :return: One CommandFuture per command, in the order given.
+        :rtype: List[CommandFuture]
+        """
+
+        commands = [_to_bytes(command) for command in commands]
+
+        if parse is None or callable(parse):
+            parsers = [parse] * len(commands)
+        else:
+            parsers = list(parse)
+
+        futures = []
+        start = 0
+
+        while start < len(commands):
+
+            while len(self._pending) >= self.pipelineDepth:
+                self._resolveNext()
+
+            end = min(start + self.pipelineDepth - len(self._pending), len(commands))
+
+            for command, parser in zip(commands[start:end], parsers[start:end]):
+                future = CommandFuture(self, command, parser, raw)
+                self._pending.append(future)
+                futures.append(future)
+                self.commandsSent += 1
+                self.lastCommand = command
+
+                if self._debug is not None:
+                    print(_to_str(command))
+                if self.trace is not None:
+                    self.trace.command(command)
+                if self.statsCollector is not None:
+                    self.statsCollector.submitted(command, len(self._pending))
+                    future._submittedAt = time.perf_counter_ns()  # pylint: disable=protected-access
+
+            self.manager.send(b"\n".join(commands[start:end]))
+            start = end
+
+        return futures
+
+    def sendCommand(self, command):
+        self._unread.append(self.submitCommand(command))
+
+    def sendBatch(self, commands):
+        """
+        Sends a sequence of commands in as few write() calls as possible.
+        Collect the responses afterwards with readResponses().
+        """
+        self._unread.extend(self.submitBatch(commands))
+
+    def readResponse(self):
+
+        result = self.readResponseBytes().decode("utf-8")
 
         if self._debug is not None:
             print(result)
         return result
 
+    def readResponseBytes(self):
+        """ Reads the next response line as bytes, skipping the str decode done by readResponse(). """
+
+        if self._unread:
+            return self._unread.popleft().responseBytes()
+
+        return self._receiveResponse()
+
+    def readResponses(self, count):
+        """ Reads the responses to the next count commands sent with sendCommand() or sendBatch(). """
+
+        return [self.readResponse() for _ in range(count)]
+
     @classmethod
     def checkDeviceSuccess(cls, ret_str):
         if ret_str == "-OK":
@@ -191,40 +937,154 @@ class binhoComms:
 
         self.handler = None
         self.manager = None
-        self.interrupts = None
         self._stopper = None
         self._txdQueue = None
         self._rxdQueue = None
-        self._intQueue = None
+        self._pending.clear()
+        self._unread.clear()
+        self.sessionState.clear()
 
-        comport = serial.Serial(self.serialPort, baudrate=1000000, timeout=0.025, write_timeout=0.05)
-        comport.close()
+        self.interrupts.clearAll()
 
-        self.interrupts = set()
+        self._open()
 
+    def _open(self):
+
+        self.settingsEpoch += 1
         self._stopper = threading.Event()
         self._txdQueue = queue.Queue()
         self._rxdQueue = queue.Queue()
-        self._intQueue = queue.Queue()
 
         # we need to keep track of the workers but not start them yet
         # workers = [StatusChecker(url_queue, result_queue, stopper) for i in range(num_workers)]
-        self.manager = SerialPortManager(
-            self.serialPort, self._txdQueue, self._rxdQueue, self._intQueue, self._stopper,
-        )
-
-        # create our signal handler and connect it
-        self.handler = SignalHandler(self._stopper, self.manager)
-        signal.signal(signal.SIGINT, self.handler)
+        if self.directIO:
+            self.manager = DirectSerialPort(self.serialPort, self.interrupts, self._stopper)
+        else:
+            self.manager = SerialPortManager(
+                self.serialPort, self._txdQueue, self._rxdQueue, self.interrupts, self._stopper,
+            )
 
-        # start the threads!
-        self.manager.daemon = True
+        if self.trace is None and self._tracePath:
+            self.trace = TraceRecorder(_sessionTracePath(self._tracePath, self.serialPort))
+        self.manager.trace = self.trace
 
+        # start the threads! (the manager thread is already a daemon)
         self.manager.start()
 
+        # create our signal handler and connect it; after a reconnection, the one already installed is reused
+        if self.handler is None:
+            self.handler = SignalHandler(self._stopper, self.manager)
+            signal.signal(signal.SIGINT, self.handler)
+        else:
+            self.handler.stopper = self._stopper
+            self.handler.manager = self.manager
+
+    def enableAutoReconnect(self, deviceID=None, timeout=RECONNECT_TIMEOUT):
+        """
+        Makes the connection survive the device being reset or briefly unplugged. When the
+        connection is lost, the device is reopened on whichever port it comes back, the settings
+        made since start() (operation mode, I2C, SPI, 1-Wire and UART configuration, IO pin modes
+        and values, SPI chip select) are played back, and the commands that were awaiting a
+        response are sent again, so the operation in progress carries on.
+
+        Commands sent again may have already been carried out before the connection was lost,
+        which matters for those that aren't idempotent, such as writes to a FIFO.
+
+        :param deviceID: The device ID to look for; by default, the ID of the device connected now.
+        :param timeout: How long to wait for the device to come back, in seconds.
+        """
+
+        if deviceID is None:
+            response = self.submitCommand("+ID").response()
+            if not response.startswith("-ID "):
+                raise DeviceError(f'Error Binho responded with {response}, not the expected "-ID"')
+            deviceID = response[4:]
+
+        self.deviceID = normalizeDeviceID(deviceID)
+        self.reconnectTimeout = timeout
+        self.autoReconnect = True
+
+    def disableAutoReconnect(self):
+
+        self.autoReconnect = False
+
+    def startTrace(self, path):
+        """
+        Starts recording every command, response and interrupt, with nanosecond timestamps, into
+        a binary trace file that binho.comms.trace.TraceReader can analyse and binho.sim.TraceReplayer
+        can play back. Setting the BINHO_NOVA_TRACE environment variable to a path records every
+        session, each into its own file: the path with the port's name added, e.g. trace-ttyACM0.bin,
+        and a number if that file exists already, e.g. trace-ttyACM0-2.bin.
+
+        :rtype: TraceRecorder
+        """
+
+        self.stopTrace()
+
+        self.trace = TraceRecorder(path)
+        if self.manager is not None:
+            self.manager.trace = self.trace
+
+        return self.trace
+
+    def stopTrace(self):
+        """ Stops recording and closes the trace file. """
+
+        trace, self.trace = self.trace, None
+
+        if self.manager is not None:
+            self.manager.trace = None
+        if trace is not None:
+            trace.close()
+
+    def enableStats(self):
+        """
+        Starts collecting per-command latency histograms and traffic counters; see stats().
+        Setting the BINHO_NOVA_STATS environment variable enables them from the start. While
+        disabled, statistics cost nothing but a few attribute checks per command.
+
+        :rtype: CommsStats
+        """
+
+        if self.statsCollector is None:
+            self.statsCollector = CommsStats()
+            self.interrupts.addCallback(self.statsCollector.interrupt)
+
+        return self.statsCollector
+
+    def disableStats(self):
+
+        if self.statsCollector is not None:
+            self.interrupts.removeCallback(self.statsCollector.interrupt)
+            self.statsCollector = None
+
+    def stats(self):
+        """
+        Returns the statistics collected since enableStats(): commands, responses, timeouts,
+        resyncs, reconnects, bytes sent and received, pipeline queue depth, interrupts by name, and per
+        command verb (e.g. "SPI0 WHR", "IOx VALUE") the count, mean, extremes and percentiles of
+        the latency, in seconds.
+
+        :return: The statistics, or None if they are not enabled.
+        :rtype: Optional[dict]
+        """
+
+        if self.statsCollector is None:
+            return None
+
+        return self.statsCollector.snapshot()
+
+    def openMetrics(self, labels=None):
+        """ Returns the statistics in the OpenMetrics text format, with the given labels on every sample. """
+
+        if self.statsCollector is None:
+            return "# EOF\n"
+
+        return formatOpenMetrics([(labels or {"port": self.serialPort}, self.statsCollector)])
+
     def open(self):
 
-        self.interrupts.clear()
+        self.interrupts.clearAll()
         self.manager.start()
 
     def isConnected(self):
@@ -245,34 +1105,82 @@ class binhoComms:
         if self.handler:
             self.handler.sendStop()
 
-    def interruptCount(self):
+        # Keep recording across reconnections, but make sure what was recorded so far is on disk.
+        if self.trace is not None:
+            self.trace.flush()
 
-        self._checkInterrupts()
+    def interruptCount(self):
 
-        return len(self.interrupts)
+        return len(self.interrupts.pending())
 
     def interruptCheck(self, interrupt):
 
-        self._checkInterrupts()
-
-        if interrupt in self.interrupts:
-            return True
-
-        return False
+        return self.interrupts.check(interrupt)
 
     def interruptClear(self, interrupt):
 
-        self.interrupts.discard(interrupt)
+        self.interrupts.clear(interrupt)
 
     def interruptClearAll(self):
 
-        self.interrupts.clear()
+        self.interrupts.clearAll()
 
     def getInterrupts(self):
 
-        self._checkInterrupts()
+        return set(self.interrupts.pending())
+
+    def waitForInterrupt(self, interrupt, timeout=None):
+        """
+        Waits until the given interrupt is received, unless it is already pending, and clears it.
+
+        :param interrupt: The interrupt line to wait for, e.g. "!IO1" or "!I2C0 SLAVE RX".
+        :type interrupt: str
+        :param timeout: Seconds to wait, or None to wait forever.
+        :return: The interrupt's event, or None if it didn't arrive in time.
+        :rtype: Optional[InterruptEvent]
+        """
+
+        if not self.directIO:
+            return self.interrupts.wait(interrupt, timeout)
+
+        # Without an I/O thread, nobody else is reading the port, so read it until the interrupt turns up.
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while not self.interrupts.check(interrupt) and self.manager.is_alive():
+
+            if deadline is None:
+                self.manager.poll(SERIAL_TIMEOUT)
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.manager.poll(remaining)
+
+        return self.interrupts.take(interrupt)
+
+    def addInterruptCallback(self, callback, interrupt=None):
+        """
+        Calls callback(event) with an InterruptEvent as soon as the given interrupt, or any
+        interrupt if None, is received. Callbacks run on the I/O thread, so they should return quickly.
+        """
+
+        self.interrupts.addCallback(callback, interrupt)
+
+    def removeInterruptCallback(self, callback):
 
-        return self.interrupts.copy()
+        self.interrupts.removeCallback(callback)
+
+    def subscribeInterrupts(self, interrupt=None, loop=None):
+        """
+        Returns a queue.Queue (or an asyncio.Queue for the given event loop) that receives an
+        InterruptEvent for every interrupt received from now on, or only for the given interrupt.
+        """
+
+        return self.interrupts.subscribe(interrupt, loop)
+
+    def unsubscribeInterrupts(self, subscription):
+
+        self.interrupts.unsubscribe(subscription)
 
     # BUFFER COMMANDS
 
@@ -386,26 +1294,87 @@ class binhoComms:
         self.sendCommand("UART" + str(uartIndex) + " BEGIN")
         result = self.readResponse()
 
-        self.manager.startUartBridge()
+        if self.directIO:
+            self.bridge = BridgeBuffer(refill=self.manager.poll)
+        else:
+            self.bridge = BridgeBuffer()
+
+        self.manager.startUartBridge(self.bridge)
 
         return result
 
+    def beginBridgeUARTPty(self, uartIndex):
+        """
+        Starts the UART bridge and exposes it as a local pseudo-terminal (POSIX only). Point any
+        serial tool at the returned bridge's port attribute; stop it with stopBridgeUART().
+
+        :raises DeviceError: if the bridge could not be started
+        :rtype: PtyBridge
+        """
+
+        result = self.beginBridgeUART(uartIndex)
+
+        if not result.startswith("-OK"):
+            raise DeviceError(f'Error Binho responded with {result}, not the expected "-OK"')
+
+        self.bridgePty = PtyBridge(self)
+        self.bridgePty.start()
+
+        return self.bridgePty
+
     def stopBridgeUART(self, sequence):
 
         self.manager.stopUartBridge()
-        self._txdQueue.put(sequence, timeout=SERIAL_TIMEOUT)
+        self.bridge.close()
+
+        if self.bridgePty is not None:
+            self.bridgePty.stop()
+            self.bridgePty = None
+        self.sendCommand(sequence)
         result = self.readResponse()
 
         return result
 
     def writeBridgeUART(self, data):
 
-        self._txdQueue.put(data, timeout=SERIAL_TIMEOUT)
+        self.manager.send(_to_bytes(data))
 
     def readBridgeUART(self, timeout=SERIAL_TIMEOUT):
         # Don't raise an exception if there is nothing to read, the other side may hae nothing to say
         # But don't wait forever
-        return self._rxdQueue.get(timeout=timeout)
+        data = self.bridge.read(1, timeout)
+
+        if not data:
+            raise queue.Empty
+
+        return data.decode("utf-8", errors="replace")
+
+    def readBridgeUARTBytes(self, size=-1, timeout=SERIAL_TIMEOUT):
+        """
+        Reads up to size bytes received over the UART bridge (everything buffered if size is
+        negative), waiting up to timeout seconds for the first one.
+
+        :return: The data read, which is empty on timeout.
+        :rtype: bytes
+        """
+
+        return self.bridge.read(size, timeout)
+
+    def readintoBridgeUART(self, buffer, timeout=SERIAL_TIMEOUT):
+        """
+        Moves data received over the UART bridge straight into buffer, waiting up to timeout
+        seconds for some to arrive.
+
+        :return: The number of bytes stored in buffer.
+        :rtype: int
+        """
+
+        return self.bridge.readinto(buffer, timeout)
+
+    def readlineBridgeUART(self, timeout=SERIAL_TIMEOUT):
+        """ Reads a line received over the UART bridge; a partial line is returned on timeout. """
+
+        return self.bridge.readline(timeout)
 
     # SWI COMMANDS
 
@@ -526,6 +1495,99 @@ class binhoComms:
         return result
 
 
+def _bridge(bridgeBuffer, framer, receivedData):
+    """Store data received in bridge mode, after any partial line left over from command mode."""
+
+    leftover = framer.drain()
+    if leftover:
+        bridgeBuffer.write(leftover)
+
+    bridgeBuffer.write(receivedData)
+
+
+def _sessionTracePath(path, serialPort):
+    """ Returns a path for a session's BINHO_NOVA_TRACE trace that no other trace has used. """
+
+    root, extension = os.path.splitext(path)
+    root += "-" + re.sub(r"[^\w.]+", "_", os.path.basename(str(serialPort)))
+
+    candidate = root + extension
+    number = 1
+
+    while os.path.exists(candidate):
+        number += 1
+        candidate = f"{root}-{number}{extension}"
+
+    return candidate
+
+
+def _to_bytes(command):
+    """Return a command as bytes, encoding it if it was built as a string."""
+
+    if isinstance(command, str):
+        return command.encode("utf-8")
+
+    return bytes(command)
+
+
+def _to_str(command):
+    """Return a command as a string, decoding it if it was built as bytes."""
+
+    if isinstance(command, str):
+        return command
+
+    return bytes(command).decode("utf-8")
+
+
+def encodeHex(data):
+    """
+    Encodes binary data as the ASCII hex payload used by the WHR commands.
+
+    :param data: A bytes-like object, or any iterable of byte values.
+    :return: The lowercase hex digits, as bytes.
+    :rtype: bytes
+    """
+
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data)
+
+    return binascii.hexlify(data)
+
+
+def decodeHex(hexData):
+    """
+    Decodes an ASCII hex payload, as found in device responses, into bytes.
+
+    :param hexData: The hex digits to decode, as bytes or a memoryview of a response line.
+    :rtype: bytes
+    """
+
+    try:
+        return binascii.a2b_hex(hexData)
+    except binascii.Error:
+        # Fall back to the slower, whitespace-tolerant decoder.
+        return bytes.fromhex(bytes(hexData).decode("utf-8"))
+
+
+def decodeHexInto(buffer, hexData, offset=0):
+    """
+    Decodes an ASCII hex payload straight into a caller-supplied writable buffer.
+
+    :param buffer: Any writable buffer-protocol object (bytearray, memoryview, array, mmap...).
+    :param hexData: The hex digits to decode, as bytes or a memoryview of a response line.
+    :param offset: Byte offset in buffer at which to store the decoded data.
+    :return: The number of bytes stored.
+    :rtype: int
+    """
+
+    decoded = decodeHex(hexData)
+
+    with memoryview(buffer) as view, view.cast("B") as octets:
+        octets[offset : offset + len(decoded)] = decoded
+
+    return len(decoded)
+
+
 def _to_hex_string(byte_array):
     """Convert a byte array to a hex string."""
 
@@ -8,7 +8,7 @@ import hid
 
 from ..errors import DeviceNotFoundError
 
-from .manager import binhoDeviceManager
+from .manager import binhoDeviceManager, normalizeDeviceID
 from .comms import binhoComms
 from .drivers.core import binhoCoreDriver
 from .drivers.i2c import binhoI2CDriver
@@ -63,7 +63,7 @@ class binhoAPI:
 
         self.name = "Unknown"
         self.serialPort = device_identifiers["port"]
-        self.comms = binhoComms(device_identifiers["port"])
+        self.comms = binhoComms(device_identifiers["port"], directIO=device_identifiers.get("directIO", False))
 
         self.apis = _BinhoAPIs(
             core=binhoCoreDriver(self.comms),
@@ -215,6 +215,20 @@ class binhoAPI:
         to a more specific Binho host adapter by e.g. serial number.
         """
 
+        # When opening a given port fast, it isn't enumerated or probed; only what is already known
+        # about it is checked, and the identity query made on opening it does the rest.
+        if device_identifiers.get("fast") and device_identifiers.get("port"):
+            usb_hwid, cached_id = binhoDeviceManager.cachedPortInfo(device_identifiers["port"])
+
+            if usb_hwid is not None and cls.USB_VID_PID not in usb_hwid:
+                return False
+
+            wanted_id = device_identifiers.get("deviceID")
+            if wanted_id and cached_id is not None and normalizeDeviceID(wanted_id) != cached_id:
+                return False
+
+            return True
+
         manager = binhoDeviceManager()
 
         if "deviceID" in device_identifiers and device_identifiers["deviceID"]:
@@ -258,7 +272,8 @@ class binhoAPI:
 
     @property
     def commPort(self):
-        return self.serialPort
+        # The device may have come back on another port after a reconnection.
+        return self.comms.serialPort
 
     @classmethod
     def usb_info(cls, port):
@@ -304,10 +319,13 @@ class binhoAPI:
 
         try:
             # see if it's in DAPLink mode
-            _ = self.deviceID
+            deviceID = self.deviceID
             self._inDAPLinkMode = False
             self._inBootloader = False
 
+            if self.identifiers.get("autoReconnect"):
+                self.comms.enableAutoReconnect(deviceID)
+
         except Exception:  # pylint: disable=broad-except
             h = hid.device()
             h.open(
@@ -324,6 +342,14 @@ class binhoAPI:
                 self._inDAPLinkMode = False
                 self._inBootloader = True
 
+        # A port opened fast is only matched against the requested device ID once the device has
+        # identified itself, if nothing was known about it before.
+        wanted_id = self.identifiers.get("deviceID")
+        if self.identifiers.get("fast") and wanted_id:
+            if normalizeDeviceID(self.deviceID) != normalizeDeviceID(wanted_id):
+                self.comms.close()
+                raise DeviceNotFoundError
+
     def addIOPinAPI(self, name, ioPinNumber):  # pylint: disable=unused-argument
         self.apis.io[ioPinNumber] = BinhoIODriver(self.comms, ioPinNumber)
 
@@ -352,6 +378,8 @@ class binhoAPI:
             h.write([0x00, 0x80])
 
         else:
+            # The device leaves for the bootloader on purpose; don't wait for it to come back.
+            self.comms.disableAutoReconnect()
             self.apis.core.resetToBtldr(fail_silent=True)
 
     def exit_bootloader(self):
@@ -0,0 +1,227 @@
+import copy
+import inspect
+
+from binho.hooks import hooks
+from .core import binhoCoreDriver
+from .i2c import binhoI2CDriver
+from .spi import binhoSPIDriver
+from .io import BinhoIODriver
+from .onewire import binho1WireDriver
+
+
+class _NeedResponse(Exception):
+    """ Raised inside a replayed driver call when it reads a response that has not arrived yet. """
+
+
+class _ReplayFuture:
+    def __init__(self, channel, index, parse, raw):
+        self._channel = channel
+        self._index = index
+        self._parse = parse
+        self._raw = raw
+
+    def done(self):
+        return self._index < len(self._channel.responses)
+
+    def responseBytes(self):
+        return self._channel.responseAt(self._index)
+
+    def response(self):
+        return self.responseBytes().decode("utf-8")
+
+    def result(self):
+        if self._parse is None:
+            return self.response()
+
+        if self._raw:
+            return self._parse(memoryview(self.responseBytes()))
+
+        return self._parse(self.response())
+
+
+class _ReplayChannel:
+    """
+    Stands in for binhoComms while a synchronous driver method runs.
+
+    Commands are recorded rather than sent, and responses are served from those already collected
+    by the async transport. Reading a response that has not been collected aborts the call with
+    _NeedResponse; the caller then sends the recorded commands, awaits their responses and runs
+    the method again, until it completes. Driver methods issue their commands deterministically,
+    so each rerun reproduces the commands of the previous one.
+    """
+
+    def __init__(self, comms):
+        self.comms = comms
+        self.commands = []
+        self.responses = []
+        self._sent = 0
+        self._read = 0
+
+    def rewind(self):
+        self._sent = 0
+        self._read = 0
+
+    def responseAt(self, index):
+        if index >= len(self.responses):
+            raise _NeedResponse()
+
+        return self.responses[index]
+
+    def _record(self, command):
+        if self._sent < len(self.commands):
+            if self.commands[self._sent] != command:
+                raise RuntimeError("Driver call issued different commands when replayed")
+        else:
+            self.commands.append(command)
+
+        self._sent += 1
+        return self._sent - 1
+
+    def sendCommand(self, command):
+        self._record(command)
+
+    def submitCommand(self, command, parse=None, raw=False):
+        index = self._record(command)
+        self._read = max(self._read, index + 1)
+        return _ReplayFuture(self, index, parse, raw)
+
+    def submitBatch(self, commands, parse=None, raw=False):
+        if parse is None or callable(parse):
+            parse = [parse] * len(commands)
+
+        return [self.submitCommand(command, parser, raw) for command, parser in zip(commands, parse)]
+
+    def readResponseBytes(self):
+        index = self._read
+        self._read += 1
+        return self.responseAt(index)
+
+    def readResponse(self):
+        return self.readResponseBytes().decode("utf-8")
+
+    def __getattr__(self, name):
+        # checkDeviceSuccess, interrupt bookkeeping, etc. are served by the async transport.
+        return getattr(self.comms, name)
+
+
+class _AsyncDriverFacade:
+    """
+    Exposes a synchronous driver's methods as coroutines on top of AsyncBinhoComms.
+
+    Methods of the wrapped driver are available under the same names and take the same
+    arguments; properties are read with get() and written with set(), e.g.
+    ``await spi.set("clockFrequency", 4000000)``.
+    """
+
+    DRIVER_CLASS = None
+
+    def __init__(self, usb, *args, **kwargs):
+        self.usb = usb
+        self._driver = self.DRIVER_CLASS(usb, *args, **kwargs)  # pylint: disable=not-callable
+
+    async def _run(self, operation, call, args=(), kwargs=None):
+
+        if not hooks.active or hooks.suppressed():
+            return await self._replay(call)
+
+        event = hooks.begin(self, operation, args, kwargs or {})
+
+        try:
+            result = await self._replay(call, event)
+        except BaseException as exception:
+            hooks.end(event, exception=exception)
+            raise
+
+        hooks.end(event, result)
+        return result
+
+    async def _replay(self, call, event=None):
+
+        channel = _ReplayChannel(self.usb)
+        driver = copy.copy(self._driver)
+        driver.usb = channel
+
+        while True:
+            channel.rewind()
+
+            # The replays are reported once, as this facade's operation, rather than by the driver.
+            hooks.suspend()
+            try:
+                result = call(driver)
+                completed = True
+            except _NeedResponse:
+                completed = False
+            finally:
+                hooks.resume()
+
+            if completed:
+                if event is not None:
+                    self._describe(event, channel)
+
+                # Calls that wait for something, such as an interrupt, hand back the transport's coroutine.
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+
+            pending = channel.commands[len(channel.responses):]
+
+            futures = await self.usb.submitBatch(pending)
+
+            for future in futures:
+                response = await self.usb.waitResponse(future)
+                channel.responses.append(response)
+
+    @staticmethod
+    def _describe(event, channel):
+
+        event.commands = len(channel.commands)
+
+        if channel.commands:
+            command = channel.commands[-1]
+            event.command = command if isinstance(command, str) else bytes(command).decode("utf-8")
+        if channel.responses:
+            event.response = channel.responses[-1].decode("utf-8", errors="replace")
+
+    async def get(self, name):
+        """ Reads the named property of the driver. """
+
+        return await self._run(name, lambda driver: getattr(driver, name))
+
+    async def set(self, name, value):
+        """ Writes the named property of the driver. """
+
+        return await self._run(name + "=", lambda driver: setattr(driver, name, value), (value,))
+
+    def __getattr__(self, name):
+
+        method = getattr(self.DRIVER_CLASS, name)
+
+        if isinstance(method, property) or not callable(method):
+            raise AttributeError(f"{name} is a property; use get() or set() to access it")
+
+        async def wrapper(*args, **kwargs):
+            return await self._run(name, lambda driver: getattr(driver, name)(*args, **kwargs), args, kwargs)
+
+        wrapper.__name__ = name
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+
+class AsyncBinhoCoreDriver(_AsyncDriverFacade):
+    DRIVER_CLASS = binhoCoreDriver
+
+
+class AsyncBinhoI2CDriver(_AsyncDriverFacade):
+    DRIVER_CLASS = binhoI2CDriver
+
+
+class AsyncBinhoSPIDriver(_AsyncDriverFacade):
+    DRIVER_CLASS = binhoSPIDriver
+
+
+class AsyncBinhoIODriver(_AsyncDriverFacade):
+    DRIVER_CLASS = BinhoIODriver
+
+
+class AsyncBinho1WireDriver(_AsyncDriverFacade):
+    DRIVER_CLASS = binho1WireDriver
@@ -1,6 +1,8 @@
 from binho.errors import DeviceError
+from binho.hooks import hookable
 
 
+@hookable
 class binhoCoreDriver:
     def __init__(self, usb, coreIndex=0):
 
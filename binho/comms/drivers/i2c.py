@@ -1,6 +1,9 @@
 from binho.errors import CapabilityError, DeviceError
+from binho.comms.comms import encodeHex, decodeHex, decodeHexInto
+from binho.hooks import hookable
 
 
+@hookable
 class binhoI2CDriver:
     def __init__(self, usb, i2cIndex=0):
 
@@ -157,50 +160,60 @@ class binhoI2CDriver:
 
     def writeToReadFrom(self, address, stop, numReadBytes, numWriteBytes, data):  # pylint: disable=too-many-arguments
 
-        dataPacket = ""
-        endStop = "1"
+        return self.submitWriteToReadFrom(address, stop, numReadBytes, numWriteBytes, data).result()
+
+    def submitWriteToReadFrom(
+        self, address, stop, numReadBytes, numWriteBytes, data, into=None
+    ):  # pylint: disable=too-many-arguments
+        """
+        Queues an I2C WHR transaction without waiting for its response. Takes the same arguments as
+        writeToReadFrom(), and returns a CommandFuture whose result() is the data writeToReadFrom() would return.
+
+        If into is given, the received data is decoded straight into that writable buffer instead,
+        and result() returns the number of bytes stored.
+        """
+
+        endStop = b"1"
 
         if numWriteBytes > 0:
-            for i in range(numWriteBytes):
-                dataPacket += "{:02x}".format(data[i])
+            dataPacket = encodeHex(data[:numWriteBytes])
         else:
-            dataPacket = "00"
+            dataPacket = b"00"
 
         if not stop:
-            endStop = "0"
-        # print('I2C' + str(self.i2cIndex) + ' WHR ' + str(address) + ' ' + endStop + ' ' + str(numReadBytes) + ' ' \
-        # + str(numWriteBytes) + ' ' + dataPacket)
+            endStop = b"0"
 
-        self.usb.sendCommand(
-            "I2C"
-            + str(self.i2cIndex)
-            + " WHR "
-            + str(address)
-            + " "
-            + endStop
-            + " "
-            + str(numReadBytes)
-            + " "
-            + str(numWriteBytes)
-            + " "
-            + dataPacket
-        )
-        result = self.usb.readResponse()
+        rxdPrefix = b"-I2C%d RXD " % self.i2cIndex
 
-        # print(result)
+        def parse(result):
 
-        if numReadBytes == 0:
-            if not result.startswith("-OK"):
-                raise DeviceError(f'Error Binho responded with {result}, not the expected "-OK"')
+            if numReadBytes == 0:
+                if result[:3] != b"-OK":
+                    raise DeviceError(f'Error Binho responded with {bytes(result).decode()}, not the expected "-OK"')
 
-            return bytearray()
+                if into is not None:
+                    return 0
 
-        if not result.startswith("-I2C" + str(self.i2cIndex) + " RXD "):
-            raise DeviceError(
-                f'Error Binho responded with {result}, not the expected "-I2C ' + str(self.i2cIndex) + ' RXD ..."'
-            )
+                return bytearray()
+
+            if result[: len(rxdPrefix)] != rxdPrefix:
+                raise DeviceError(
+                    f"Error Binho responded with {bytes(result).decode()}, "
+                    f'not the expected "-I2C {self.i2cIndex} RXD ..."'
+                )
 
-        return bytearray.fromhex(result[9:])
+            if into is not None:
+                return decodeHexInto(into, result[len(rxdPrefix) :])
+
+            return bytearray(decodeHex(result[len(rxdPrefix) :]))
+
+        return self.usb.submitCommand(
+            b"I2C%d WHR %s %s %d %d "
+            % (self.i2cIndex, str(address).encode(), endStop, numReadBytes, numWriteBytes)
+            + dataPacket,
+            parse,
+            raw=True,
+        )
 
     def start(self, address):
 
@@ -284,6 +297,28 @@ class binhoI2CDriver:
 
         self.usb.interruptClear("!I2C" + str(self.i2cIndex) + " SLAVE RX")
 
+    def waitForPeripheralRequestInterruptI2C(self, timeout=None):
+        """
+        Waits until the controller requests data from us in peripheral mode, and clears the interrupt.
+        :param timeout: Seconds to wait, or None to wait forever
+        :type timeout: float
+        :return: The interrupt event, or None if no request arrived in time
+        :rtype: InterruptEvent
+        """
+
+        return self.usb.waitForInterrupt("!I2C" + str(self.i2cIndex) + " SLAVE RQ", timeout)
+
+    def waitForPeripheralReceiveInterruptI2C(self, timeout=None):
+        """
+        Waits until the controller writes data to us in peripheral mode, and clears the interrupt.
+        :param timeout: Seconds to wait, or None to wait forever
+        :type timeout: float
+        :return: The interrupt event, or None if no data arrived in time
+        :rtype: InterruptEvent
+        """
+
+        return self.usb.waitForInterrupt("!I2C" + str(self.i2cIndex) + " SLAVE RX", timeout)
+
     def setPeripheralRegisterValueI2C(self, register, value):
 
         print("I2C" + str(self.i2cIndex) + " SLAVE REG " + str(register) + " " + str(hex(value)))
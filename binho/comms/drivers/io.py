@@ -1,8 +1,12 @@
-from typing import Any
+from typing import Any, Callable, Optional
 
 from binho.errors import DeviceError
+from binho.comms.comms import CommandFuture
+from binho.comms.interrupts import InterruptEvent
+from binho.hooks import hookable
 
 
+@hookable
 class BinhoIODriver:
     def __init__(self, usb, io_number):
 
@@ -83,31 +87,53 @@ class BinhoIODriver:
 
     @property
     def value(self) -> int:
+        return self.submit_value_query().result()
+
+    @value.setter
+    def value(self, value: Any) -> None:
+        self.submit_value(value).result()
+
+    def submit_value_query(self) -> CommandFuture:
+        """
+        Queues a read of this pin's value without waiting for the answer.
+
+        :return: A future whose result() is the pin value, as returned by the value property.
+        :rtype: CommandFuture
+        """
         command = f"IO{self.io_number} VALUE ?"
-        self.usb.sendCommand(command)
-        result = self.usb.readResponse()
 
-        if not result.startswith("-IO" + str(self.io_number) + " VALUE"):
-            raise DeviceError(
-                f'Binho responded to command {command} with {result}, not the expected "-IO'
-                + str(self.io_number)
-                + ' VALUE".'
-            )
+        def parse(result: str) -> int:
+            if not result.startswith("-IO" + str(self.io_number) + " VALUE"):
+                raise DeviceError(
+                    f'Binho responded to command {command} with {result}, not the expected "-IO'
+                    + str(self.io_number)
+                    + ' VALUE".'
+                )
 
-        if "%" in result or "V" in result:
-            vals = result.split(" ")
-            return int(vals[2])
+            if "%" in result or "V" in result:
+                vals = result.split(" ")
+                return int(vals[2])
 
-        return int(result[11:])
+            return int(result[11:])
 
-    @value.setter
-    def value(self, value: Any) -> None:
+        return self.usb.submitCommand(command, parse)
+
+    def submit_value(self, value: Any) -> CommandFuture:
+        """
+        Queues a write of this pin's value without waiting for the acknowledgement.
+
+        :param value: The value to set, as accepted by the value property.
+        :type value: Any
+        :return: A future whose result() raises DeviceError if the device rejected the value.
+        :rtype: CommandFuture
+        """
         command = f"IO{self.io_number} VALUE {value}"
-        self.usb.sendCommand(command)
-        result = self.usb.readResponse()
 
-        if not result.startswith("-OK"):
-            raise DeviceError(f'Binho responded to command "{command}" with {result}, not the expected "-OK".')
+        def parse(result: str) -> None:
+            if not result.startswith("-OK"):
+                raise DeviceError(f'Binho responded to command "{command}" with {result}, not the expected "-OK".')
+
+        return self.usb.submitCommand(command, parse)
 
     def toggle(self, duration):
         command = f"IO{self.io_number} TOGGLE {duration}"
@@ -118,11 +144,30 @@ class BinhoIODriver:
             raise DeviceError(f'Binho responded to command "{command}" with {result}, not the expected "-OK".')
 
 
+    @property
+    def interrupt_name(self) -> str:
+        return "!IO" + str(self.io_number)
+
     @property
     def interrupt_flag(self) -> bool:
-        result = self.usb.interruptCheck("!I0" + str(self.io_number))
+        result = self.usb.interruptCheck(self.interrupt_name)
 
         return result
 
     def clear_interrupt(self) -> None:
-        self.usb.interruptClear("!IO" + str(self.io_number))
+        self.usb.interruptClear(self.interrupt_name)
+
+    def wait_for_interrupt(self, timeout: Optional[float] = None) -> Optional[InterruptEvent]:
+        """
+        Waits for this pin's interrupt, returning at once (and clearing it) if it is already pending.
+        :param timeout: Seconds to wait, or None to wait forever.
+        :return: The interrupt event, or None if the interrupt didn't occur in time.
+        """
+        return self.usb.waitForInterrupt(self.interrupt_name, timeout)
+
+    def on_interrupt(self, callback: Callable[[InterruptEvent], Any]) -> None:
+        """
+        Calls callback(event) as soon as this pin's interrupt is received. The callback runs on the
+        I/O thread, so it should return quickly.
+        """
+        self.usb.addInterruptCallback(callback, self.interrupt_name)
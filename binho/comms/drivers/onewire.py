@@ -1,6 +1,9 @@
 from binho.errors import CapabilityError, DeviceError
+from binho.comms.comms import encodeHex, decodeHex
+from binho.hooks import hookable
 
 
+@hookable
 class binho1WireDriver:
     def __init__(self, usb):
         self.usb = usb
@@ -105,32 +108,44 @@ class binho1WireDriver:
         :rtype: bytearray
         """
 
+        return self.submitExchangeBytes(oneWireCmd, bytesToWrite, bytesToRead, oneWireIndex).result()
+
+    def submitExchangeBytes(self, oneWireCmd, bytesToWrite=None, bytesToRead=0, oneWireIndex=0):
+        """
+        Queues a 1-Wire WHR exchange without waiting for its response.
+        Takes the same parameters as exchangeBytes()
+        :raises CapabilityError: if more than 1024 bytes are to be written or read
+        :return: A future whose result() is the bytearray exchangeBytes() would return
+        :rtype: CommandFuture
+        """
+
         if len(bytesToWrite) > 1024:
             raise CapabilityError("WHR command can only write 1024 bytes at a time!")
 
         if bytesToRead > 1024:
             raise CapabilityError("WHR command can only read 1024 bytes at a time!")
 
-        self.usb.sendCommand(
-            f"1WIRE{oneWireIndex} "
-            f"WHR {oneWireCmd} "
-            f"{bytesToRead} "
-            f"{len(bytesToWrite)} "
-            f'{"".join(f"{b:02x}" for b in bytesToWrite)}'
-        )
+        def parse(result):
 
-        result = self.usb.readResponse()
+            if bytesToRead == 0:
+                if result[:3] != b"-OK":
+                    raise DeviceError(f'Error Binho responded with {bytes(result).decode()}, not the expected "-OK"')
 
-        if bytesToRead == 0:
-            if not result.startswith("-OK"):
-                raise DeviceError(f'Error Binho responded with {result}, not the expected "-OK"')
+                return bytearray()
 
-            return bytearray()
+            if result[:12] != b"-1WIRE0 RXD ":
+                raise DeviceError(
+                    f'Error Binho responded with {bytes(result).decode()}, not the expected "-1WIRE0 RXD ..."'
+                )
 
-        if not result.startswith("-1WIRE0 RXD "):
-            raise DeviceError(f'Error Binho responded with {result}, not the expected "-1WIRE0 RXD ..."')
+            return bytearray(decodeHex(result[12:]))
 
-        return bytearray.fromhex(result[12:])
+        return self.usb.submitCommand(
+            f"1WIRE{oneWireIndex} WHR {oneWireCmd} {bytesToRead} {len(bytesToWrite)} ".encode()
+            + encodeHex(bytesToWrite),
+            parse,
+            raw=True,
+        )
 
     def select(self, oneWireIndex=0):
         """
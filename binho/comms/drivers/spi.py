@@ -1,15 +1,81 @@
 from binho.errors import DeviceError
+from binho.comms.comms import encodeHex, decodeHex, decodeHexInto
+from binho.hooks import hookable
 
 
+def _parseOK(result):
+
+    if result[:3] != b"-OK":
+        raise DeviceError(f'Error Binho responded with {bytes(result).decode()}, not the expected "-OK"')
+
+    return True
+
+
+@hookable
 class binhoSPIDriver:
     def __init__(self, usb, spiIndex=0):
 
         self.usb = usb
         self.spiIndex = spiIndex
 
+        # The settings last set or read, by name, see _shadow(). A dict shared with the copies
+        # the async facades make of this driver.
+        self._settings = {}
+
+    def _shadow(self):
+        """
+        Returns the settings last confirmed by the device, by name; they are dropped whenever the
+        comms' settingsEpoch changes, e.g. after a reconnection or an operation mode change.
+        """
+
+        epoch = self.usb.settingsEpoch
+
+        if self._settings.get("epoch") != epoch:
+            self._settings.clear()
+            self._settings["epoch"] = epoch
+
+        return self._settings
+
+    def _setSetting(self, name, value, command):
+
+        shadow = self._shadow()
+
+        if name in shadow and shadow[name] == value:
+            return True
+
+        # Until it's confirmed, the device's setting isn't known.
+        shadow.pop(name, None)
+
+        self.usb.sendCommand(command)
+        result = self.usb.readResponse()
+
+        if not result.startswith("-OK"):
+            raise DeviceError(f'Error Binho responded with {result}, not the expected "-OK"')
+
+        shadow[name] = value
+
+        return True
+
+    def cachedSetting(self, name):
+        """
+        Returns a setting (clockFrequency, bitOrder, mode, bitsPerTransfer, begun or chipSelect)
+        as last set or read, without asking the device, or None if it isn't known.
+        """
+
+        return self._shadow().get(name)
+
+    def invalidate(self):
+        """ Forgets the settings last set or read, so that the next access of each goes to the device. """
+
+        self._settings.clear()
+
     @property
     def clockFrequency(self):
 
+        shadow = self._shadow()
+        if "clockFrequency" in shadow:
+            return shadow["clockFrequency"]
+
         self.usb.sendCommand("SPI" + str(self.spiIndex) + " CLK ?")
         result = self.usb.readResponse()
 
@@ -18,22 +84,21 @@ class binhoSPIDriver:
                 f'Error Binho responded with {result}, not the expected "-SPI' + str(self.spiIndex) + ' CLK"'
             )
 
-        return int(result[10:])
+        shadow["clockFrequency"] = int(result[10:])
+        return shadow["clockFrequency"]
 
     @clockFrequency.setter
     def clockFrequency(self, clock):
 
-        self.usb.sendCommand("SPI" + str(self.spiIndex) + " CLK " + str(clock))
-        result = self.usb.readResponse()
-
-        if not result.startswith("-OK"):
-            raise DeviceError(f'Error Binho responded with {result}, not the expected "-OK"')
-
-        return True
+        return self._setSetting("clockFrequency", clock, "SPI" + str(self.spiIndex) + " CLK " + str(clock))
 
     @property
     def bitOrder(self):
 
+        shadow = self._shadow()
+        if "bitOrder" in shadow:
+            return shadow["bitOrder"]
+
         self.usb.sendCommand("SPI" + str(self.spiIndex) + " ORDER ?")
         result = self.usb.readResponse()
 
@@ -42,22 +107,21 @@ class binhoSPIDriver:
                 f'Error Binho responded with {result}, not the expected "-SPI' + str(self.spiIndex) + ' ORDER"'
             )
 
-        return result[12:]
+        shadow["bitOrder"] = result[12:]
+        return shadow["bitOrder"]
 
     @bitOrder.setter
     def bitOrder(self, order):
 
-        self.usb.sendCommand("SPI" + str(self.spiIndex) + " ORDER " + order)
-        result = self.usb.readResponse()
-
-        if not result.startswith("-OK"):
-            raise DeviceError(f'Error Binho responded with {result}, not the expected "-OK"')
-
-        return True
+        return self._setSetting("bitOrder", order, "SPI" + str(self.spiIndex) + " ORDER " + order)
 
     @property
     def mode(self):
 
+        shadow = self._shadow()
+        if "mode" in shadow:
+            return shadow["mode"]
+
         self.usb.sendCommand("SPI" + str(self.spiIndex) + " MODE ?")
         result = self.usb.readResponse()
 
@@ -66,22 +130,21 @@ class binhoSPIDriver:
                 f'Error Binho responded with {result}, not the expected "-SPI' + str(self.spiIndex) + ' MODE"'
             )
 
-        return int(result[11:])
+        shadow["mode"] = int(result[11:])
+        return shadow["mode"]
 
     @mode.setter
     def mode(self, mode):
 
-        self.usb.sendCommand("SPI" + str(self.spiIndex) + " MODE " + str(mode))
-        result = self.usb.readResponse()
-
-        if not result.startswith("-OK"):
-            raise DeviceError(f'Error Binho responded with {result}, not the expected "-OK"')
-
-        return True
+        return self._setSetting("mode", mode, "SPI" + str(self.spiIndex) + " MODE " + str(mode))
 
     @property
     def bitsPerTransfer(self):
 
+        shadow = self._shadow()
+        if "bitsPerTransfer" in shadow:
+            return shadow["bitsPerTransfer"]
+
         self.usb.sendCommand("SPI" + str(self.spiIndex) + " TXBITS ?")
         result = self.usb.readResponse()
 
@@ -90,28 +153,17 @@ class binhoSPIDriver:
                 f'Error Binho responded with {result}, not the expected "-SPI' + str(self.spiIndex) + ' TXBITS"'
             )
 
-        return int(result[13:])
+        shadow["bitsPerTransfer"] = int(result[13:])
+        return shadow["bitsPerTransfer"]
 
     @bitsPerTransfer.setter
     def bitsPerTransfer(self, bits):
 
-        self.usb.sendCommand("SPI" + str(self.spiIndex) + " TXBITS " + str(bits))
-        result = self.usb.readResponse()
-
-        if not result.startswith("-OK"):
-            raise DeviceError(f'Error Binho responded with {result}, not the expected "-OK"')
-
-        return True
+        return self._setSetting("bitsPerTransfer", bits, "SPI" + str(self.spiIndex) + " TXBITS " + str(bits))
 
     def begin(self):
 
-        self.usb.sendCommand("SPI" + str(self.spiIndex) + " BEGIN")
-        result = self.usb.readResponse()
-
-        if not result.startswith("-OK"):
-            raise DeviceError(f'Error Binho responded with {result}, not the expected "-OK"')
-
-        return True
+        return self._setSetting("begun", True, "SPI" + str(self.spiIndex) + " BEGIN")
 
     def transfer(self, data):
 
@@ -127,59 +179,149 @@ class binhoSPIDriver:
 
     def writeToReadFrom(self, write, read, numBytes, data):
 
-        dataPacket = ""
-        writeOnlyFlag = "0"
+        return self.submitWriteToReadFrom(write, read, numBytes, data).result()
+
+    def submitWriteToReadFrom(self, write, read, numBytes, data, into=None):  # pylint: disable=too-many-arguments
+        """
+        Queues an SPI WHR transfer without waiting for its response. Takes the same arguments as
+        writeToReadFrom(), and returns a CommandFuture whose result() is the data writeToReadFrom() would return.
+
+        If into is given, the received data is decoded straight into that writable buffer instead,
+        and result() returns the number of bytes stored.
+        """
+
+        command, parse = self._writeToReadFromCommand(write, read, numBytes, data, into)
+
+        return self.usb.submitCommand(command, parse, raw=True)
+
+    def _writeToReadFromCommand(self, write, read, numBytes, data, into=None):  # pylint: disable=too-many-arguments
+        """ Returns the WHR command for a transfer, and the raw parser for its response. """
+
+        writeOnlyFlag = 0
 
         if write:
             if numBytes > 0:
-                for i in range(numBytes):
-                    dataPacket += "{:02x}".format(data[i])
+                dataPacket = encodeHex(data[:numBytes])
             else:
-                dataPacket = "0"
+                dataPacket = b"0"
         else:
             # read only, keep writing the same value
-            for i in range(numBytes):
-                dataPacket += "{:02x}".format(data)
+            dataPacket = b"%02x" % data * numBytes
 
         if not read:
-            writeOnlyFlag = "1"
+            writeOnlyFlag = 1
 
-        self.usb.sendCommand(
-            "SPI" + str(self.spiIndex) + " WHR " + writeOnlyFlag + " " + str(numBytes) + " " + dataPacket
-        )
-        result = self.usb.readResponse()
+        rxdPrefix = b"-SPI%d RXD " % self.spiIndex
 
-        if not read:
-            if not result.startswith("-OK"):
-                raise DeviceError(f'Error Binho responded with {result}, not the expected "-OK"')
+        def parse(result):
 
-            return bytearray()
+            if not read:
+                if result[:3] != b"-OK":
+                    raise DeviceError(f'Error Binho responded with {bytes(result).decode()}, not the expected "-OK"')
 
-        if not result.startswith("-SPI0 RXD "):
-            raise DeviceError(f'Error Binho responded with {result}, not the expected "-SPI0 RXD ..."')
+                if into is not None:
+                    return 0
 
-        return bytearray.fromhex(result[9:])
+                return bytearray()
 
-    def end(self, suppressError=False):
+            if result[: len(rxdPrefix)] != rxdPrefix:
+                raise DeviceError(
+                    f'Error Binho responded with {bytes(result).decode()}, not the expected "-SPI0 RXD ..."'
+                )
 
-        self.usb.sendCommand("SPI" + str(self.spiIndex) + " END")
-        result = self.usb.readResponse()
+            if into is not None:
+                return decodeHexInto(into, result[len(rxdPrefix) :])
 
-        if not result.startswith("-OK"):
+            return bytearray(decodeHex(result[len(rxdPrefix) :]))
+
+        return b"SPI%d WHR %d %d " % (self.spiIndex, writeOnlyFlag, numBytes) + dataPacket, parse
+
+    def transferBatch(self, transfers):  # pylint: disable=too-many-locals
+        """
+        Runs a sequence of WHR transfers, each with its own SPI mode and hardware chip select, as
+        one pipelined batch of commands, and waits for all of them. The END, MODE, BEGIN and WHRCS
+        commands are only added where a transfer needs settings other than those the device has
+        then, as far as known.
+
+        :param transfers: (mode, chipSelect, read, data) tuples: the SPI mode, or None to keep the
+            current one; the chip select as (pinNumber, polarity, pre_delay_us, post_delay_us), or
+            None for none; whether to read back the data received; and the bytes to send.
+        :return: The data received in each transfer, empty for those not read back.
+        :rtype: List[bytearray]
+        """
+
+        shadow = self._shadow()
+        epoch = shadow["epoch"]
+        prefix = "SPI" + str(self.spiIndex)
+        commands = []
+        parsers = []
+        transferIndexes = []
+
+        # The settings the device will have after each queued command. They only go into the
+        # shadow once the device has confirmed every command, so that a rerun of this call (as
+        # the async facades make) queues the same commands.
+        changes = {}
+
+        def current(name):
+            return changes[name] if name in changes else shadow.get(name)
+
+        def setting(name, value, command, parse=_parseOK):
+
+            if (name not in changes and name not in shadow) or current(name) != value:
+                commands.append(command)
+                parsers.append(parse)
+                changes[name] = value
+
+        for mode, chipSelect, read, data in transfers:
+
+            if mode is not None and current("mode") != mode:
+                # As with end(True), a failed END is of no consequence.
+                setting("begun", False, prefix + " END", None)
+                setting("mode", mode, prefix + " MODE " + str(mode))
+
+            setting("begun", True, prefix + " BEGIN")
+
+            if chipSelect is None:
+                setting("chipSelect", None, prefix + " WHRCS DISABLE 0 0 0")
+            else:
+                setting("chipSelect", chipSelect, prefix + " WHRCS " + " ".join(str(value) for value in chipSelect))
+
+            command, parse = self._writeToReadFromCommand(True, read, len(data), data)
+            transferIndexes.append(len(commands))
+            commands.append(command)
+            parsers.append(parse)
+
+        try:
+            futures = self.usb.submitBatch(commands, parsers, raw=True)
+            results = [future.result() for future in futures]
+        except DeviceError:
+            # Some of the settings may have been changed, and some not.
+            self.invalidate()
+            raise
+
+        # Unless the device's settings were lost in the meantime.
+        if self._shadow()["epoch"] == epoch:
+            shadow.update(changes)
+
+        return [results[index] for index in transferIndexes]
+
+    def end(self, suppressError=False):
+
+        try:
+            return self._setSetting("begun", False, "SPI" + str(self.spiIndex) + " END")
+        except DeviceError:
             if not suppressError:
-                raise DeviceError(f'Error Binho responded with {result}, not the expected "-OK"')
+                raise
 
         return True
 
     def configCS(self, pinNumber, polarity=0, pre_delay_us=0, post_delay_us=0):
 
-        self.usb.sendCommand(
+        config = None if pinNumber == "DISABLE" else (pinNumber, polarity, pre_delay_us, post_delay_us)
+
+        return self._setSetting(
+            "chipSelect",
+            config,
             "SPI" + str(self.spiIndex) + " WHRCS " + str(pinNumber) + " " +
-            str(polarity) + " " + str(pre_delay_us) + " " + str(post_delay_us)
+            str(polarity) + " " + str(pre_delay_us) + " " + str(post_delay_us),
         )
-        result = self.usb.readResponse()
-
-        if not result.startswith("-OK"):
-            raise DeviceError(f'Error Binho responded with {result}, not the expected "-OK"')
-
-        return True
@@ -0,0 +1,372 @@
+import asyncio
+import os
+import queue
+import select
+import socket
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Optional
+
+from .manager import binhoDeviceManager, normalizeDeviceID
+
+NOVA_USB_VID = "04d8"
+NOVA_HWID = "04D8"
+
+# The kernel's uevent netlink protocol and the multicast group kernel events are sent to.
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_KERNEL_GROUP = 1
+
+SYSFS_TTY = "/sys/class/tty"
+
+# How often ports are rescanned when uevents aren't available, in seconds.
+POLL_INTERVAL = 0.5
+
+# A new device node may not be accessible until udev has applied its permissions.
+PROBE_ATTEMPTS = 10
+PROBE_RETRY_DELAY = 0.05
+
+
+@dataclass(frozen=True)
+class DeviceEvent:
+    """ A Nova appearing ("add") or disappearing ("remove"), with its port and device ID if known. """
+
+    action: str
+    port: str
+    deviceID: Optional[str]
+    timestamp: float
+
+
+def _usbVendor(ttyName):
+
+    # /sys/class/tty/<tty>/device is the USB interface; its parent is the USB device.
+    try:
+        interface = os.path.realpath(os.path.join(SYSFS_TTY, ttyName, "device"))
+        with open(os.path.join(os.path.dirname(interface), "idVendor"), encoding="utf-8") as vendorFile:
+            return vendorFile.read().strip().lower()
+    except OSError:
+        return None
+
+
+def _scanSysfs():
+
+    return {"/dev/" + name for name in os.listdir(SYSFS_TTY) if _usbVendor(name) == NOVA_USB_VID}
+
+
+def _parseUevent(message):
+
+    fields = message.split(b"\0")
+    properties = {}
+
+    for field in fields[1:]:
+        key, separator, value = field.partition(b"=")
+        if separator:
+            properties[key.decode("utf-8", errors="replace")] = value.decode("utf-8", errors="replace")
+
+    return properties
+
+
+class DeviceMonitor:  # pylint: disable=too-many-instance-attributes
+    """
+    Watches for Novas being plugged in, unplugged or reset, and reports each as a DeviceEvent.
+
+    On Linux, the monitor listens to the kernel's uevents for tty devices, so events arrive
+    within milliseconds and nothing is polled; it falls back to rescanning sysfs, or to
+    comports() on other platforms, every POLL_INTERVAL seconds when uevents can't be received.
+    Simulated adapters (binho.sim) are reported as they are started and closed.
+
+    The device ID of every new adapter is read by probing its port, unless probe is False, and
+    stored in binhoDeviceManager's cache, so that opening it by ID right away needs no probing.
+    The adapters already connected on start() are taken from that cache without being opened,
+    as other processes may be using them; only those reported with existing=True are probed, once,
+    if their device ID isn't cached.
+
+    Events are handed, in order, to callbacks on the monitor's thread and to subscribed queues;
+    see binho.comms.interrupts.InterruptDispatcher, which works the same way.
+
+    :param existing: If True, report the adapters already connected as "add" events on start().
+    """
+
+    def __init__(self, probe=True, existing=False):
+
+        self.probe = probe
+        self.existing = existing
+        self.usingUevents = False
+
+        self._known = {}
+        self._lock = threading.Lock()
+        self._arrived = threading.Condition(self._lock)
+        self._events = []
+        self._callbacks = []
+        self._subscribers = []
+        self._subscriptions = {}
+        self._virtualChanges = queue.Queue()
+        self._socket = None
+        self._wakeup = None
+        self._thread = None
+        self._stopper = threading.Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback_):
+        self.stop()
+
+    # Callbacks and subscriptions
+
+    def addCallback(self, callback, action=None):
+        """ Calls callback(event) for every event, or only for "add" or "remove" events. """
+
+        with self._lock:
+            self._callbacks = self._callbacks + [(callback, action)]
+
+    def removeCallback(self, callback):
+
+        with self._lock:
+            self._callbacks = [entry for entry in self._callbacks if entry[0] is not callback]
+
+    def subscribe(self, action=None, loop=None):
+        """
+        Returns a queue that receives every DeviceEvent (or only "add" or "remove" events) from now on.
+
+        :param loop: If given, an asyncio.Queue bound to this event loop is returned instead of a queue.Queue.
+        :rtype: Union[queue.Queue, asyncio.Queue]
+        """
+
+        if loop is None:
+            subscription = queue.Queue()
+            deliver = subscription.put
+        else:
+            subscription = asyncio.Queue()
+
+            def deliver(event):
+                loop.call_soon_threadsafe(subscription.put_nowait, event)
+
+        with self._lock:
+            self._subscribers = self._subscribers + [(deliver, action)]
+            self._subscriptions[id(subscription)] = deliver
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+
+        with self._lock:
+            deliver = self._subscriptions.pop(id(subscription), None)
+            self._subscribers = [entry for entry in self._subscribers if entry[0] is not deliver]
+
+    def wait(self, action="add", deviceID=None, timeout=None, since=None):
+        """
+        Waits for an event, e.g. for a given adapter to come back after a reset.
+
+        :param deviceID: If given, only events of the adapter with this device ID count.
+        :param since: Only events from this time.monotonic() value on count; defaults to now.
+        :return: The event, or None if none arrived in time.
+        :rtype: Optional[DeviceEvent]
+        """
+
+        if since is None:
+            since = time.monotonic()
+        if deviceID is not None:
+            deviceID = normalizeDeviceID(deviceID)
+
+        def match():
+            for event in self._events:
+                if event.timestamp >= since and event.action == action:
+                    if deviceID is None or event.deviceID == deviceID:
+                        return event
+            return None
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._arrived:
+            while True:
+                event = match()
+                if event is not None:
+                    return event
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+
+                self._arrived.wait(remaining)
+
+    def connectedPorts(self):
+        """ Returns the ports of the adapters currently connected, with their device IDs. """
+
+        with self._lock:
+            return dict(self._known)
+
+    # Monitoring
+
+    def start(self):
+
+        self._stopper.clear()
+        # A socket pair rather than a pipe, as select() only watches sockets on Windows.
+        self._wakeup = socket.socketpair()
+        self._socket = self._openUevents()
+        self.usingUevents = self._socket is not None
+
+        binhoDeviceManager.addVirtualPortListener(self._virtualPortChanged)
+
+        # Take stock of what is connected now; later changes are found by comparison.
+        for port in self._scan():
+            if self.existing:
+                self._added(port, attempts=1)
+            else:
+                with self._lock:
+                    self._known[port] = binhoDeviceManager.cachedDeviceID(port)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+
+        if self._thread is None:
+            return
+
+        binhoDeviceManager.removeVirtualPortListener(self._virtualPortChanged)
+
+        self._stopper.set()
+        self._wakeup[1].send(b"\0")
+        self._thread.join()
+
+        if self._socket is not None:
+            self._socket.close()
+        for wakeup in self._wakeup:
+            wakeup.close()
+
+        self._socket = self._wakeup = self._thread = None
+
+    @staticmethod
+    def _openUevents():
+
+        if not hasattr(socket, "AF_NETLINK"):
+            return None
+
+        try:
+            uevents = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_KOBJECT_UEVENT)
+            uevents.bind((0, UEVENT_KERNEL_GROUP))
+        except OSError:
+            return None
+
+        return uevents
+
+    @staticmethod
+    def _scan():
+
+        if os.path.isdir(SYSFS_TTY):
+            ports = _scanSysfs()
+        else:
+            binhoDeviceManager.refreshPorts()
+            ports = set(binhoDeviceManager.listAvailablePorts())
+
+        return ports | {port for port, hwid in binhoDeviceManager.virtualPorts.items() if NOVA_HWID in hwid}
+
+    def _run(self):
+
+        watched = [self._wakeup[0]] + ([self._socket] if self._socket is not None else [])
+        timeout = None if self._socket is not None else POLL_INTERVAL
+
+        while not self._stopper.is_set():
+
+            readable, _, _ = select.select(watched, [], [], timeout)
+
+            if self._wakeup[0] in readable:
+                self._wakeup[0].recv(4096)
+
+            try:
+                while True:
+                    action, port = self._virtualChanges.get_nowait()
+                    self._changed(action, port)
+            except queue.Empty:
+                pass
+
+            if self._socket is None:
+                self._rescan()
+            elif self._socket in readable:
+                self._uevent(self._socket.recv(65536))
+
+    def _virtualPortChanged(self, action, port):
+
+        # Called on whichever thread registered the port; the change is handled on the monitor's.
+        self._virtualChanges.put((action, port))
+        self._wakeup[1].send(b"\0")
+
+    def _uevent(self, message):
+
+        properties = _parseUevent(message)
+
+        if properties.get("SUBSYSTEM") != "tty" or "DEVNAME" not in properties:
+            return
+
+        name = os.path.basename(properties["DEVNAME"])
+        action = properties.get("ACTION")
+
+        if action == "add" and _usbVendor(name) == NOVA_USB_VID:
+            self._changed("add", "/dev/" + name)
+        elif action == "remove":
+            self._changed("remove", "/dev/" + name)
+
+    def _rescan(self):
+
+        ports = self._scan()
+
+        with self._lock:
+            known = set(self._known)
+
+        for port in known - ports:
+            self._changed("remove", port)
+        for port in ports - known:
+            self._changed("add", port)
+
+    def _changed(self, action, port):
+
+        if action == "add":
+            if port not in self._known:
+                binhoDeviceManager.forgetPort(port)
+                self._added(port)
+        elif port in self._known:
+            binhoDeviceManager.forgetPort(port)
+            with self._lock:
+                deviceID = self._known.pop(port)
+            self._dispatch(DeviceEvent("remove", port, deviceID, time.monotonic()))
+
+    def _added(self, port, attempts=PROBE_ATTEMPTS):
+
+        deviceID = None
+
+        if self.probe:
+            for attempt in range(attempts):
+                if attempt:
+                    time.sleep(PROBE_RETRY_DELAY)
+                deviceID = binhoDeviceManager.identify(port)
+                if deviceID is not None or self._stopper.is_set():
+                    break
+        else:
+            deviceID = binhoDeviceManager.cachedDeviceID(port)
+
+        with self._lock:
+            self._known[port] = deviceID
+
+        self._dispatch(DeviceEvent("add", port, deviceID, time.monotonic()))
+
+    def _dispatch(self, event):
+
+        with self._lock:
+            self._events = self._events[-63:] + [event]
+            self._arrived.notify_all()
+            callbacks = self._callbacks
+            subscribers = self._subscribers
+
+        for callback, action in callbacks:
+            if action is None or action == event.action:
+                try:
+                    callback(event)
+                except Exception:  # pylint: disable=broad-except
+                    traceback.print_exc()
+
+        for deliver, action in subscribers:
+            if action is None or action == event.action:
+                deliver(event)
@@ -0,0 +1,167 @@
+import asyncio
+import collections
+import queue
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class InterruptEvent:
+    """ An interrupt line received from a Binho host adapter, e.g. "!IO1" or "!I2C0 SLAVE RX". """
+
+    name: str
+    timestamp: float
+    sequence: int
+
+
+class InterruptDispatcher:
+    """
+    Delivers interrupts to interested parties as soon as the I/O engine receives them.
+
+    Every interrupt is turned into a timestamped InterruptEvent (the timestamp comes from
+    time.monotonic()) and handed, in arrival order, to registered callbacks and subscribed
+    queues. The dispatcher also remembers which interrupts are pending, so that they can still
+    be checked and cleared like flags, and can block until a given interrupt arrives.
+
+    Callbacks run on the thread that received the interrupt, so they should return quickly.
+    """
+
+    def __init__(self):
+
+        self._lock = threading.Lock()
+        self._arrived = threading.Condition(self._lock)
+        self._pending = collections.OrderedDict()
+        self._counts = collections.Counter()
+        self._callbacks = []
+        self._subscribers = []
+        self._subscriptions = {}
+        self._sequence = 0
+
+    def put(self, interrupt):
+        """
+        Dispatches an interrupt line. Named after queue.Queue.put() so the dispatcher can stand in
+        for the interrupt queue of the I/O engines.
+        """
+
+        with self._lock:
+            self._sequence += 1
+            event = InterruptEvent(interrupt, time.monotonic(), self._sequence)
+
+            self._pending[interrupt] = event
+            self._pending.move_to_end(interrupt)
+            self._counts[interrupt] += 1
+            self._arrived.notify_all()
+
+            callbacks = self._callbacks
+            subscribers = self._subscribers
+
+        for callback, name in callbacks:
+            if name is None or name == interrupt:
+                try:
+                    callback(event)
+                except Exception:  # pylint: disable=broad-except
+                    # Don't let a faulty callback take the I/O engine down with it.
+                    traceback.print_exc()
+
+        for deliver, name in subscribers:
+            if name is None or name == interrupt:
+                deliver(event)
+
+    # Callbacks and subscriptions
+
+    def addCallback(self, callback, interrupt=None):
+        """
+        Calls callback(event) for every interrupt received, or only for the given interrupt.
+        """
+
+        with self._lock:
+            self._callbacks = self._callbacks + [(callback, interrupt)]
+
+    def removeCallback(self, callback):
+
+        with self._lock:
+            self._callbacks = [entry for entry in self._callbacks if entry[0] is not callback]
+
+    def subscribe(self, interrupt=None, loop=None):
+        """
+        Returns a queue that receives an InterruptEvent for every interrupt (or only for the given
+        interrupt) from now on.
+
+        :param loop: If given, an asyncio.Queue bound to this event loop is returned instead of a
+            queue.Queue. Events are handed over thread-safely, so it can be awaited from the loop
+            while interrupts are received on another thread.
+        :rtype: Union[queue.Queue, asyncio.Queue]
+        """
+
+        if loop is None:
+            subscription = queue.Queue()
+            deliver = subscription.put
+        else:
+            subscription = asyncio.Queue()
+
+            def deliver(event):
+                loop.call_soon_threadsafe(subscription.put_nowait, event)
+
+        with self._lock:
+            self._subscribers = self._subscribers + [(deliver, interrupt)]
+            self._subscriptions[id(subscription)] = deliver
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+
+        with self._lock:
+            deliver = self._subscriptions.pop(id(subscription), None)
+            self._subscribers = [entry for entry in self._subscribers if entry[0] is not deliver]
+
+    # Pending interrupts
+
+    def wait(self, interrupt, timeout=None):
+        """
+        Waits until the given interrupt is pending, then clears it.
+
+        :param timeout: Seconds to wait, or None to wait forever.
+        :return: The interrupt's most recent event, or None if it didn't arrive in time.
+        :rtype: Optional[InterruptEvent]
+        """
+
+        with self._arrived:
+            if not self._arrived.wait_for(lambda: interrupt in self._pending, timeout):
+                return None
+
+            return self._pending.pop(interrupt)
+
+    def take(self, interrupt):
+        """ Clears the given interrupt, returning its most recent event if it was pending. """
+
+        with self._lock:
+            return self._pending.pop(interrupt, None)
+
+    def check(self, interrupt):
+
+        return interrupt in self._pending
+
+    def clear(self, interrupt):
+
+        self.take(interrupt)
+
+    def clearAll(self):
+
+        with self._lock:
+            self._pending.clear()
+
+    def pending(self):
+        """ Returns the names of the pending interrupts, in the order they were last received. """
+
+        with self._lock:
+            return list(self._pending)
+
+    def count(self, interrupt=None):
+        """ Returns how many times the given interrupt (or any interrupt) has been received. """
+
+        if interrupt is None:
+            return sum(self._counts.values())
+
+        return self._counts[interrupt]
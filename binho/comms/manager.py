@@ -1,13 +1,122 @@
 from __future__ import absolute_import
 
+import concurrent.futures
+import json
+import os
+import threading
+import time
+
 import serial
 from serial.tools.list_ports import comports
 
+# How long, in seconds, a comports() enumeration is reused; this covers the several lookups
+# made while opening one device.
+ENUMERATION_TTL = 2.0
+
+# How long, in seconds, the device ID found on a port is trusted without probing it again, as
+# long as the same USB device is still enumerated there.
+DEVICE_ID_TTL = 300.0
+
+# How long the read of a probe's response waits; probes of all ports run at once.
+PROBE_TIMEOUT = 0.1
+PROBE_WORKERS = 32
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "binho", "discovery.json")
+
+
+def normalizeDeviceID(deviceID):
+    """ Returns a device ID in the form the cache uses: upper case, without the 0x prefix. """
+
+    deviceID = deviceID.strip().upper()
+    return deviceID[2:] if deviceID.startswith("0X") else deviceID
+
 
 class binhoDeviceManager:
+
+    # Ports of simulated adapters (see binho.sim), which comports() doesn't know about, and their hwid strings.
+    virtualPorts = {}
+
+    # Discovery state, shared by all instances: the last enumeration, as {port: (hwid, location)}, and
+    # the device IDs found by probing, keyed by USB location (or by port, for ports without one).
+    _ports = {}
+    _enumeratedAt = None
+    _deviceIDs = {}
+    _cachePath = os.getenv("BINHO_NOVA_DISCOVERY_CACHE")
+    _cacheLoaded = False
+    _lock = threading.RLock()
+    # Called with (action, port) when a virtual port is registered ("add") or unregistered ("remove").
+    _virtualPortListeners = []
+
     @classmethod
-    def _checkForDeviceID(cls, serialPort):
-        comport = serial.Serial(serialPort, baudrate=1000000, timeout=0.025, write_timeout=0.05)
+    def registerVirtualPort(cls, port, hwid):
+        """
+        Makes a virtual serial port, such as a simulated adapter's pseudo-terminal, show up
+        alongside the USB ports with the given hardware ID string.
+        """
+
+        with cls._lock:
+            cls.virtualPorts[port] = hwid
+            cls._enumeratedAt = None
+            listeners = list(cls._virtualPortListeners)
+
+        for listener in listeners:
+            listener("add", port)
+
+    @classmethod
+    def unregisterVirtualPort(cls, port):
+
+        with cls._lock:
+            cls.virtualPorts.pop(port, None)
+            cls._enumeratedAt = None
+            cls._deviceIDs.pop(port, None)
+            listeners = list(cls._virtualPortListeners)
+
+        for listener in listeners:
+            listener("remove", port)
+
+    @classmethod
+    def addVirtualPortListener(cls, listener):
+
+        with cls._lock:
+            cls._virtualPortListeners.append(listener)
+
+    @classmethod
+    def removeVirtualPortListener(cls, listener):
+
+        with cls._lock:
+            if listener in cls._virtualPortListeners:
+                cls._virtualPortListeners.remove(listener)
+
+    @classmethod
+    def enablePersistence(cls, path=DEFAULT_CACHE_PATH):
+        """
+        Keeps the device IDs found by probing in a file, keyed by USB location, so that other
+        processes can open a device by its ID without probing every port. The file can also be
+        chosen with the BINHO_NOVA_DISCOVERY_CACHE environment variable.
+        """
+
+        with cls._lock:
+            cls._cachePath = path
+            cls._cacheLoaded = False
+
+    @classmethod
+    def disablePersistence(cls):
+
+        with cls._lock:
+            cls._cachePath = None
+
+    @classmethod
+    def invalidate(cls):
+        """ Forgets the enumerated ports and every device ID found, so that the next lookup probes again. """
+
+        with cls._lock:
+            cls._enumeratedAt = None
+            cls._deviceIDs = {}
+            cls._save()
+
+    @classmethod
+    def _checkForDeviceID(cls, serialPort, timeout=0.025):
+        comport = serial.Serial(serialPort, baudrate=1000000, timeout=timeout, write_timeout=0.05)
         command = "+ID ?\n"
         comport.write(command.encode("utf-8"))
         receivedData = comport.readline().strip().decode("utf-8")
@@ -17,16 +126,240 @@ class binhoDeviceManager:
         comport.close()
         return receivedData
 
+    @classmethod
+    def _enumerate(cls):
+        """ Returns {port: (hwid, location)} for every serial port, from at most one comports() per ENUMERATION_TTL. """
+
+        with cls._lock:
+            now = time.monotonic()
+
+            if cls._enumeratedAt is None or now - cls._enumeratedAt > ENUMERATION_TTL:
+                ports = {port.device: (port.hwid, port.location) for port in comports()}
+
+                for port, hwid in cls.virtualPorts.items():
+                    ports[port] = (hwid, None)
+
+                cls._ports = ports
+                cls._enumeratedAt = now
+
+            return cls._ports
+
     @classmethod
     def listAvailablePorts(cls):
 
         HWID = "04D8"  # vid:pid
-        ports = []
 
-        for port in comports():
-            if HWID in port.hwid:
-                ports.append(port.device)
-        return ports
+        return [port for port, (hwid, _) in cls._enumerate().items() if HWID in hwid]
+
+    @classmethod
+    def _load(cls):
+
+        # Called with the lock held.
+        if cls._cacheLoaded or cls._cachePath is None:
+            return
+
+        cls._cacheLoaded = True
+
+        try:
+            with open(cls._cachePath, encoding="utf-8") as cacheFile:
+                entries = json.load(cacheFile)
+        except (OSError, ValueError):
+            return
+
+        # Persisted entries carry wall clock times; convert them to this process's monotonic clock.
+        offset = time.monotonic() - time.time()
+
+        for key, entry in entries.items():
+            if key not in cls._deviceIDs:
+                cls._deviceIDs[key] = dict(entry, seen=entry["seen"] + offset)
+
+    @classmethod
+    def _save(cls):
+
+        # Called with the lock held. Only USB devices are persisted; virtual ports don't outlive their process.
+        if cls._cachePath is None:
+            return
+
+        offset = time.time() - time.monotonic()
+        entries = {
+            key: dict(entry, seen=entry["seen"] + offset)
+            for key, entry in cls._deviceIDs.items()
+            if entry["location"] is not None
+        }
+
+        try:
+            os.makedirs(os.path.dirname(cls._cachePath) or ".", exist_ok=True)
+            temporaryPath = f"{cls._cachePath}.{os.getpid()}"
+            with open(temporaryPath, "w", encoding="utf-8") as cacheFile:
+                json.dump(entries, cacheFile)
+            os.replace(temporaryPath, cls._cachePath)
+        except OSError:
+            pass
+
+    @classmethod
+    def _cachedDeviceID(cls, port, hwid, location):
+
+        # Called with the lock held. An entry only holds while the same device is enumerated at the same place.
+        entry = cls._deviceIDs.get(location or port)
+
+        if entry is None or entry["hwid"] != hwid or time.monotonic() - entry["seen"] > DEVICE_ID_TTL:
+            return None
+
+        return entry["deviceID"]
+
+    @classmethod
+    def _probe(cls, port):
+
+        try:
+            response = cls._checkForDeviceID(port, PROBE_TIMEOUT)
+        except (OSError, serial.SerialException, UnicodeDecodeError):
+            return None
+
+        if not response.startswith("-ID "):
+            return None
+
+        return normalizeDeviceID(response[4:])
+
+    @classmethod
+    def _remember(cls, port, deviceID, portInfo, seen):
+
+        # Called with the lock held.
+        hwid, location = portInfo
+        cls._deviceIDs[location or port] = {
+            "deviceID": deviceID,
+            "hwid": hwid,
+            "location": location,
+            "port": port,
+            "seen": seen,
+        }
+
+    @classmethod
+    def cachedPortInfo(cls, port):
+        """
+        Returns what is known about a port without enumerating the ports or opening it: its hwid
+        string and the device ID found on it, each None if unknown.
+        """
+
+        with cls._lock:
+            cls._load()
+
+            hwid = cls.virtualPorts.get(port)
+            if hwid is None and port in cls._ports:
+                hwid = cls._ports[port][0]
+
+            for entry in cls._deviceIDs.values():
+                if entry["port"] == port and time.monotonic() - entry["seen"] <= DEVICE_ID_TTL:
+                    return hwid or entry["hwid"], entry["deviceID"]
+
+            return hwid, None
+
+    @classmethod
+    def cachedDeviceID(cls, port):
+        """ Returns the device ID cached for the given port, or None if none is; the port isn't opened. """
+
+        ports = cls._enumerate()
+        if port not in ports:
+            return None
+
+        with cls._lock:
+            cls._load()
+            return cls._cachedDeviceID(port, *ports[port])
+
+    @classmethod
+    def identify(cls, port):
+        """
+        Returns the device ID of the Nova on the given port, from the cache or by probing that
+        port alone, or None if it doesn't answer.
+        """
+
+        ports = cls._enumerate()
+        if port not in ports:
+            return None
+
+        with cls._lock:
+            cls._load()
+            deviceID = cls._cachedDeviceID(port, *ports[port])
+
+        if deviceID is not None:
+            return deviceID
+
+        deviceID = cls._probe(port)
+
+        if deviceID is not None:
+            with cls._lock:
+                cls._remember(port, deviceID, ports[port], time.monotonic())
+                cls._save()
+
+        return deviceID
+
+    @classmethod
+    def refreshPorts(cls):
+        """ Makes the next lookup enumerate the serial ports again, e.g. after a device was plugged in. """
+
+        with cls._lock:
+            cls._enumeratedAt = None
+
+    @classmethod
+    def forgetPort(cls, port):
+        """ Drops what is known about a port, e.g. once its device has been unplugged. """
+
+        with cls._lock:
+            cls._enumeratedAt = None
+            stale = [key for key, entry in cls._deviceIDs.items() if entry["port"] == port]
+            for key in stale:
+                del cls._deviceIDs[key]
+            if stale:
+                cls._save()
+
+    @classmethod
+    def discover(cls, refresh=False):
+        """
+        Returns the device ID of every Nova connected, as {port: deviceID}.
+
+        Ports whose device ID is cached are not opened; all the others are probed at once. Ports
+        that don't answer are left out.
+
+        :param refresh: If True, probe every port, ignoring cached device IDs.
+        """
+
+        return cls._discover(refresh)[0]
+
+    @classmethod
+    def _discover(cls, refresh):
+
+        ports = cls._enumerate()
+        candidates = [port for port in cls.listAvailablePorts() if port in ports]
+        found = {}
+
+        with cls._lock:
+            cls._load()
+
+            toProbe = []
+            for port in candidates:
+                deviceID = None if refresh else cls._cachedDeviceID(port, *ports[port])
+                if deviceID is None:
+                    toProbe.append(port)
+                else:
+                    found[port] = deviceID
+
+        cached = set(found)
+
+        if toProbe:
+            workers = min(PROBE_WORKERS, len(toProbe))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                probed = dict(zip(toProbe, executor.map(cls._probe, toProbe)))
+
+            now = time.monotonic()
+
+            with cls._lock:
+                for port, deviceID in probed.items():
+                    if deviceID is not None:
+                        found[port] = deviceID
+                        cls._remember(port, deviceID, ports[port], now)
+
+                cls._save()
+
+        return {port: found[port] for port in candidates if port in found}, cached
 
     def getPortByDeviceID(self, deviceID):
         """
@@ -36,27 +369,32 @@ class binhoDeviceManager:
         :return: List of ports with a matching device ID
         :rtype: List[str]
         """
-        ports = self.listAvailablePorts()
-        result = []
-        for port in ports:
-            try:
-                resp = self._checkForDeviceID(port)
-                if resp == "-ID " + deviceID:
-                    result.append(port)
-                elif resp == "-ID 0x" + deviceID:
-                    result.append(port)
-            except (OSError, serial.SerialException):
-                pass
-
-        if len(result) > 0:
-            return result[0]
+        deviceID = normalizeDeviceID(deviceID)
+
+        found, cached = self._discover(refresh=False)
+
+        # Cached device IDs may be out of date if the device wasn't found; check those ports again.
+        if deviceID not in found.values() and cached:
+            found, _ = self._discover(refresh=True)
+
+        for port, foundID in found.items():
+            if foundID == deviceID:
+                return port
 
         return None
 
     @classmethod
     def getUSBVIDPIDByPort(cls, comport):
 
-        for port in comports():
-            if comport in port.device:
-                return port.hwid
+        if comport is None:
+            return None
+
+        ports = cls._enumerate()
+
+        if comport in ports:
+            return ports[comport][0]
+
+        for port, (hwid, _) in ports.items():
+            if comport in port:
+                return hwid
         return None
@@ -0,0 +1,308 @@
+import collections
+import http.server
+import re
+import threading
+import time
+
+from .trace import commandVerb
+
+# Latencies are recorded in microseconds, with 2**HISTOGRAM_SUB_BITS buckets per power of two,
+# which keeps every recorded value within about 3% of its true value, from 1 us to hours.
+HISTOGRAM_SUB_BITS = 6
+_HALF = 1 << (HISTOGRAM_SUB_BITS - 1)
+
+# Bucket boundaries, in seconds, of the latency histograms in the OpenMetrics exposition.
+OPENMETRICS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+_PIN_NUMBER = re.compile(r"^IO\d+")
+
+
+def statsVerb(command):
+    """
+    Returns the name latencies of a command are filed under: its first two words, with IO pin
+    numbers folded together, e.g. "I2C0 WHR", "IOx VALUE" or "+ID".
+    """
+
+    return _PIN_NUMBER.sub("IOx", commandVerb(command))
+
+
+class LatencyHistogram:
+    """
+    A log-linear histogram in the style of HdrHistogram: constant relative precision over the
+    whole range, at a fixed cost of a few integer operations per recorded value.
+    """
+
+    def __init__(self):
+
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = 0
+
+    @staticmethod
+    def _index(value):
+
+        shift = value.bit_length() - HISTOGRAM_SUB_BITS
+        if shift <= 0:
+            return value
+
+        return shift * _HALF + (value >> shift)
+
+    @staticmethod
+    def _upperBound(index):
+
+        # The largest value stored in the given bucket.
+        if index < 2 * _HALF:
+            return index
+
+        shift = index // _HALF - 1
+        return ((index - shift * _HALF + 1) << shift) - 1
+
+    def record(self, microseconds):
+
+        index = self._index(microseconds)
+
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+
+        self.counts[index] += 1
+        self.count += 1
+        self.total += microseconds
+
+        if self.minimum is None or microseconds < self.minimum:
+            self.minimum = microseconds
+        self.maximum = max(self.maximum, microseconds)
+
+    def percentile(self, percent):
+        """ Returns the value, in microseconds, below which the given percentage of values fall. """
+
+        if self.count == 0:
+            return 0
+
+        threshold = self.count * percent / 100
+        seen = 0
+
+        for index, bucketCount in enumerate(self.counts):
+            seen += bucketCount
+            if bucketCount and seen >= threshold:
+                return min(self._upperBound(index), self.maximum)
+
+        return self.maximum
+
+    def countAtOrBelow(self, microseconds):
+
+        limit = self._index(int(microseconds))
+        return sum(self.counts[: limit + 1])
+
+    def summary(self):
+        """ Returns the count and the mean, extremes and percentiles, in seconds. """
+
+        return {
+            "count": self.count,
+            "mean": self.total / self.count / 1e6 if self.count else 0.0,
+            "min": (self.minimum or 0) / 1e6,
+            "max": self.maximum / 1e6,
+            "p50": self.percentile(50) / 1e6,
+            "p90": self.percentile(90) / 1e6,
+            "p99": self.percentile(99) / 1e6,
+            "p999": self.percentile(99.9) / 1e6,
+        }
+
+
+class CommsStats:  # pylint: disable=too-many-instance-attributes
+    """
+    Counters and per-verb latency histograms for a binhoComms connection.
+
+    Latency runs from a command being submitted to its response being received by binhoComms,
+    so it includes the time the command waited behind the pipelined commands ahead of it.
+    """
+
+    def __init__(self):
+
+        self.started = time.monotonic()
+        self.latency = collections.defaultdict(LatencyHistogram)
+        self.commands = 0
+        self.responses = 0
+        self.timeouts = 0
+        self.resyncs = 0
+        self.reconnects = 0
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.queueDepthMax = 0
+        self.queueDepthTotal = 0
+        self.interrupts = collections.Counter()
+        self._lock = threading.Lock()
+
+    def submitted(self, command, queueDepth):
+
+        self.commands += 1
+        self.bytesSent += len(command) + 1
+        self.queueDepthTotal += queueDepth
+        self.queueDepthMax = max(self.queueDepthMax, queueDepth)
+
+    def answered(self, command, response, submittedAt):
+
+        self.responses += 1
+        self.bytesReceived += len(response) + 1
+        self.latency[statsVerb(command)].record((time.perf_counter_ns() - submittedAt) // 1000)
+
+    def interrupt(self, event):
+
+        # Called on the I/O thread.
+        with self._lock:
+            self.interrupts[event.name] += 1
+
+    def snapshot(self):
+        """ Returns every counter and a summary of every latency histogram, in seconds. """
+
+        with self._lock:
+            interrupts = dict(self.interrupts)
+
+        return {
+            "uptime": time.monotonic() - self.started,
+            "commands": self.commands,
+            "responses": self.responses,
+            "timeouts": self.timeouts,
+            "resyncs": self.resyncs,
+            "reconnects": self.reconnects,
+            "bytesSent": self.bytesSent,
+            "bytesReceived": self.bytesReceived,
+            "queueDepth": {
+                "max": self.queueDepthMax,
+                "mean": self.queueDepthTotal / self.commands if self.commands else 0.0,
+            },
+            "interrupts": interrupts,
+            "latency": {verb: histogram.summary() for verb, histogram in sorted(self.latency.items())},
+        }
+
+
+def _labelSet(labels):
+
+    if not labels:
+        return ""
+
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in sorted(labels.items())
+    )
+    return ",".join(escaped)
+
+
+def _sample(name, labels, value, extra=None):
+
+    labelSet = _labelSet(dict(labels, **(extra or {})))
+    return f"{name}{{{labelSet}}} {value}" if labelSet else f"{name} {value}"
+
+
+def formatOpenMetrics(sources):
+    """
+    Renders the statistics of one or more connections in the OpenMetrics text format.
+
+    :param sources: Pairs of (labels, CommsStats), e.g. ({"device": deviceID}, comms.statsCollector).
+    :rtype: str
+    """
+
+    counters = (
+        ("binho_commands", "commands", "Commands sent"),
+        ("binho_responses", "responses", "Responses received"),
+        ("binho_timeouts", "timeouts", "Responses that did not arrive in time"),
+        ("binho_resyncs", "resyncs", "Response stream resynchronisations"),
+        ("binho_reconnects", "reconnects", "Connections reopened after the device was lost"),
+        ("binho_sent_bytes", "bytesSent", "Bytes sent to the adapter"),
+        ("binho_received_bytes", "bytesReceived", "Bytes received from the adapter"),
+    )
+
+    sources = list(sources)
+    lines = []
+
+    for metric, attribute, description in counters:
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"# HELP {metric} {description}.")
+        for labels, stats in sources:
+            lines.append(_sample(metric + "_total", labels, getattr(stats, attribute)))
+
+    lines.append("# TYPE binho_queue_depth_max gauge")
+    lines.append("# HELP binho_queue_depth_max Most commands awaiting a response at once.")
+    for labels, stats in sources:
+        lines.append(_sample("binho_queue_depth_max", labels, stats.queueDepthMax))
+
+    lines.append("# TYPE binho_interrupts counter")
+    lines.append("# HELP binho_interrupts Interrupts received.")
+    for labels, stats in sources:
+        with stats._lock:  # pylint: disable=protected-access
+            interrupts = sorted(stats.interrupts.items())
+        for name, count in interrupts:
+            lines.append(_sample("binho_interrupts_total", labels, count, {"interrupt": name}))
+
+    lines.append("# TYPE binho_command_latency_seconds histogram")
+    lines.append("# HELP binho_command_latency_seconds Time from submitting a command to receiving its response.")
+    for labels, stats in sources:
+        for verb, histogram in sorted(stats.latency.items()):
+            verbLabels = {"verb": verb}
+            for bound in OPENMETRICS_BUCKETS:
+                count = histogram.countAtOrBelow(bound * 1e6)
+                lines.append(_sample("binho_command_latency_seconds_bucket", labels, count, dict(verbLabels, le=bound)))
+            lines.append(
+                _sample("binho_command_latency_seconds_bucket", labels, histogram.count, dict(verbLabels, le="+Inf"))
+            )
+            lines.append(_sample("binho_command_latency_seconds_count", labels, histogram.count, verbLabels))
+            lines.append(_sample("binho_command_latency_seconds_sum", labels, histogram.total / 1e6, verbLabels))
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class OpenMetricsExporter:
+    """
+    Serves the statistics of one or more connections over HTTP, at /metrics, for Prometheus and
+    other OpenMetrics scrapers.
+
+    :param sources: A callable returning (labels, CommsStats) pairs, called on every scrape so
+        that connections can come and go.
+    :param address: The address to listen on. The metrics include device IDs and traffic counts,
+        so only local clients are served by default; pass "" or "0.0.0.0" to serve the network.
+    """
+
+    def __init__(self, sources, address="127.0.0.1", port=9464):
+
+        self.sources = sources
+        self.address = address
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+
+        exporter = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):  # pylint: disable=invalid-name
+
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = formatOpenMetrics(exporter.sources()).encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((self.address, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
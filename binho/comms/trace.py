@@ -0,0 +1,321 @@
+import collections
+import struct
+import threading
+import time
+
+# File layout: a header holding the magic, the format version and the wall clock and monotonic
+# times (in nanoseconds) the trace was started at, followed by records made of a kind byte, the
+# nanoseconds elapsed since the start, the payload length, and the payload.
+TRACE_MAGIC = b"BNTRACE"
+TRACE_VERSION = 1
+_HEADER = struct.Struct("<7sBqq")
+_RECORD = struct.Struct("<BQI")
+
+# Record kinds.
+SUBMIT = 1  # A command was handed to the transport; the payload is the command.
+WRITE = 2  # Commands were written to the port; the payload is empty, the length is how many.
+RECEIVE = 3  # A response line arrived; the payload is the line.
+INTERRUPT = 4  # An interrupt line arrived; the payload is the line.
+DELIVER = 5  # The oldest received response was handed to the caller.
+TIMEOUT = 6  # No response arrived in time; every outstanding command was failed.
+RESYNC = 7  # The response stream was resynchronised after a timeout.
+
+# Buffered records are written to the file once they take up this many bytes.
+TRACE_FLUSH_SIZE = 1 << 16
+
+
+def commandVerb(command):
+    """ Returns the part of a command that identifies the operation, e.g. "SPI0 WHR" or "+ID". """
+
+    if isinstance(command, (bytes, bytearray, memoryview)):
+        command = bytes(command).decode("utf-8", errors="replace")
+
+    return " ".join(command.split(None, 2)[:2])
+
+
+class TraceRecorder:
+    """
+    Records the traffic of a binhoComms session into a compact binary trace file.
+
+    Every command and response line is stored with the time it was submitted, written to the
+    port, received from the port and handed back to the caller, in nanoseconds. Records are
+    buffered and written out in large chunks; the recorder is safe to use from the caller and
+    the I/O threads at once.
+    """
+
+    def __init__(self, path):
+
+        self.path = path
+        self._file = open(path, "wb")  # pylint: disable=consider-using-with
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._start = time.monotonic_ns()
+        self._file.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, time.time_ns(), self._start))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def record(self, kind, payload=b"", length=None):
+
+        with self._lock:
+            if self._file is None:
+                return
+
+            if length is None:
+                length = len(payload)
+
+            self._buffer += _RECORD.pack(kind, time.monotonic_ns() - self._start, length)
+            self._buffer += payload
+
+            if len(self._buffer) >= TRACE_FLUSH_SIZE:
+                self._file.write(self._buffer)
+                self._buffer.clear()
+
+    def command(self, command):
+        self.record(SUBMIT, command)
+
+    def written(self, count):
+        # The length field carries the number of commands; there is no payload.
+        self.record(WRITE, length=count)
+
+    def received(self, line):
+        self.record(RECEIVE, line)
+
+    def interrupt(self, line):
+        self.record(INTERRUPT, line)
+
+    def delivered(self):
+        self.record(DELIVER)
+
+    def timeout(self):
+        self.record(TIMEOUT)
+
+    def resynchronised(self):
+        self.record(RESYNC)
+
+    def flush(self):
+
+        with self._lock:
+            if self._file is not None:
+                self._file.write(self._buffer)
+                self._buffer.clear()
+                self._file.flush()
+
+    def close(self):
+
+        self.flush()
+
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class TracedCommand:  # pylint: disable=too-many-instance-attributes
+    """
+    One command of a trace with its response and timestamps, in seconds since the trace started.
+    Timestamps are None for the stages the command didn't reach.
+    """
+
+    def __init__(self, command, submitted):
+
+        self.command = command
+        self.verb = commandVerb(command)
+        self.response = None
+        self.submitted = submitted
+        self.written = None
+        self.received = None
+        self.delivered = None
+        self.timedOut = False
+        # Interrupt lines received after this command's response and before the next one.
+        self.interrupts = []
+
+    @property
+    def roundTrip(self):
+        """ Seconds from the command being written to its response being received. """
+
+        if self.written is None or self.received is None:
+            return None
+
+        return self.received - self.written
+
+
+class TraceReader:
+    """
+    Reads a trace file recorded by TraceRecorder, matching every command to its response.
+
+    The device answers commands in order, so submissions, writes, responses and deliveries are
+    matched first-in, first-out. Commands outstanding when a timeout was recorded are marked as
+    timed out, and the traffic of the resynchronisation that followed is skipped.
+    """
+
+    def __init__(self, path):
+
+        self.path = path
+        self.commands = []
+        self.orphanInterrupts = []
+
+        with open(path, "rb") as traceFile:
+            data = traceFile.read()
+
+        magic, version, self.wallClockStart, _ = _HEADER.unpack_from(data)
+
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"{path} is not a Binho trace file")
+
+        self._parse(data, _HEADER.size)
+
+    def _parse(self, data, offset):  # pylint: disable=too-many-branches
+
+        toWrite = collections.deque()
+        toReceive = collections.deque()
+        toDeliver = collections.deque()
+        resyncing = False
+        last = None
+
+        while offset < len(data):
+
+            kind, elapsed, length = _RECORD.unpack_from(data, offset)
+            offset += _RECORD.size
+            timestamp = elapsed / 1e9
+
+            payload = b""
+            if kind != WRITE:
+                payload = data[offset : offset + length]
+                offset += length
+
+            if kind == SUBMIT:
+                command = TracedCommand(payload, timestamp)
+                self.commands.append(command)
+                toWrite.append(command)
+                toReceive.append(command)
+            elif kind == TIMEOUT:
+                for command in toReceive:
+                    command.timedOut = True
+                toReceive.clear()
+                resyncing = True
+            elif kind == RESYNC:
+                resyncing = False
+            elif kind == INTERRUPT:
+                if last is None:
+                    self.orphanInterrupts.append((timestamp, payload))
+                else:
+                    last.interrupts.append((timestamp, payload))
+            elif resyncing:
+                continue
+            elif kind == WRITE:
+                for _ in range(length):
+                    if toWrite:
+                        toWrite.popleft().written = timestamp
+            elif kind == RECEIVE and toReceive:
+                last = toReceive.popleft()
+                last.response = payload
+                last.received = timestamp
+                toDeliver.append(last)
+            elif kind == DELIVER and toDeliver:
+                toDeliver.popleft().delivered = timestamp
+
+    def commandCounts(self):
+        """ Returns how many times each command verb was sent. """
+
+        return collections.Counter(command.verb for command in self.commands)
+
+    def duration(self):
+
+        if not self.commands:
+            return 0.0
+
+        last = self.commands[-1]
+        return (last.delivered or last.received or last.submitted) - self.commands[0].submitted
+
+    def breakdown(self):
+        """
+        Splits the time spent on each command verb into its stages, in seconds:
+
+        - host: from submitting the command to writing it to the port (encoding and queueing)
+        - usb: the USB round trip, estimated as the fastest round trip of the whole trace
+        - device: the rest of the round trip, i.e. device execution and waiting behind earlier commands
+        - deliver: from receiving the response to handing it to the caller
+
+        :return: Per verb, the count, timeouts, and the total and mean of every stage.
+        :rtype: Dict[str, Dict[str, float]]
+        """
+
+        roundTrips = [command.roundTrip for command in self.commands if command.roundTrip is not None]
+        usbFloor = min(roundTrips) if roundTrips else 0.0
+
+        totals = collections.OrderedDict()
+
+        for command in self.commands:
+
+            entry = totals.setdefault(
+                command.verb, {"count": 0, "timeouts": 0, "host": 0.0, "usb": 0.0, "device": 0.0, "deliver": 0.0}
+            )
+            entry["count"] += 1
+
+            if command.timedOut:
+                entry["timeouts"] += 1
+                continue
+
+            if command.written is not None:
+                entry["host"] += command.written - command.submitted
+            if command.roundTrip is not None:
+                entry["usb"] += usbFloor
+                entry["device"] += command.roundTrip - usbFloor
+            if command.delivered is not None and command.received is not None:
+                entry["deliver"] += command.delivered - command.received
+
+        for entry in totals.values():
+            for stage in ("host", "usb", "device", "deliver"):
+                entry[stage + "Mean"] = entry[stage] / entry["count"]
+
+        return totals
+
+    def serviceTimes(self):
+        """
+        Returns, for every command, how long the device took to produce its response once it had
+        both received the command and answered the previous one, in seconds. This is the time a
+        replay has to spend on each command to reproduce the recorded timing.
+        """
+
+        times = []
+        previous = None
+
+        for command in self.commands:
+            if command.roundTrip is None:
+                times.append(0.0)
+                continue
+
+            start = command.written if previous is None else max(command.written, previous)
+            times.append(max(0.0, command.received - start))
+            previous = command.received
+
+        return times
+
+
+def compareTraces(first, second):
+    """
+    Compares the command counts of two traces, e.g. recorded with two versions of the library.
+
+    :param first: A TraceReader or the path of a trace file.
+    :param second: A TraceReader or the path of a trace file.
+    :return: For every verb whose count differs, the counts in the first and second trace.
+    :rtype: Dict[str, Tuple[int, int]]
+    """
+
+    if not isinstance(first, TraceReader):
+        first = TraceReader(first)
+    if not isinstance(second, TraceReader):
+        second = TraceReader(second)
+
+    firstCounts = first.commandCounts()
+    secondCounts = second.commandCounts()
+
+    return {
+        verb: (firstCounts[verb], secondCounts[verb])
+        for verb in sorted(set(firstCounts) | set(secondCounts))
+        if firstCounts[verb] != secondCounts[verb]
+    }
@@ -25,6 +25,38 @@ from . import programmers as ProgrammerModules
 RECONNECT_DELAY = 3
 
 
+class LazyInterface:
+    """
+    Descriptor for a board interface that is only created on first access. Creating an interface
+    configures the device for it, so this keeps opening a board down to the commands the script
+    actually needs, and leaves the device as it is until an interface is used.
+
+    Once created, the interface is stored in the board's own attributes, which take precedence
+    over the descriptor from then on.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, board, owner=None):
+
+        if board is None:
+            return self
+
+        # There are no interfaces to speak of in bootloader or DAPLink mode.
+        if board.inBootloaderMode or board.inDAPLinkMode:
+            raise AttributeError(self.name)
+
+        instance = self.factory(board)
+        board.__dict__[self.name] = instance
+
+        return instance
+
+
 class binhoDevice(binhoAPI):
     """
     Class describing Binho host adapters.
@@ -97,6 +129,15 @@ class binhoDevice(binhoAPI):
         self._interfaces.append(name)
         setattr(self, name, instance)
 
+    def _add_lazy_interface(self, name):
+        """
+        Lists a peripheral provided by a LazyInterface on this board's class, without creating it.
+        Arguments:
+            name -- The name of the LazyInterface attribute.
+        """
+
+        self._interfaces.append(name)
+
     def _add_simple_interface(self, name, cls, *args, **kwargs):
         """Adds a given interface to this board.
         Arguments:
@@ -1,6 +1,6 @@
 from typing import Dict
 
-from ..device import binhoDevice
+from ..device import binhoDevice, LazyInterface
 from ..interfaces.gpio import GPIO, GPIOPin
 from ..interfaces.dac import DAC
 from ..interfaces.adc import ADC
@@ -55,6 +55,14 @@ class binhoNova(binhoDevice):
         "IO4": 4,
     }
 
+    # The bus interfaces, created on first access: creating one configures the device for it.
+    i2c_busses = LazyInterface(lambda board: [I2CBus(board, "I2C0")])
+    i2c = LazyInterface(lambda board: board.i2c_busses[0])
+    spi_busses = LazyInterface(lambda board: [SPIBus(board, 0, "SPI0")])
+    spi = LazyInterface(lambda board: board.spi_busses[0])
+    oneWire_busses = LazyInterface(lambda board: [OneWireBus(board, "1WIRE0")])
+    oneWire = LazyInterface(lambda board: board.oneWire_busses[0])
+
     @property
     def operationMode(self):
         return self.apis.core.operationMode
@@ -97,7 +105,13 @@ class binhoNova(binhoDevice):
         self.apis.core.operationMode = mode
 
     def initialize_apis(self):
-        """ Initialize a new Binho Nova connection. """
+        """
+        Initialize a new Binho Nova connection.
+
+        The I2C, SPI and 1-Wire interfaces are only created, and the device configured for them,
+        when first used. Boards opened with fast=True send nothing beyond the identity query:
+        the operation mode and the pins are also left as the device has them.
+        """
 
         # Set up the core connection.
         super().initialize_apis()
@@ -109,6 +123,8 @@ class binhoNova(binhoDevice):
         if self.inBootloaderMode or self.inDAPLinkMode:
             return
 
+        fast = self.identifiers.get("fast", False)
+
         self.gpio = GPIO(self)
         self.adc = ADC(self)
         self.dac = DAC(self)
@@ -119,10 +135,11 @@ class binhoNova(binhoDevice):
         # Initialize the fixed peripherals that come on the board.
         # Populate the per-board GPIO.
         self._populate_gpio(self.gpio, self.GPIO_MAPPINGS)
-        self.operationMode = "IO"
+        if not fast:
+            self.operationMode = "IO"
         self.gpio_pins = {}
         for name, line in self.GPIO_MAPPINGS.items():
-            pin = GPIOPin(self.gpio, name, line)
+            pin = GPIOPin(self.gpio, name, line, reset=not fast)
             setattr(self, name, pin)
             self.gpio_pins[name] = pin
 
@@ -130,23 +147,11 @@ class binhoNova(binhoDevice):
 
         self._populate_adc(self.adc, self.ADC_MAPPINGS)
 
-        # if self.supports_api('i2c'):
-        # print('supports_api i2c success')
-        self._add_interface("i2c_busses", [I2CBus(self, "I2C0")])
-        self._add_interface("i2c", self.i2c_busses[0])  # pylint: disable=no-member
-
-        # if self.supports_api('spi') and self.supports_api('gpio'):
-        #    chip_select = self.gpio.get_pin('J1_P37')
-        self._add_interface("spi_busses", [SPIBus(self, 0, "SPI0")])
-        self._add_interface("spi", self.spi_busses[0])  # pylint: disable=no-member
-
-        self._add_interface("oneWire_busses", [OneWireBus(self, "1WIRE0")])
-        self._add_interface("oneWire", self.oneWire_busses[0])  # pylint: disable=no-member
+        for name in ("i2c_busses", "i2c", "spi_busses", "spi", "oneWire_busses", "oneWire"):
+            self._add_lazy_interface(name)
 
         # if self.supports_api('uart'):
         # self._add_interface('uart', UART(self))
 
         # Add objects for each of our LEDs.
         self._populate_leds(self.SUPPORTED_LEDS)
-
-        self.operationMode = "IO"
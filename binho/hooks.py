@@ -0,0 +1,259 @@
+import functools
+import threading
+import time
+import traceback
+
+
+def _text(line):
+
+    if isinstance(line, str):
+        return line
+
+    return bytes(line).decode("utf-8", errors="replace")
+
+
+class HookEvent:  # pylint: disable=too-many-instance-attributes
+    """
+    Describes one driver or programmer operation to the hooks registered with a HookRegistry.
+
+    Pre hooks see the interface, operation and arguments; post hooks also get the outcome:
+
+    - command / response: the last command the operation sent and the last response it read,
+      as str, or None if it didn't send or read any
+    - commands: how many commands the operation sent
+    - duration: the time the operation took, in seconds
+    - result / exception: what the operation returned or raised
+
+    Property reads are reported under the property's name with no arguments, and writes under
+    the name followed by "=", with the value as the only argument.
+    """
+
+    def __init__(self, interface, operation, args, kwargs):
+
+        self.interface = interface
+        self.operation = operation
+        self.args = args
+        self.kwargs = kwargs
+        self.command = None
+        self.response = None
+        self.commands = 0
+        self.duration = None
+        self.result = None
+        self.exception = None
+        self._comms = None
+        self._commandsBefore = 0
+        self._started = None
+
+    @property
+    def interfaceName(self):
+        return type(self.interface).__name__
+
+    def __repr__(self):
+
+        arguments = [repr(arg) for arg in self.args] + [f"{key}={value!r}" for key, value in self.kwargs.items()]
+        return f"<HookEvent {self.interfaceName}.{self.operation}({', '.join(arguments)})>"
+
+
+class HookRegistry:  # pylint: disable=protected-access
+    """
+    Callbacks run before and after every operation of the hookable drivers and programmers.
+
+    Hooks are called on the thread that runs the operation, in the order they were added.
+    Exceptions raised by a hook are printed and otherwise ignored, so a broken monitor can't
+    break the operations it watches. When no hooks are registered, an operation costs one
+    attribute check more than it would without hook support.
+
+    Operations an operation runs on the same object, e.g. the submitWriteToReadFrom() behind
+    writeToReadFrom(), are part of it and aren't reported separately.
+    """
+
+    def __init__(self):
+
+        self.preHooks = []
+        self.postHooks = []
+        self.active = False
+        self._suppressed = threading.local()
+        # The ids of the objects running a reported operation on each thread.
+        self._running = threading.local()
+
+    def addPreHook(self, callback, interface=None):
+        """
+        Registers a callback to be called with a HookEvent before every operation.
+
+        :param interface: If given, only operations of this class (or class name) are reported.
+        """
+
+        self.preHooks.append((callback, interface))
+        self.active = True
+
+    def addPostHook(self, callback, interface=None):
+        """
+        Registers a callback to be called with a completed HookEvent after every operation.
+
+        :param interface: If given, only operations of this class (or class name) are reported.
+        """
+
+        self.postHooks.append((callback, interface))
+        self.active = True
+
+    def removeHook(self, callback):
+
+        self.preHooks = [hook for hook in self.preHooks if hook[0] != callback]
+        self.postHooks = [hook for hook in self.postHooks if hook[0] != callback]
+        self.active = bool(self.preHooks or self.postHooks)
+
+    def clear(self):
+
+        self.preHooks = []
+        self.postHooks = []
+        self.active = False
+
+    def suppressed(self):
+        """ Returns whether hooks are suspended on the current thread, see suspend(). """
+
+        return getattr(self._suppressed, "depth", 0) > 0
+
+    def suspend(self):
+        """ Suspends hooks on the current thread until a matching call to resume(). """
+
+        self._suppressed.depth = getattr(self._suppressed, "depth", 0) + 1
+
+    def resume(self):
+
+        self._suppressed.depth -= 1
+
+    def running(self, interface):
+        """ Returns whether a reported operation of the given object is running on the current thread. """
+
+        return id(interface) in getattr(self._running, "interfaces", ())
+
+    @staticmethod
+    def _call(callbacks, event):
+
+        for callback, interface in callbacks:
+            if interface is not None and interface != event.interfaceName:
+                if not (isinstance(interface, type) and isinstance(event.interface, interface)):
+                    continue
+
+            try:
+                callback(event)
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+
+    def begin(self, interface, operation, args, kwargs, comms=None):
+        """ Reports the start of an operation to the pre hooks; returns the event to hand to end(). """
+
+        event = HookEvent(interface, operation, args, kwargs)
+        event._comms = comms
+        event._commandsBefore = getattr(comms, "commandsSent", 0)
+
+        self._call(self.preHooks, event)
+
+        # The pre hooks' own time isn't part of the operation.
+        event._started = time.perf_counter()
+        return event
+
+    def end(self, event, result=None, exception=None):
+        """ Completes an event started with begin() and reports it to the post hooks. """
+
+        event.duration = time.perf_counter() - event._started
+        event.result = result
+        event.exception = exception
+
+        comms = event._comms
+        if comms is not None:
+            sent = getattr(comms, "commandsSent", 0) - event._commandsBefore
+            event.commands = sent
+            if sent:
+                event.command = _text(comms.lastCommand)
+                if comms.lastResponse is not None:
+                    event.response = _text(comms.lastResponse)
+
+        self._call(self.postHooks, event)
+
+    def run(self, interface, operation, function, args, kwargs, comms=None):  # pylint: disable=too-many-arguments
+        """ Runs function(*args, **kwargs) as the given operation, reporting it to the hooks. """
+
+        event = self.begin(interface, operation, args, kwargs, comms)
+
+        running = getattr(self._running, "interfaces", None)
+        if running is None:
+            running = self._running.interfaces = set()
+        running.add(id(interface))
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as exception:
+            running.discard(id(interface))
+            self.end(event, exception=exception)
+            raise
+
+        running.discard(id(interface))
+
+        self.end(event, result)
+        return result
+
+
+# The registry the drivers and programmers of this package report to.
+hooks = HookRegistry()
+
+
+def _usbComms(interface):
+    return getattr(interface, "usb", None)
+
+
+def _hookMethod(name, function, commsOf):
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+
+        if not hooks.active or hooks.suppressed() or hooks.running(self):
+            return function(self, *args, **kwargs)
+
+        return hooks.run(self, name, functools.partial(function, self), args, kwargs, commsOf(self))
+
+    return wrapper
+
+
+def hookable(cls=None, commsOf=_usbComms):
+    """
+    Class decorator reporting every public method and property access of a class to the hooks.
+
+    :param commsOf: Callable returning the binhoComms an instance sends its commands through,
+        used to report the commands and responses of each operation. By default, the instance's
+        usb attribute, as used by the drivers.
+    """
+
+    if cls is None:
+        return functools.partial(hookable, commsOf=commsOf)
+
+    for name, member in list(vars(cls).items()):
+        if name.startswith("_"):
+            continue
+
+        if isinstance(member, property):
+            setattr(
+                cls,
+                name,
+                property(
+                    _hookMethod(name, member.fget, commsOf) if member.fget else None,
+                    _hookMethod(name + "=", member.fset, commsOf) if member.fset else None,
+                    member.fdel,
+                    member.__doc__,
+                ),
+            )
+        elif callable(member) and not isinstance(member, (staticmethod, classmethod, type)):
+            setattr(cls, name, _hookMethod(name, member, commsOf))
+
+    return cls
+
+
+def addPreHook(callback, interface=None):
+    hooks.addPreHook(callback, interface)
+
+
+def addPostHook(callback, interface=None):
+    hooks.addPostHook(callback, interface)
+
+
+def removeHook(callback):
+    hooks.removeHook(callback)
@@ -441,7 +441,7 @@ class GPIOPin:
 
     name: str
 
-    def __init__(self, gpio_provider: GPIOProvider, name: str, line: Any) -> None:
+    def __init__(self, gpio_provider: GPIOProvider, name: str, line: Any, reset: bool = True) -> None:
         """
         Create a new object managing a single GPIO pin.
 
@@ -458,6 +458,9 @@ class GPIOPin:
             GPIO collection; but doesn't have any semantic meaning to this
             class.
         :type line: Any
+        :param reset: If False, the pin is left in whatever mode the device has it in,
+            rather than being set up as a digital input.
+        :type reset: bool
         """
 
         self.name = name
@@ -466,7 +469,8 @@ class GPIOPin:
         self._used: bool = False
 
         # Set up the pin for use. Idempotent.
-        self._parent.setPinMode(self._line, IOMode.DIN)
+        if reset:
+            self._parent.setPinMode(self._line, IOMode.DIN)
 
     @property
     def mode(self) -> Optional[IOMode]:
@@ -1,7 +1,9 @@
+import collections
+
 from ..interface import binhoInterface
 
 
-class SPIBus(binhoInterface):
+class SPIBus(binhoInterface):  # pylint: disable=too-many-instance-attributes
     """
     Class representing a Binho host adapter SPI bus.
     For now, supports only the second SPI bus (SPI1), as the first controller
@@ -49,6 +51,13 @@ class SPIBus(binhoInterface):
         self.clock_frequency = clock_frequency
 
         self._use_auto_cs = False
+        # The hardware chip select set with autoCSConfig(), as (pin, polarity, pre_delay_us, post_delay_us).
+        self._auto_cs = None
+
+        # Whether transfers with a GPIOPin chip select have the adapter drive it as part of the
+        # WHR command, rather than with separate commands before and after.
+        self.use_hardware_chip_select = True
+        self._zeroes = memoryview(bytes(buffer_size))
 
     def attach_device(self, device):
         """
@@ -70,9 +79,10 @@ class SPIBus(binhoInterface):
     @mode.setter
     def mode(self, mode):
 
-        # changing the clock frequency will abort any transaction in progress
-        self.api.end(True)
-        self.api.mode = mode
+        # changing the mode will abort any transaction in progress, so it's only changed if it differs
+        if self.api.cachedSetting("mode") != mode:
+            self.api.end(True)
+            self.api.mode = mode
 
     @property
     def frequency(self):
@@ -81,9 +91,10 @@ class SPIBus(binhoInterface):
     @frequency.setter
     def frequency(self, freq):
 
-        # changing the clock frequency will abort any transaction in progress
-        self.api.end(True)
-        self.api.clockFrequency = freq
+        # changing the clock frequency will abort any transaction in progress, so it's only changed if it differs
+        if self.api.cachedSetting("clockFrequency") != freq:
+            self.api.end(True)
+            self.api.clockFrequency = freq
 
     @property
     def bitOrder(self):
@@ -92,9 +103,10 @@ class SPIBus(binhoInterface):
     @bitOrder.setter
     def bitOrder(self, order):
 
-        # changing the bitOrder will abort any transaction in progress
-        self.api.end(True)
-        self.api.bitOrder = order
+        # changing the bitOrder will abort any transaction in progress, so it's only changed if it differs
+        if self.api.cachedSetting("bitOrder") != order:
+            self.api.end(True)
+            self.api.bitOrder = order
 
     @property
     def bitsPerTransfer(self):
@@ -103,13 +115,15 @@ class SPIBus(binhoInterface):
     @bitsPerTransfer.setter
     def bitsPerTransfer(self, bits):
 
-        # changing the bitsPerTransfer will abort any transaction in progress
-        self.api.end(True)
-        self.api.bitsPerTransfer = bits
+        # changing the bitsPerTransfer will abort any transaction in progress, so it's only changed if it differs
+        if self.api.cachedSetting("bitsPerTransfer") != bits:
+            self.api.end(True)
+            self.api.bitsPerTransfer = bits
 
     def autoCSConfig(self, pinNumber, polarity=0, pre_delay_us=0, post_delay_us=0):
 
         self._use_auto_cs = self.api.configCS(pinNumber, polarity, pre_delay_us, post_delay_us)
+        self._auto_cs = (pinNumber, polarity, pre_delay_us, post_delay_us)
 
         return self._use_auto_cs
 
@@ -120,20 +134,113 @@ class SPIBus(binhoInterface):
 
         return True
 
+    def _configure_cs(self, config):
+        """
+        Sets the adapter's hardware chip select to config, as (pin, polarity, pre_delay_us,
+        post_delay_us), or disables it for None; the driver sends nothing if it's already set so.
+        """
+
+        if config is None:
+            self.api.configCS("DISABLE")
+        else:
+            self.api.configCS(*config)
+
+    def _transmit_chunks(self, data, receive_length):
+        """
+        Splits the data to transmit into pieces of at most buffer_size bytes, extended with
+        zeroes up to receive_length bytes. Returns the pieces, and whether there may be more than one.
+        """
+
+        if isinstance(data, (list, tuple)) and (not data or isinstance(data[0], int)):
+            data = bytes(data)
+
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            return self._stream_chunks(data, receive_length or 0), True
+
+        payload = memoryview(data)
+        if payload.format != "B" or payload.ndim != 1:
+            payload = payload.cast("B")
+
+        total = max(len(payload), receive_length or 0)
+
+        return self._payload_chunks(payload, total), total > self.buffer_size
+
+    def _payload_chunks(self, payload, total):
+
+        for start in range(0, total, self.buffer_size):
+            end = min(start + self.buffer_size, total)
+
+            # Chunks within the payload are sent straight from it, and those past it from a
+            # shared block of zeroes, without a copy.
+            if end <= len(payload):
+                yield payload[start:end]
+            elif start >= len(payload):
+                yield self._zeroes[: end - start]
+            else:
+                yield bytes(payload[start:end]) + bytes(end - len(payload))
+
+    def _stream_chunks(self, pieces, receive_length):
+
+        pending = bytearray()
+        sent = 0
+
+        for piece in pieces:
+            pending += piece
+            while len(pending) >= self.buffer_size:
+                yield bytes(pending[: self.buffer_size])
+                del pending[: self.buffer_size]
+                sent += self.buffer_size
+
+        # Whatever is left over, extended with zeroes up to receive_length.
+        while pending or sent < receive_length:
+            size = min(self.buffer_size, max(len(pending), receive_length - sent))
+            pending.extend(bytes(size - len(pending)))
+            yield bytes(pending)
+            sent += size
+            pending.clear()
+
+    def _hold_auto_cs(self, config):
+        """
+        Asserts a hardware chip select as a plain output instead, for transfers that span several
+        WHR commands: the adapter would otherwise frame each of them separately. Returns the pin
+        driver, to release the chip select with _release_auto_cs().
+        """
+
+        pin, polarity = config[0], config[1]
+        self._configure_cs(None)
+
+        driver = self.board.apis.io[pin]
+        driver.mode = "DOUT"
+        driver.value = 1 if polarity else 0
+
+        return driver
+
+    @staticmethod
+    def _release_auto_cs(driver, config):
+
+        # The hardware chip select is only set up again by the next transfer that uses it.
+        driver.value = 0 if config[1] else 1
+
     def transfer(
         self,
         data,
         receive_length=None,
         chip_select=None,
         deassert_chip_select=True,
-        spi_mode=0,
+        spi_mode=None,
         invert_chip_select=False,
         frequency=None,
-    ):  # pylint: disable=too-many-arguments, too-many-locals
+    ):  # pylint: disable=too-many-arguments
         """
         Sends (and typically receives) data over the SPI bus.
+
+        Transfers longer than the adapter's buffer are split into buffer-sized WHR commands, which
+        are pipelined, with chip select kept asserted from the first to the last. The data may
+        also be given as an iterable of bytes-like pieces, e.g. a generator, of any sizes.
+
         Args:
-            data                 -- the data to be sent to the given device.
+            data                 -- the data to be sent to the given device: a bytes-like object,
+                    a list of byte values, or an iterable of bytes-like pieces.
             receive_length       -- the total amount of data to be read. If longer
                     than the data length, the transmit will automatically be extended
                     with zeroes.
@@ -141,78 +248,238 @@ class SPIBus(binhoInterface):
                     for this transaction, None to use the bus's default, or False to not set CS.
             deassert_chip_select -- if set, the chip-select line will be left low after
                     communicating; this allows this transcation to be continued in the future
-            spi_mode             -- The SPI mode number [0-3] to use for the communication. Defaults to 0.
+            spi_mode             -- The SPI mode number [0-3] to use for the communication, or None
+                    (the default) to keep the bus's mode.
         """
 
-        data_to_transmit = bytearray(data)
+        if receive_length is None and isinstance(data, (bytes, bytearray, memoryview, list, tuple)):
+            receive_length = len(data)
+
         data_received = bytearray()
 
+        self._transfer(
+            data, receive_length, data_received.extend, None, 0,
+            chip_select, deassert_chip_select, spi_mode, invert_chip_select, frequency,
+        )
+
+        # Once we're done, return the data received.
+
+        return bytes(data_received)
+
+    def transfer_into(
+        self,
+        data,
+        buffer,
+        skip=0,
+        chip_select=None,
+        deassert_chip_select=True,
+        spi_mode=None,
+        invert_chip_select=False,
+        frequency=None,
+    ):  # pylint: disable=too-many-arguments
+        """
+        Sends data over the SPI bus, like transfer(), storing the data received in a buffer of
+        the caller's instead of returning it. The response of each WHR command is decoded into the
+        buffer as it arrives, so a large read only allocates a bounded buffer per chunk, never one
+        the size of the whole read.
+
+        Args:
+            data                 -- the data to be sent, as for transfer(); it is extended with
+                    zeroes for as long as there is room left in the buffer.
+            buffer               -- any writable buffer-protocol object (bytearray, memoryview,
+                    numpy array, mmap...), filled with the data received.
+            skip                 -- the number of bytes received to discard before filling the
+                    buffer, e.g. those clocked in while sending a command and address.
+            chip_select, deassert_chip_select, spi_mode, invert_chip_select, frequency -- as for transfer().
+
+        Returns the number of bytes stored in the buffer.
+        """
+
+        into = memoryview(buffer)
+        if into.format != "B" or into.ndim != 1:
+            into = into.cast("B")
+
+        return self._transfer(
+            data, skip + len(into), None, into, skip,
+            chip_select, deassert_chip_select, spi_mode, invert_chip_select, frequency,
+        )
+
+    def _transfer(
+        self, data, receive_length, collect, into, skip,
+        chip_select, deassert_chip_select, spi_mode, invert_chip_select, frequency,
+    ):  # pylint: disable=too-many-arguments, too-many-locals, too-many-branches
+        """
+        Runs a transfer, handing the data received either to collect(), or, from the skip-th byte
+        received on, to the writable memoryview into. Returns the number of bytes stored in into.
+        """
+
         # If we weren't provided with a chip-select, use the bus's default.
         if chip_select is None:
             if self._use_auto_cs is False:
                 chip_select = self._chip_select
 
-        if receive_length is None:
-            receive_length = len(data)
+        chunks, chunked = self._transmit_chunks(data, receive_length)
+        read = receive_length is None or receive_length > 0
 
-        # If we need to receive more than we've transmitted, extend the data
-        # out.
-        if receive_length > len(data):
-            padding = receive_length - len(data)
-            data_to_transmit.extend([0] * padding)
+        # A GPIOPin chip select is driven by the adapter as part of the WHR command, unless it has
+        # to stay asserted beyond a single command.
+        hardware_cs = None
+        if chip_select and self.use_hardware_chip_select and deassert_chip_select and not chunked:
+            hardware_cs = (chip_select.pin_number, 1 if invert_chip_select else 0, 0, 0)
+            chip_select = None
+        elif chip_select is None and self._use_auto_cs:
+            hardware_cs = self._auto_cs
 
-        if spi_mode:
-            # Set the polarity and phase (the "SPI mode").
-            self.api.mode = spi_mode
+        # Set the polarity and phase (the "SPI mode"), and the clock; like BEGIN, these are only
+        # sent when they differ from what the adapter has, so a bus shared by devices with different
+        # modes only switches modes when the device changes.
+        if spi_mode is not None:
+            self.mode = spi_mode
 
         if frequency:
-            self.api.clockFrequency = frequency
+            self.frequency = frequency
 
         self.api.begin()
 
-        # Bring the relevant chip select low, to start the transaction.
-        if chip_select:
-
-            chip_select.mode = "DOUT"
-            if invert_chip_select:
-                chip_select.value = 1
+        held_auto_cs = None
+
+        if hardware_cs is not None and not chunked:
+            self._configure_cs(hardware_cs)
+        else:
+            # Only one chip select may be framing the transfer.
+            self._configure_cs(None)
+
+            # The hardware chip select frames each WHR command, so hold it for the whole transfer instead.
+            if hardware_cs is not None:
+                held_auto_cs = self._hold_auto_cs(hardware_cs)
+
+            # Bring the relevant chip select low, to start the transaction.
+            elif chip_select:
+
+                chip_select.mode = "DOUT"
+                if invert_chip_select:
+                    chip_select.value = 1
+                else:
+                    chip_select.value = 1
+                    chip_select.value = 0
+
+        # Each entry: the chunk's future, and where its data goes in into (or None, if collected).
+        in_flight = collections.deque()
+        position = 0
+        stored = 0
+
+        def finish(entry):
+            nonlocal stored
+            future, start = entry
+
+            if into is None:
+                collect(future.result())
+            elif start is None:
+                future.result()
             else:
-                chip_select.value = 1
-                chip_select.value = 0
-
-        # Transmit our data in chunks of the buffer size.
-        # Extract a single data chunk from the transmit buffer.
-        chunk = data_to_transmit[0 : self.buffer_size]
-
-        writeFlag = False
-        if len(chunk) > 0:
-            writeFlag = True
-
-        readFlag = False
-        if receive_length > 0:
-            readFlag = True
-
-        numBytes = len(chunk)
-        if receive_length > numBytes:
-            numBytes = receive_length
-
-        # Finally, exchange the data.
-        response = self.api.writeToReadFrom(writeFlag, readFlag, numBytes, bytes(chunk))
-        data_received.extend(response)
-
-        # Finally, unless the caller has requested we keep chip-select asserted,
-        # finish the transaction by releasing chip select.
-        if chip_select and deassert_chip_select:
-            if invert_chip_select:
-                chip_select.value = 0
+                # The chunk straddles either end of the part of the data received that is kept.
+                received = future.result()
+                low = max(start, skip)
+                high = min(start + len(received), skip + len(into))
+                into[low - skip : high - skip] = received[low - start : high - start]
+                stored += high - low
+
+        try:
+            # Keep up to a pipeline's worth of chunks in flight, collecting each as it comes back.
+            for chunk in chunks:
+                size = len(chunk)
+
+                if into is None:
+                    entry = (self.api.submitWriteToReadFrom(True, read, size, chunk), None)
+                elif position >= skip and position + size <= skip + len(into):
+                    target = into[position - skip : position - skip + size]
+                    entry = (self.api.submitWriteToReadFrom(True, True, size, chunk, target), None)
+                    stored += size
+                elif position + size <= skip or position >= skip + len(into):
+                    # Nothing received during this chunk is kept, so it needn't be read back.
+                    entry = (self.api.submitWriteToReadFrom(True, False, size, chunk), None)
+                else:
+                    entry = (self.api.submitWriteToReadFrom(True, True, size, chunk), position)
+
+                in_flight.append(entry)
+                position += size
+
+                while in_flight and in_flight[0][0].done():
+                    finish(in_flight.popleft())
+
+            while in_flight:
+                finish(in_flight.popleft())
+
+        finally:
+            if held_auto_cs is not None:
+                self._release_auto_cs(held_auto_cs, hardware_cs)
+
+            # Finally, unless the caller has requested we keep chip-select asserted,
+            # finish the transaction by releasing chip select.
+            if chip_select and deassert_chip_select:
+                if invert_chip_select:
+                    chip_select.value = 0
+                else:
+                    chip_select.value = 1
+
+        # The bus is left begun, so that the next transfer needn't begin it again; changing a
+        # setting or the operation mode ends it.
+        return stored
+
+    def transaction(self):
+        """
+        Returns an SPITransaction, which collects transfers to devices on this bus and runs them
+        all at once, with transfer_many().
+        """
+        return SPITransaction(self)
+
+    def transfer_many(self, operations):
+        """
+        Runs a sequence of transfers, possibly to several devices, as one pipelined stream of
+        commands, and returns the data received in each, as transfer() would.
+
+        Each transfer is a single WHR command framed by the adapter's hardware chip select; the
+        SPI mode and chip select are only changed between transfers that need different ones.
+        Polling several devices thus takes about one round trip to the adapter in all, rather
+        than several per device.
+
+        Args:
+            operations -- (device, data, receive_length) tuples: the SPIDevice to talk to, or None
+                    for the bus's default chip select and current mode; the data to send, as a
+                    bytes-like object or a list of byte values; and the total amount of data to read,
+                    or None to read as much as is sent. No transfer may exceed buffer_size bytes.
+
+        Returns a list of the data received in each transfer, as bytes.
+        """
+
+        transfers = []
+
+        for device, data, receive_length in operations:
+
+            if receive_length is None:
+                receive_length = len(data)
+
+            if device is None:
+                chip_select, spi_mode = None, None
             else:
-                chip_select.value = 1
+                chip_select, spi_mode = device.chip_select, device.spi_mode
 
-        self.api.end()
+            if chip_select is None:
+                chip_select = self._auto_cs if self._use_auto_cs else self._chip_select
 
-        # Once we're done, return the data received.
+            if chip_select is not None and not isinstance(chip_select, tuple):
+                chip_select = (chip_select.pin_number, 0, 0, 0) if chip_select else None
 
-        return bytes(data_received)
+            chunks, chunked = self._transmit_chunks(data, receive_length)
+            if chunked:
+                raise ValueError(
+                    f"Transfers in a batch can't exceed the adapter's buffer of {self.buffer_size} bytes;"
+                    " use transfer() for longer ones"
+                )
+
+            transfers.append((spi_mode, chip_select, receive_length > 0, b"".join(chunks)))
+
+        return [bytes(received) for received in self.api.transferBatch(transfers)]
 
     def disable_drive(self):
         """ Tristates each of the pins on the given SPI bus. """
@@ -221,3 +488,52 @@ class SPIBus(binhoInterface):
     def enable_drive(self):
         """ Enables the bus to drive each of its output pins. """
         self.api.enable_drive(True)
+
+
+class SPITransaction:
+    """
+    A sequence of transfers to devices on an SPI bus, run together with SPIBus.transfer_many()
+    when the transaction is executed, or when its with block ends:
+
+        with spi.transaction() as transaction:
+            for adc in adcs:
+                transaction.add(adc, [0x06, 0x00], 3)
+
+        samples = transaction.results
+    """
+
+    def __init__(self, bus):
+
+        self._bus = bus
+        self._operations = []
+
+        # The data received in each transfer, in the order they were added, once executed.
+        self.results = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if exc_type is None:
+            self.execute()
+
+    def __len__(self):
+        return len(self._operations)
+
+    def add(self, device, data, receive_length=None):
+        """
+        Adds a transfer, with the same arguments as an operation of SPIBus.transfer_many(); returns
+        its index in results.
+        """
+
+        self._operations.append((device, data, receive_length))
+        return len(self._operations) - 1
+
+    def execute(self):
+        """ Runs the transfers added since the last execution; returns and stores their results. """
+
+        operations, self._operations = self._operations, []
+        self.results = self._bus.transfer_many(operations)
+
+        return self.results
@@ -21,6 +21,16 @@ class SPIDevice(binhoInterface):
         # ... and register ourselves with the parent SPI bus.
         self._bus.attach_device(self)
 
+    @property
+    def chip_select(self):
+        """ The GPIOPin that acts as this device's chip select. """
+        return self._chip_select
+
+    @property
+    def spi_mode(self):
+        """ The SPI mode this device is talked to in. """
+        return self._spi_mode
+
     def _transmit(self, data, receive_length=None, deassert_chip_select=True):
         """
         Sends (and typically receives) data over the SPI bus.
@@ -39,3 +49,24 @@ class SPIDevice(binhoInterface):
             chip_select=self._chip_select,
             deassert_chip_select=deassert_chip_select,
         )
+
+    def readinto(self, buffer, command=b"", deassert_chip_select=True):
+        """
+        Sends a command, if any, then fills a buffer of the caller's with the data the device sends
+        back, decoding it straight into the buffer.
+        Args:
+            buffer               -- any writable buffer-protocol object (bytearray, memoryview,
+                    numpy array, mmap...) to fill.
+            command              -- the bytes to send first, e.g. an opcode and address; what is
+                    received while they are sent is discarded.
+            deassert_chip_select -- as for _transmit().
+        Returns the number of bytes stored in the buffer.
+        """
+        return self._bus.transfer_into(
+            command,
+            buffer,
+            skip=len(command),
+            spi_mode=self._spi_mode,
+            chip_select=self._chip_select,
+            deassert_chip_select=deassert_chip_select,
+        )
@@ -4,6 +4,7 @@ from math import floor
 from intelhex import IntelHex
 
 from binho.errors import DriverCapabilityError, CapabilityError, DeviceError
+from binho.hooks import hookable
 from binho.interfaces.i2cDevice import I2CDevice
 from binho.programmer import binhoProgrammer
 
@@ -189,6 +190,7 @@ def setbits(word, bits, value):
     return word
 
 
+@hookable(commsOf=lambda eeprom: eeprom.bus.api.usb)
 class EEPROMDevice(binhoProgrammer):
     """
     Class representing a Microchip I2C serial EEPROM connected to a Binho host adapter I2C bus.
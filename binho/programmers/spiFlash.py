@@ -1,4 +1,5 @@
 from ..errors import DeviceError
+from ..hooks import hookable
 from ..programmer import binhoProgrammer
 from ..util.register import register
 
@@ -14,6 +15,7 @@ def create_programmer(board, *args, **kwargs):
 
 
 # class SPIFlash(DeviceFirmwareManager, binhoProgrammer):
+@hookable(commsOf=lambda flash: flash.board.comms)
 class SPIFlash(binhoProgrammer):
     """ Class representing an SPI flash connected to the Binho Host Adapter. """
 
@@ -417,40 +419,16 @@ class SPIFlash(binhoProgrammer):
     def readBytes(self, startingAddress, bytesToRead):
 
         addr = [0x00, 0x00, 0x00]
-        baseAddress = startingAddress
-        bytesRemaining = bytesToRead
-        rxData = []
-
-        while bytesRemaining > 0:
-
-            if bytesRemaining > 1020:
-
-                addr[0] = (baseAddress >> 16) & 0xFF
-                addr[1] = (baseAddress >> 8) & 0xFF
-                addr[2] = baseAddress & 0xFF
-
-                txData = [0x03] + addr
-
-                data = self.board.spi.transfer(
-                    txData, len(txData) + 1020, chip_select=self.csPin, deassert_chip_select=False,
-                )
-                rxData += data[4:1024]
-                bytesRemaining = bytesRemaining - 1020
-                baseAddress += 1020
-
-            else:
-
-                addr[0] = (baseAddress >> 16) & 0xFF
-                addr[1] = (baseAddress >> 8) & 0xFF
-                addr[2] = baseAddress & 0xFF
+        addr[0] = (startingAddress >> 16) & 0xFF
+        addr[1] = (startingAddress >> 8) & 0xFF
+        addr[2] = startingAddress & 0xFF
 
-                txData = [0x03] + addr
+        txData = [0x03] + addr
 
-                data = self.board.spi.transfer(txData, len(txData) + bytesRemaining, chip_select=self.csPin)
-                rxData += data[4 : bytesRemaining + 4]
-                bytesRemaining = 0
+        # A single read of any length: the transfer keeps chip select asserted across the chunks it's split into.
+        data = self.board.spi.transfer(txData, len(txData) + bytesToRead, chip_select=self.csPin)
 
-        return rxData
+        return list(data[len(txData) :])
 
     def pageProgram(self, startingAddress, dataBytes, blockUntilFinished=True):
 
@@ -0,0 +1,4 @@
+from .device import SimulatedNova, USB_FRAME_INTERVAL, USB_PACKET_SIZE, USB_PACKETS_PER_FRAME
+from .peripherals import I2CEEPROM, SPINORFlash, OneWireDevice, crc8
+from .protocol import NovaProtocol
+from .replay import ReplayProtocol, TraceReplayer
@@ -0,0 +1,319 @@
+import math
+import os
+import select
+import threading
+import time
+import tty
+
+from binho.comms.manager import binhoDeviceManager
+
+from .protocol import NovaProtocol
+
+# USB full-speed bulk endpoints: 64-byte packets, 1 ms frames, at most 19 packets per frame.
+USB_PACKET_SIZE = 64
+USB_FRAME_INTERVAL = 0.001
+USB_PACKETS_PER_FRAME = 19
+
+NOVA_HWID = "USB VID:PID=04D8:ED34 SER={serial} LOCATION=sim"
+
+# time.sleep() overshoots by tens to hundreds of microseconds; the last stretch of a delay is spun instead.
+SPIN_THRESHOLD = 0.001
+
+
+def _delay(seconds):
+
+    deadline = time.perf_counter() + seconds
+
+    if seconds > SPIN_THRESHOLD:
+        time.sleep(seconds - SPIN_THRESHOLD)
+
+    while time.perf_counter() < deadline:
+        pass
+
+
+class SimulatedNova:  # pylint: disable=too-many-instance-attributes
+    """
+    A simulated Binho Nova behind a pseudo-terminal, speaking the same ASCII protocol as the
+    real adapter. Once started, its port attribute can be handed to anything that expects a Nova
+    serial port, e.g. ``binhoHostAdapter(port=sim.port)``; the port is registered with
+    binhoDeviceManager so that it's recognised as a Nova.
+
+    Peripherals from binho.sim.peripherals are attached with addPeripheral(). Timing can be
+    modelled to measure host-side optimisations:
+
+    :param latency: Seconds the adapter takes to process each command.
+    :param commandLatency: Per-command overrides of latency, keyed by the command and its first
+        argument (e.g. "SPI0 WHR", "IO1 VALUE") or the command alone (e.g. "+ID").
+    :param busTiming: If True, also wait for as long as the bus transfer would take at the
+        configured clock frequency.
+    :param frameInterval: If non-zero, responses leave the adapter at USB frame boundaries, at
+        most packetsPerFrame packets of packetSize bytes per frame, like full-speed bulk
+        transfers. USB_FRAME_INTERVAL gives a realistic model.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        deviceID="0xC0FFEE00000000000000000000000001",
+        firmwareVersion="0.2.8",
+        hardwareVersion="1.0",
+        latency=0.0,
+        commandLatency=None,
+        busTiming=False,
+        packetSize=USB_PACKET_SIZE,
+        frameInterval=0.0,
+        packetsPerFrame=USB_PACKETS_PER_FRAME,
+        enforceModes=True,
+    ):
+
+        self.protocol = NovaProtocol(deviceID, firmwareVersion, hardwareVersion, enforceModes)
+        self.latency = latency
+        self.commandLatency = dict(commandLatency or {})
+        self.busTiming = busTiming
+        self.packetSize = packetSize
+        self.frameInterval = frameInterval
+        self.packetsPerFrame = packetsPerFrame
+
+        self.port = None
+        self.hwid = NOVA_HWID.format(serial=deviceID[2:] if deviceID.startswith("0x") else deviceID)
+        self.commandsExecuted = 0
+        self.uartReceived = bytearray()
+
+        self._master = None
+        self._slave = None
+        self._wakeup = None
+        self._thread = None
+        self._stopper = threading.Event()
+        self._writeLock = threading.Lock()
+        self._stateLock = threading.Lock()
+        self._pending = bytearray()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Test harness API
+
+    def addPeripheral(self, peripheral):
+        """ Connects an I2C, SPI or 1-Wire peripheral to the simulated adapter; returns it. """
+
+        with self._stateLock:
+            self.protocol.attach(peripheral)
+        return peripheral
+
+    def drivePin(self, pin, value):
+        """ Drives IO pin as an external circuit would; sends its interrupt if one is configured. """
+
+        with self._stateLock:
+            self.protocol.drivePin(pin, value)
+        self._flushInterrupts()
+
+    def raiseInterrupt(self, name):
+        """ Sends an interrupt line, e.g. "!IO1" or "!I2C0 SLAVE RX", to the host. """
+
+        with self._stateLock:
+            self.protocol.interrupts.append(name)
+        self._flushInterrupts()
+
+    def controllerWriteI2C(self, data):
+        """ Writes to the adapter in I2C peripheral mode, as an external I2C controller would. """
+
+        with self._stateLock:
+            self.protocol.controllerWriteI2C(data)
+        self._flushInterrupts()
+
+    def controllerReadI2C(self, count):
+        """ Reads from the adapter in I2C peripheral mode, as an external I2C controller would. """
+
+        with self._stateLock:
+            data = self.protocol.controllerReadI2C(count)
+        self._flushInterrupts()
+        return data
+
+    def sendUART(self, data):
+        """ Sends data received on the UART to the host; only delivered while the bridge is running. """
+
+        if self.protocol.bridgeActive:
+            self._send(bytes(data))
+
+    # Transport
+
+    def start(self):
+        """ Creates the pseudo-terminal and starts serving it; its path is then in the port attribute. """
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        tty.setraw(self._master)
+        self.port = os.ttyname(self._slave)
+        self._wakeup = os.pipe()
+
+        binhoDeviceManager.registerVirtualPort(self.port, self.hwid)
+
+        self._stopper.clear()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+
+        if self._master is None:
+            return
+
+        self._stopper.set()
+        os.write(self._wakeup[1], b"\0")
+        self._thread.join()
+
+        binhoDeviceManager.unregisterVirtualPort(self.port)
+
+        for fd in (self._master, self._slave) + self._wakeup:
+            os.close(fd)
+
+        self._master = self._slave = self._wakeup = self._thread = None
+
+    def _serve(self):
+
+        while not self._stopper.is_set():
+
+            readable, _, _ = select.select([self._master, self._wakeup[0]], [], [])
+
+            if self._master not in readable:
+                continue
+
+            try:
+                data = os.read(self._master, 65536)
+            except OSError:
+                break
+
+            self._receive(data)
+
+    def _receive(self, data):
+
+        if self.frameInterval:
+            self._awaitFrame()
+
+        if self.protocol.bridgeActive:
+            data = self._bridge(data)
+
+        self._pending += data
+        output = bytearray()
+
+        while not self.protocol.bridgeActive:
+
+            lineEnd = self._pending.find(b"\n")
+            if lineEnd < 0:
+                break
+
+            line = self._pending[:lineEnd].decode("utf-8", errors="replace").strip()
+            del self._pending[: lineEnd + 1]
+
+            if not line:
+                continue
+
+            with self._stateLock:
+                response, busTime = self.protocol.execute(line)
+                interrupts = self._takeInterrupts()
+            self.commandsExecuted += 1
+
+            delay = self._latency(line) + (busTime if self.busTiming else 0.0)
+
+            # Responses finished without delay leave the adapter together, as they would share USB packets.
+            if delay > 0:
+                self._send(output)
+                output = bytearray()
+                _delay(delay)
+
+            # No response at all reproduces a device that failed to answer.
+            if response is not None:
+                output += response.encode("utf-8") + b"\n"
+
+            for interrupt in interrupts:
+                output += interrupt.encode("utf-8") + b"\n"
+
+        self._send(output)
+
+        if self.protocol.bridgeActive and self._pending:
+            data, self._pending = bytes(self._pending), bytearray()
+            self._receive(data)
+
+    def _bridge(self, data):
+
+        # Everything the host sends goes out of the UART until the escape sequence shows up; the
+        # rest of its line is dropped and the adapter is back in command mode.
+        stream = self.uartReceived + data
+        escape = self.protocol.uartEscape.encode("utf-8")
+        index = stream.find(escape, max(0, len(self.uartReceived) - len(escape)))
+
+        if index < 0:
+            self.uartReceived += data
+            return b""
+
+        del self.uartReceived[index:]
+        rest = stream[index + len(escape) :]
+        self.protocol.bridgeActive = False
+
+        self._send(b"-OK\n")
+
+        lineEnd = rest.find(b"\n")
+        return bytes(rest[lineEnd + 1 :]) if lineEnd >= 0 else b""
+
+    def _latency(self, line):
+
+        if not self.commandLatency:
+            return self.latency
+
+        tokens = line.split(None, 2)
+        key = " ".join(tokens[:2])
+
+        if key in self.commandLatency:
+            return self.commandLatency[key]
+
+        return self.commandLatency.get(tokens[0], self.latency)
+
+    def _takeInterrupts(self):
+
+        # Called with the state lock held.
+        interrupts = self.protocol.interrupts
+        self.protocol.interrupts = []
+        return interrupts
+
+    def _flushInterrupts(self):
+
+        with self._stateLock:
+            interrupts = self._takeInterrupts()
+
+        self._send(b"".join(interrupt.encode("utf-8") + b"\n" for interrupt in interrupts))
+
+    def _awaitFrame(self):
+
+        now = time.monotonic()
+        _delay((math.floor(now / self.frameInterval) + 1) * self.frameInterval - now)
+
+    def _send(self, data):
+
+        if not data or self._master is None:
+            return
+
+        with self._writeLock:
+            if not self.frameInterval:
+                self._write(data)
+                return
+
+            # Send as many packets per frame as USB allows, starting at the next frame boundary.
+            view = memoryview(data)
+            perFrame = self.packetSize * self.packetsPerFrame
+
+            while len(view) > 0:
+                self._awaitFrame()
+                self._write(view[:perFrame])
+                view = view[perFrame:]
+
+    def _write(self, data):
+
+        view = memoryview(data)
+
+        try:
+            while len(view) > 0:
+                view = view[os.write(self._master, view) :]
+        except OSError:
+            pass
@@ -0,0 +1,359 @@
+import struct
+import time
+
+
+class I2CEEPROM:
+    """
+    A 24-series I2C EEPROM: the first bytes of every write set the address pointer, the rest
+    are written within the current page (wrapping at the page boundary, as the real parts do);
+    reads continue from the address pointer, wrapping at the end of the memory.
+
+    While a write cycle is in progress (writeCycleTime seconds after a write), the EEPROM
+    doesn't acknowledge its address, so acknowledge polling behaves as on hardware.
+    """
+
+    def __init__(
+        self, address=0x50, size=256, pageSize=8, addressBytes=None, contents=None, writeCycleTime=0.0
+    ):  # pylint: disable=too-many-arguments
+
+        self.address = address
+        self.size = size
+        self.pageSize = pageSize
+        self.addressBytes = addressBytes if addressBytes is not None else (1 if size <= 256 else 2)
+        self.writeCycleTime = writeCycleTime
+        self.memory = bytearray(b"\xff" * size)
+        self.pointer = 0
+        self._busyUntil = 0.0
+
+        if contents is not None:
+            self.memory[: len(contents)] = contents
+
+    def _busy(self):
+
+        return time.monotonic() < self._busyUntil
+
+    def write(self, data):
+        """ Handles a write transaction addressed to the EEPROM; returns whether it was acknowledged. """
+
+        if self._busy():
+            return False
+
+        if len(data) < self.addressBytes:
+            return True
+
+        self.pointer = int.from_bytes(data[: self.addressBytes], "big") % self.size
+        payload = data[self.addressBytes :]
+
+        if payload:
+            pageStart = self.pointer - self.pointer % self.pageSize
+
+            for index, value in enumerate(payload):
+                self.memory[pageStart + (self.pointer - pageStart + index) % self.pageSize] = value
+
+            self._busyUntil = time.monotonic() + self.writeCycleTime
+
+        return True
+
+    def read(self, count):
+        """ Handles a read transaction; returns the bytes read, or None if not acknowledged. """
+
+        if self._busy():
+            return None
+
+        data = bytearray(count)
+
+        for index in range(count):
+            data[index] = self.memory[self.pointer]
+            self.pointer = (self.pointer + 1) % self.size
+
+        return bytes(data)
+
+
+def _padded(data, offset, count):
+
+    # Reading past the end of a table returns erased bytes.
+    return (data[offset : offset + count] + b"\xff" * count)[:count]
+
+
+def _sfdpTable(size, pageSize):
+
+    # JESD216 header, one parameter header, and the 20-DWORD basic flash parameter table.
+    header = b"SFDP" + bytes([0x06, 0x01, 0x00, 0xFF])
+    parameterHeader = bytes([0x00, 0x06, 0x01, 20, 0x10, 0x00, 0x00, 0xFF])
+
+    dwords = [
+        0xFFF920E5,  # 4 KiB erase with 0x20, 3-byte addressing, fast read modes
+        size * 8 - 1,  # density in bits, minus one
+        0x6B08EB44,
+        0x3B42BB08,
+        0xFFFFFFFE,
+        0xFF00FFFF,
+        0xEB40FFFF,
+        0x520F200C,  # erase types 1 and 2: 4 KiB with 0x20, 32 KiB with 0x52
+        0x0000D810,  # erase type 3: 64 KiB with 0xD8
+        0x00000000,
+        (pageSize.bit_length() - 1) << 4 | 0x1,  # page size as a power of two
+    ] + [0x00000000] * 9
+
+    return header + parameterHeader + struct.pack("<20I", *dwords)
+
+
+class SPINORFlash:  # pylint: disable=too-many-instance-attributes
+    """
+    A 25-series SPI NOR flash with JEDEC ID, SFDP, status registers, page program, sector,
+    block and chip erase, and unique ID. Programming can only clear bits, as on the real parts,
+    and needs a preceding write enable. Program and erase operations take effect when the
+    transaction ends; the busy bit of the status register stays set for the configured times.
+    MISO reads as zero outside of data phases, as the adapter's input is then pulled low.
+
+    :param csPin: The IO pin used as chip select. If None, every SPI transfer the adapter makes
+        is a transaction of its own, as if chip select were driven by the adapter.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        size=2 * 1024 * 1024,
+        jedecID=b"\xef\x40\x15",
+        pageSize=256,
+        csPin=None,
+        uniqueID=b"\x01\x23\x45\x67\x89\xab\xcd\xef",
+        pageProgramTime=0.0,
+        sectorEraseTime=0.0,
+    ):
+
+        self.size = size
+        self.jedecID = bytes(jedecID)
+        self.pageSize = pageSize
+        self.csPin = csPin
+        self.uniqueID = bytes(uniqueID)
+        self.pageProgramTime = pageProgramTime
+        self.sectorEraseTime = sectorEraseTime
+        self.memory = bytearray(b"\xff" * size)
+        self.sfdp = _sfdpTable(size, pageSize)
+        self.status = [0x00, 0x00, 0x00]
+        self.writeEnabled = False
+
+        self._busyUntil = 0.0
+        self._received = bytearray()
+
+    def _statusRegister(self, index):
+
+        value = self.status[index]
+
+        if index == 0:
+            value = (value & 0xFC) | (0x02 if self.writeEnabled else 0) | (0x01 if self._busy() else 0)
+
+        return value
+
+    def _busy(self):
+
+        return time.monotonic() < self._busyUntil
+
+    def _memoryAt(self, address, count):
+
+        address %= self.size
+        data = self.memory[address : address + count]
+
+        while len(data) < count:
+            data += self.memory[: count - len(data)]
+
+        return data
+
+    def _output(self, offset, count):  # pylint: disable=too-many-return-statements
+
+        received = self._received
+        if not received:
+            return b""
+
+        opcode = received[0]
+
+        def dataPhase(header, source):
+            # The bytes clocked out after a header of command, address and dummy bytes.
+            start = max(offset, header)
+            if start >= offset + count:
+                return b""
+            return bytes(start - offset) + source(start - header, offset + count - start)
+
+        def address():
+            return int.from_bytes(bytes(received[1:4]).ljust(3, b"\0"), "big")
+
+        if opcode == 0x9F:
+            return dataPhase(1, lambda index, n: _padded(self.jedecID, index, n))
+        if opcode in (0x05, 0x35, 0x15):
+            statusIndex = {0x05: 0, 0x35: 1, 0x15: 2}[opcode]
+            return dataPhase(1, lambda index, n: bytes([self._statusRegister(statusIndex)]) * n)
+        if opcode == 0x03:
+            return dataPhase(4, lambda index, n: self._memoryAt(address() + index, n))
+        if opcode == 0x0B:
+            return dataPhase(5, lambda index, n: self._memoryAt(address() + index, n))
+        if opcode == 0x5A:
+            return dataPhase(5, lambda index, n: _padded(self.sfdp, address() + index, n))
+        if opcode == 0x4B:
+            return dataPhase(5, lambda index, n: _padded(self.uniqueID, index, n))
+        if opcode == 0x90:
+            identifier = bytes([self.jedecID[0], self.jedecID[-1] - 1])
+            return dataPhase(4, lambda index, n: bytes(identifier[(index + i) % 2] for i in range(n)))
+
+        return b""
+
+    def select(self):
+
+        self._received = bytearray()
+
+    def exchange(self, data):
+        """ Clocks data in during the current transaction; returns the bytes clocked out. """
+
+        offset = len(self._received)
+        self._received += data
+
+        output = bytearray(len(data))
+        produced = self._output(offset, len(data))
+        output[: len(produced)] = produced
+
+        if offset == 0 and data:
+            opcode = self._received[0]
+
+            if opcode == 0x06:
+                self.writeEnabled = True
+            elif opcode == 0x04:
+                self.writeEnabled = False
+
+        return bytes(output)
+
+    def deselect(self):
+
+        received = self._received
+        self._received = bytearray()
+
+        if not received or self._busy():
+            return
+
+        opcode = received[0]
+        address = int.from_bytes(bytes(received[1:4]).ljust(3, b"\0"), "big") % self.size
+
+        if opcode in (0x66, 0x99):
+            self.writeEnabled = False
+            return
+
+        if not self.writeEnabled or opcode not in (0x02, 0x20, 0x52, 0xD8, 0xC7, 0x60, 0x01):
+            return
+
+        if opcode == 0x02:
+            pageStart = address - address % self.pageSize
+
+            for index, value in enumerate(received[4:]):
+                location = pageStart + (address - pageStart + index) % self.pageSize
+                self.memory[location] &= value
+
+            self._busyUntil = time.monotonic() + self.pageProgramTime
+        elif opcode == 0x01:
+            for index, value in enumerate(received[1:4]):
+                self.status[index] = value
+        else:
+            eraseSize = {0x20: 4096, 0x52: 32768, 0xD8: 65536}.get(opcode, self.size)
+            start = address - address % eraseSize
+            self.memory[start : start + eraseSize] = b"\xff" * eraseSize
+            self._busyUntil = time.monotonic() + self.sectorEraseTime * max(1, eraseSize // 4096)
+
+        self.writeEnabled = False
+
+
+def crc8(data):
+    """ The Dallas/Maxim CRC-8 used in 1-Wire ROM codes. """
+
+    crc = 0
+
+    for byte in data:
+        for _ in range(8):
+            mix = (crc ^ byte) & 0x01
+            crc >>= 1
+            if mix:
+                crc ^= 0x8C
+            byte >>= 1
+
+    return crc
+
+
+class OneWireDevice:
+    """
+    A 1-Wire slave with a 64-bit ROM code and a scratchpad, answering the ROM commands (READ
+    ROM, MATCH ROM, SKIP ROM) and the usual READ SCRATCHPAD (0xBE) and WRITE SCRATCHPAD (0x4E)
+    function commands. Other function commands read back the scratchpad.
+
+    :param rom: The 8-byte ROM code. If omitted, it is built from family and serial, with the CRC.
+    """
+
+    def __init__(self, rom=None, family=0x28, serial=b"\x01\x02\x03\x04\x05\x06", scratchpad=None, alarm=False):
+
+        if rom is None:
+            rom = bytes([family]) + bytes(serial)[:6]
+            rom += bytes([crc8(rom)])
+
+        self.rom = bytes(rom)
+        self.scratchpad = bytearray(scratchpad if scratchpad is not None else b"\x50\x05\x4b\x46\x7f\xff\x0c\x10\x1c")
+        self.alarm = alarm
+
+        self._state = "idle"
+        self._received = bytearray()
+        self._readOffset = 0
+
+    def reset(self):
+
+        self._state = "rom"
+        self._received = bytearray()
+
+    def select(self):
+        """ Addressed by MATCH ROM or SKIP ROM: the next byte is a function command. """
+
+        self._state = "function"
+        self._received = bytearray()
+
+    def write(self, data):
+
+        for value in data:
+            self._writeByte(value)
+
+    def _writeByte(self, value):
+
+        self._received.append(value)
+
+        if self._state == "rom":
+            if value == 0x33:
+                self._state = "readrom"
+                self._readOffset = 0
+            elif value == 0xCC:
+                self.select()
+            elif value == 0x55:
+                self._state = "match"
+                self._received = bytearray()
+            else:
+                self._state = "idle"
+        elif self._state == "match":
+            if len(self._received) == 8:
+                if bytes(self._received) == self.rom:
+                    self.select()
+                else:
+                    self._state = "idle"
+        elif self._state == "function":
+            self._state = "writescratchpad" if value == 0x4E else "readscratchpad"
+            self._readOffset = 0
+            self._received = bytearray()
+        elif self._state == "writescratchpad":
+            index = len(self._received) + 1
+            if index < len(self.scratchpad):
+                self.scratchpad[index] = value
+
+    def read(self, count):
+        """ Returns the bytes the device sends; an idle bus reads as ones. """
+
+        if self._state == "readrom":
+            source = self.rom
+        elif self._state == "readscratchpad":
+            source = bytes(self.scratchpad)
+        else:
+            return None
+
+        data = (source[self._readOffset :] + b"\xff" * count)[:count]
+        self._readOffset += count
+
+        return data
@@ -0,0 +1,749 @@
+import binascii
+
+# Command handlers answer each setting with a return of its own.
+# pylint: disable=too-many-return-statements
+
+# Operating modes accepted by +MODE, and the command prefixes that need each of them.
+MODES = ("IO", "I2C", "SPI", "UART", "1WIRE", "SWI")
+PROTOCOL_MODES = {"I2C0": "I2C", "SPI0": "SPI", "UART0": "UART", "1WIRE0": "1WIRE", "SWI0": "SWI"}
+
+IO_PINS = 5
+IO_MODES = ("DIN", "DOUT", "AIN", "AOUT", "PWM")
+IO_INTERRUPT_MODES = ("NONE", "RISE", "FALL", "CHANGE")
+
+BUFFER_SIZE = 256
+DEFAULT_ESCAPE_SEQUENCE = "+++UART0"
+
+OK = "-OK"
+NG = "-NG"
+
+
+def _number(text):
+
+    return int(text, 0)
+
+
+class _Pin:
+    def __init__(self):
+
+        self.mode = "DIN"
+        self.value = 0
+        self.pwmFrequency = 10000
+        self.interrupt = "NONE"
+
+
+class NovaProtocol:  # pylint: disable=too-many-instance-attributes, too-many-public-methods
+    """
+    The command interpreter of the simulated Nova: executes one command line of the ASCII
+    protocol against the simulated adapter state and its peripherals, and returns the response
+    line along with the time the bus operation would take on hardware.
+
+    Interrupts raised while executing commands (or by the test harness through the simulator)
+    are queued in the interrupts list for the transport to send.
+    """
+
+    def __init__(self, deviceID, firmwareVersion, hardwareVersion, enforceModes=True):
+
+        self.deviceID = deviceID
+        self.firmwareVersion = firmwareVersion
+        self.hardwareVersion = hardwareVersion
+        self.commandVersion = "1"
+        self.enforceModes = enforceModes
+
+        self.mode = "IO"
+        self.base = 10
+        self.led = None
+        self.pins = [_Pin() for _ in range(IO_PINS)]
+        self.buffers = [bytearray() for _ in range(8)]
+        self.interrupts = []
+
+        self.i2cPeripherals = {}
+        self.i2cClock = 400000
+        self.i2cPullups = False
+        self.i2cAddressBits = 7
+        self.i2cTransaction = None
+        self.i2cSlaveAddress = 0
+        self.i2cSlaveMode = "USEPTR"
+        self.i2cRegisters = bytearray(256)
+        self.i2cReadMasks = bytearray(b"\xff" * 256)
+        self.i2cWriteMasks = bytearray(b"\xff" * 256)
+        self.i2cRegisterCount = 256
+        self.i2cPointer = 0
+
+        self.spiPeripherals = []
+        self.spiClock = 2000000
+        self.spiOrder = "MSBFIRST"
+        self.spiMode = 0
+        self.spiBits = 8
+        self.spiActive = False
+        self.spiAutoCS = None
+
+        self.oneWireDevices = []
+        self.oneWirePin = None
+        self.oneWireAddress = None
+        self.oneWireSearch = []
+
+        self.uartBaud = 115200
+        self.uartEscape = DEFAULT_ESCAPE_SEQUENCE
+        self.bridgeActive = False
+
+    # Peripherals
+
+    def attach(self, peripheral):
+        """ Connects a peripheral from binho.sim.peripherals (or any object with the same interface). """
+
+        if hasattr(peripheral, "rom"):
+            self.oneWireDevices.append(peripheral)
+        elif hasattr(peripheral, "exchange"):
+            self.spiPeripherals.append(peripheral)
+        else:
+            self.i2cPeripherals[peripheral.address] = peripheral
+
+    # Inputs driven by the test harness
+
+    def drivePin(self, pin, value):
+        """ Drives an input pin as an external circuit would, raising its interrupt if configured. """
+
+        state = self.pins[pin]
+        previous = state.value
+        state.value = value
+
+        edge = None
+        if value > previous:
+            edge = "RISE"
+        elif value < previous:
+            edge = "FALL"
+
+        if edge is not None and state.interrupt in (edge, "CHANGE"):
+            self.interrupts.append(f"!IO{pin}")
+
+    def controllerWriteI2C(self, data):
+        """ Writes to the adapter in I2C peripheral mode, as an external controller would. """
+
+        if not data:
+            return
+
+        if self.i2cSlaveMode == "USEPTR":
+            self.i2cPointer = data[0] % self.i2cRegisterCount
+            data = data[1:]
+
+        for value in data:
+            mask = self.i2cWriteMasks[self.i2cPointer]
+            old = self.i2cRegisters[self.i2cPointer]
+            self.i2cRegisters[self.i2cPointer] = (old & ~mask) | (value & mask)
+            self.i2cPointer = (self.i2cPointer + 1) % self.i2cRegisterCount
+
+        self.interrupts.append("!I2C0 SLAVE RX")
+
+    def controllerReadI2C(self, count):
+        """ Reads from the adapter in I2C peripheral mode, as an external controller would. """
+
+        data = bytearray()
+
+        for _ in range(count):
+            data.append(self.i2cRegisters[self.i2cPointer] & self.i2cReadMasks[self.i2cPointer])
+            self.i2cPointer = (self.i2cPointer + 1) % self.i2cRegisterCount
+
+        self.interrupts.append("!I2C0 SLAVE RQ")
+
+        return bytes(data)
+
+    # Command execution
+
+    def execute(self, line):
+        """
+        Executes one command line.
+
+        :return: The response line (without newline), and the simulated bus time in seconds.
+        :rtype: Tuple[str, float]
+        """
+
+        tokens = line.split()
+
+        if not tokens:
+            return NG, 0.0
+
+        target = tokens[0].upper()
+        args = tokens[1:]
+
+        try:
+            if target.startswith("+"):
+                return self._core(target, args), 0.0
+
+            if self.enforceModes and PROTOCOL_MODES.get(target, self.mode) != self.mode:
+                return NG, 0.0
+
+            if target.startswith("IO") and target[2:].isdigit():
+                return self._io(int(target[2:]), args), 0.0
+            if target == "I2C0":
+                return self._i2c(args)
+            if target == "SPI0":
+                return self._spi(args)
+            if target == "1WIRE0":
+                return self._oneWire(args)
+            if target.startswith("BUF") and target[3:].isdigit():
+                return self._buffer(int(target[3:]), args), 0.0
+            if target == "UART0":
+                return self._uart(args), 0.0
+        except (IndexError, ValueError, KeyError):
+            pass
+
+        return NG, 0.0
+
+    def _formatByte(self, value):
+
+        if self.base == 16:
+            return "0x%02X" % value
+        if self.base == 2:
+            return "0b" + format(value, "08b")
+
+        return str(value)
+
+    def _core(self, command, args):
+
+        query = not args or args[-1] == "?"
+
+        if command == "+ID":
+            return "-ID " + self.deviceID
+        if command == "+FWVER":
+            return "-FWVER " + self.firmwareVersion
+        if command == "+HWVER":
+            return "-HWVER " + self.hardwareVersion
+        if command == "+CMDVER":
+            return "-CMDVER " + self.commandVersion
+        if command in ("+PING", "+RESET", "+BTLDR"):
+            return OK
+        if command == "+MODE":
+            if query:
+                return "-MODE 0 " + self.mode
+            if args[1] not in MODES:
+                return NG
+            self._changeMode(args[1])
+            return OK
+        if command == "+BASE":
+            if query:
+                return "-BASE " + str(self.base)
+            if int(args[0]) not in (2, 10, 16):
+                return NG
+            self.base = int(args[0])
+            return OK
+        if command == "+LED":
+            self.led = " ".join(args)
+            return OK
+
+        return NG
+
+    def _changeMode(self, mode):
+
+        if mode != self.mode:
+            self.spiActive = False
+            self.spiAutoCS = None
+            self.i2cTransaction = None
+            self.i2cSlaveAddress = 0
+
+        self.mode = mode
+
+    def _io(self, pin, args):
+
+        state = self.pins[pin]
+        name = f"-IO{pin}"
+        setting, value = args[0], args[1]
+
+        if setting == "MODE":
+            if value == "?":
+                return f"{name} MODE {state.mode}"
+            if value not in IO_MODES:
+                return NG
+            state.mode = value
+            return OK
+
+        if setting == "VALUE":
+            if value == "?":
+                return f"{name} VALUE {state.value}"
+            if state.mode in ("DIN", "AIN"):
+                return NG
+            if state.mode == "DOUT":
+                level = {"HIGH": 1, "LOW": 0}.get(value.upper())
+                self._setOutput(pin, _number(value) if level is None else level)
+            else:
+                state.value = _number(value)
+            return OK
+
+        if setting == "PWMFREQ":
+            if value == "?":
+                return f"{name} PWMFREQ {state.pwmFrequency}"
+            state.pwmFrequency = _number(value)
+            return OK
+
+        if setting == "INT":
+            if value == "?":
+                return f"{name} INT {state.interrupt}"
+            if value not in IO_INTERRUPT_MODES:
+                return NG
+            state.interrupt = value
+            return OK
+
+        if setting == "TOGGLE":
+            if state.mode != "DOUT":
+                return NG
+            return OK
+
+        return NG
+
+    def _setOutput(self, pin, value):
+
+        value = 1 if value else 0
+        previous = self.pins[pin].value
+        self.pins[pin].value = value
+
+        # Chip select lines driven through GPIO frame the transactions of the peripherals on them.
+        if value != previous:
+            for peripheral in self.spiPeripherals:
+                if peripheral.csPin == pin:
+                    if value == 0:
+                        peripheral.select()
+                    else:
+                        peripheral.deselect()
+
+    # I2C
+
+    def _i2cTime(self, count):
+
+        # Address byte plus data bytes, 9 clocks each.
+        return (count + 1) * 9 / self.i2cClock
+
+    def _i2cWrite(self, address, data):
+
+        peripheral = self.i2cPeripherals.get(address)
+
+        return peripheral is not None and peripheral.write(bytes(data))
+
+    def _i2cRead(self, address, count):
+
+        peripheral = self.i2cPeripherals.get(address)
+
+        if peripheral is None:
+            return None
+
+        return peripheral.read(count)
+
+    def _i2c(self, args):  # pylint: disable=too-many-branches
+
+        setting = args[0]
+        query = args[-1] == "?"
+
+        if setting == "CLK":
+            if query:
+                return f"-I2C0 CLK {self.i2cClock}", 0.0
+            self.i2cClock = _number(args[1])
+            return OK, 0.0
+
+        if setting == "PULL":
+            if query:
+                return "-I2C0 PULL " + ("ENABLED" if self.i2cPullups else "DISABLED"), 0.0
+            self.i2cPullups = bool(_number(args[1]))
+            return OK, 0.0
+
+        if setting == "ADDR":
+            if query:
+                return f"-I2C0 ADDR {self.i2cAddressBits}BIT", 0.0
+            self.i2cAddressBits = _number(args[1])
+            return OK, 0.0
+
+        if setting == "SCAN":
+            address = _number(args[1])
+            found = self._i2cWrite(address, b"")
+            return "-I2C0 SCAN 0x%02X %s" % (address, "OK" if found else "NONE"), self._i2cTime(0)
+
+        if setting == "WHR":
+            address, _, readCount, writeCount = (_number(arg) for arg in args[1:5])
+            data = binascii.unhexlify(args[5])[:writeCount] if writeCount else b""
+
+            if writeCount and not self._i2cWrite(address, data):
+                return NG, self._i2cTime(0)
+
+            if readCount == 0:
+                return OK, self._i2cTime(writeCount)
+
+            received = self._i2cRead(address, readCount)
+            if received is None:
+                return NG, self._i2cTime(writeCount)
+
+            return "-I2C0 RXD " + received.hex(), self._i2cTime(writeCount) + self._i2cTime(readCount)
+
+        if setting == "REQ":
+            address, count = _number(args[1]), _number(args[2])
+            received = self._i2cRead(address, count)
+            if received is None:
+                return NG, self._i2cTime(0)
+            return "-I2C0 RXD " + received.hex(), self._i2cTime(count)
+
+        if setting == "START":
+            self.i2cTransaction = (_number(args[1]), bytearray())
+            return OK, 0.0
+
+        if setting == "WRITE":
+            if len(args) > 2:
+                data = [_number(arg) for arg in args[2:]]
+                acknowledged = self._i2cWrite(_number(args[1]), data)
+                return (OK if acknowledged else NG), self._i2cTime(len(data))
+            if self.i2cTransaction is None:
+                return NG, 0.0
+            self.i2cTransaction[1].append(_number(args[1]))
+            return OK, 0.0
+
+        if setting == "END":
+            if self.i2cTransaction is None:
+                return NG, 0.0
+            address, data = self.i2cTransaction
+            self.i2cTransaction = None
+            return (OK if self._i2cWrite(address, data) else NG), self._i2cTime(len(data))
+
+        if setting == "SLAVE":
+            return self._i2cSlave(args[1:]), 0.0
+
+        return NG, 0.0
+
+    def _i2cSlave(self, args):
+
+        setting = args[0]
+
+        if setting == "?":
+            return "-I2C0 SLAVE 0x%02X" % self.i2cSlaveAddress
+
+        if setting in ("REG", "READMASK", "WRITEMASK"):
+            table = {"REG": self.i2cRegisters, "READMASK": self.i2cReadMasks, "WRITEMASK": self.i2cWriteMasks}[setting]
+
+            if args[1].upper() == "PTR":
+                if args[2] == "?":
+                    return "-I2C0 SLAVE REG PTR 0x%02X" % self.i2cPointer
+                if _number(args[2]) >= self.i2cRegisterCount:
+                    return NG
+                self.i2cPointer = _number(args[2])
+                return OK
+
+            register = _number(args[1])
+            if register >= self.i2cRegisterCount:
+                return NG
+            if args[2] == "?":
+                return "-I2C0 SLAVE %s 0x%02X 0x%02X" % (setting, register, table[register])
+            table[register] = _number(args[2])
+            return OK
+
+        if setting == "MODE":
+            if args[1] == "?":
+                return "-I2C0 SLAVE MODE " + self.i2cSlaveMode
+            self.i2cSlaveMode = args[1]
+            return OK
+
+        if setting == "REGCNT":
+            if args[1] == "?":
+                return "-I2C0 SLAVE REGCNT 0x%02X" % self.i2cRegisterCount
+            self.i2cRegisterCount = _number(args[1])
+            return OK
+
+        if setting == "BANK":
+            if args[1] == "?":
+                return "-I2C0 SLAVE BANK " + self.i2cRegisters[: self.i2cRegisterCount].hex()
+            data = binascii.unhexlify(args[1])
+            self.i2cRegisters[: len(data)] = data
+            return OK
+
+        self.i2cSlaveAddress = _number(setting)
+        return OK
+
+    # SPI
+
+    def _spiTime(self, count):
+
+        return count * self.spiBits / self.spiClock
+
+    def _spiExchange(self, data):
+
+        # Peripherals on a GPIO chip select are selected while their pin is low; those on the
+        # automatic chip select, or without a chip select, see each transfer as one transaction.
+        # MISO is pulled low when nobody drives it.
+        autoPin = self.spiAutoCS[0] if self.spiAutoCS is not None else None
+        result = bytearray(len(data))
+
+        for peripheral in self.spiPeripherals:
+            framed = peripheral.csPin is None or peripheral.csPin == autoPin
+
+            if not framed and (self.pins[peripheral.csPin].mode != "DOUT" or self.pins[peripheral.csPin].value != 0):
+                continue
+
+            if framed:
+                peripheral.select()
+
+            received = peripheral.exchange(bytes(data))
+
+            if framed:
+                peripheral.deselect()
+
+            for index, value in enumerate(received):
+                result[index] |= value
+
+        return bytes(result)
+
+    def _spi(self, args):  # pylint: disable=too-many-branches
+
+        setting = args[0]
+        query = args[-1] == "?"
+
+        if setting == "CLK":
+            if query:
+                return f"-SPI0 CLK {self.spiClock}", 0.0
+            self.spiClock = _number(args[1])
+            return OK, 0.0
+
+        if setting == "ORDER":
+            if query:
+                return "-SPI0 ORDER " + self.spiOrder, 0.0
+            if args[1] not in ("MSBFIRST", "LSBFIRST"):
+                return NG, 0.0
+            self.spiOrder = args[1]
+            return OK, 0.0
+
+        if setting == "MODE":
+            if query:
+                return f"-SPI0 MODE {self.spiMode}", 0.0
+            if _number(args[1]) not in (0, 1, 2, 3):
+                return NG, 0.0
+            self.spiMode = _number(args[1])
+            return OK, 0.0
+
+        if setting == "TXBITS":
+            if query:
+                return f"-SPI0 TXBITS {self.spiBits}", 0.0
+            if _number(args[1]) not in (8, 16):
+                return NG, 0.0
+            self.spiBits = _number(args[1])
+            return OK, 0.0
+
+        if setting == "BEGIN":
+            self.spiActive = True
+            return OK, 0.0
+
+        if setting == "END":
+            self.spiActive = False
+            return OK, 0.0
+
+        if setting == "TXRX":
+            received = self._spiExchange(bytes([_number(args[1])]))
+            return "-SPI0 RXD " + received.hex(), self._spiTime(1)
+
+        if setting == "WHR":
+            writeOnly, count = _number(args[1]), _number(args[2])
+            data = binascii.unhexlify(args[3]) if count else b""
+            data = (data + b"\xff" * count)[:count]
+
+            received = self._spiExchange(data)
+
+            if writeOnly:
+                return OK, self._spiTime(count)
+            return "-SPI0 RXD " + received.hex(), self._spiTime(count)
+
+        if setting == "WHRCS":
+            if args[1] == "DISABLE":
+                self.spiAutoCS = None
+            else:
+                self.spiAutoCS = tuple(_number(arg) for arg in args[1:5])
+            return OK, 0.0
+
+        return NG, 0.0
+
+    # 1-Wire
+
+    def _oneWireReset(self):
+
+        for device in self.oneWireDevices:
+            device.reset()
+
+        return bool(self.oneWireDevices)
+
+    def _oneWireSelect(self):
+
+        self._oneWireReset()
+        for device in self.oneWireDevices:
+            if device.rom == self.oneWireAddress:
+                device.select()
+
+    def _oneWireSkip(self):
+
+        self._oneWireReset()
+        for device in self.oneWireDevices:
+            device.select()
+
+    def _oneWireWrite(self, data):
+
+        for device in self.oneWireDevices:
+            device.write(data)
+
+    def _oneWireRead(self, count):
+
+        result = bytearray(b"\xff" * count)
+
+        for device in self.oneWireDevices:
+            data = device.read(count)
+            if data is not None:
+                for index, value in enumerate(data):
+                    result[index] &= value
+
+        return bytes(result)
+
+    def _oneWire(self, args):  # pylint: disable=too-many-branches
+
+        # Roughly 70 us per bit in standard speed, and about 1 ms for a reset and presence pulse.
+        setting = args[0]
+
+        if setting == "BEGIN":
+            self.oneWirePin = _number(args[1])
+            return OK, 0.0
+
+        if self.oneWirePin is None:
+            return NG, 0.0
+
+        if setting == "RESET":
+            return (OK if self._oneWireReset() else NG), 0.001
+
+        if setting == "WRITE":
+            self._oneWireWrite(bytes([_number(args[1])]))
+            return OK, 8 * 70e-6
+
+        if setting == "READ":
+            return "-1WIRE0 READ 0x%02X" % self._oneWireRead(1)[0], 8 * 70e-6
+
+        if setting == "SELECT":
+            if self.oneWireAddress is None:
+                return NG, 0.0
+            self._oneWireSelect()
+            return OK, 0.001 + 72 * 70e-6
+
+        if setting == "SKIP":
+            self._oneWireSkip()
+            return OK, 0.001 + 8 * 70e-6
+
+        if setting == "DEPOWER":
+            return OK, 0.0
+
+        if setting == "ADDR":
+            if self.oneWireAddress is None:
+                return NG, 0.0
+            return "-1WIRE0 ADDR " + " ".join("0x%02X" % value for value in self.oneWireAddress), 0.0
+
+        if setting == "SEARCH":
+            return self._oneWireSearch(args[1:])
+
+        if setting == "WHR":
+            command = args[1].split(".")[-1]
+            readCount, writeCount = _number(args[2]), _number(args[3])
+            data = binascii.unhexlify(args[4])[:writeCount] if writeCount else b""
+
+            busTime = 0.0
+            if command == "SELECT":
+                if self.oneWireAddress is None:
+                    return NG, 0.0
+                self._oneWireSelect()
+                busTime += 0.001 + 72 * 70e-6
+            elif command == "SKIP":
+                self._oneWireSkip()
+                busTime += 0.001 + 8 * 70e-6
+
+            self._oneWireWrite(data)
+            busTime += (writeCount + readCount) * 8 * 70e-6
+
+            if readCount == 0:
+                return OK, busTime
+            return "-1WIRE0 RXD " + self._oneWireRead(readCount).hex(), busTime
+
+        return NG, 0.0
+
+    def _oneWireSearch(self, args):
+
+        # Devices are found in ROM code order, one per SEARCH command, like the real search algorithm.
+        if args and args[0] == "RESET":
+            self.oneWireSearch = []
+            self.oneWireAddress = None
+            return OK, 0.0
+
+        candidates = sorted(self.oneWireDevices, key=lambda device: device.rom[::-1])
+
+        if args and args[0] == "COND":
+            candidates = [device for device in candidates if device.alarm]
+        elif args:
+            family = _number(args[0])
+            candidates = [device for device in candidates if device.rom[0] == family]
+
+        remaining = [device for device in candidates if device.rom not in self.oneWireSearch]
+        busTime = 0.001 + 64 * 3 * 70e-6
+
+        if not remaining:
+            self.oneWireSearch = []
+            return NG, busTime
+
+        self.oneWireAddress = remaining[0].rom
+        self.oneWireSearch.append(remaining[0].rom)
+
+        return OK, busTime
+
+    # Buffers
+
+    def _buffer(self, index, args):
+
+        buffer = self.buffers[index]
+        setting = args[0]
+
+        if setting == "CLEAR":
+            buffer.clear()
+            return OK
+
+        if setting == "ADD":
+            if len(buffer) >= BUFFER_SIZE:
+                return NG
+            buffer.append(_number(args[1]) & 0xFF)
+            return OK
+
+        if setting == "WRITE":
+            start = _number(args[1])
+            values = bytes(_number(arg) & 0xFF for arg in args[2:])
+            if start + len(values) > BUFFER_SIZE:
+                return NG
+            if len(buffer) < start + len(values):
+                buffer.extend(bytes(start + len(values) - len(buffer)))
+            buffer[start : start + len(values)] = values
+            return OK
+
+        if setting == "READ":
+            count = _number(args[1])
+            if count > len(buffer):
+                return NG
+            return f"-BUF{index} " + " ".join(self._formatByte(value) for value in buffer[:count])
+
+        return NG
+
+    # UART
+
+    def _uart(self, args):
+
+        setting = args[0]
+
+        if setting == "BAUD":
+            if args[1] == "?":
+                return f"-UART0 BAUD {self.uartBaud}"
+            self.uartBaud = _number(args[1])
+            return OK
+
+        if setting == "ESC":
+            if args[1] == "?":
+                return "-UART0 ESC " + self.uartEscape
+            self.uartEscape = args[1]
+            return OK
+
+        if setting == "BEGIN":
+            self.bridgeActive = True
+            return OK
+
+        if setting in ("DATABITS", "PARITY", "STOPBITS"):
+            return f"-UART0 {setting} {args[1]}" if args[1] == "?" else OK
+
+        return NG
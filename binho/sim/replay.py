@@ -0,0 +1,107 @@
+from binho.comms.comms import RESYNC_MARKERS
+from binho.comms.trace import TraceReader
+
+from .device import SimulatedNova
+
+NG = "-NG"
+
+
+class ReplayProtocol:
+    """
+    Answers commands with the responses recorded in a trace, in the recorded order. Commands
+    that timed out in the recording get no answer. A command other than the one recorded next is
+    answered with "-NG" and counted as a divergence, except for the markers ("+ID", "+FWVER",
+    "+HWVER") the library sends to resynchronise after a timeout, which are answered out of band.
+    """
+
+    def __init__(self, reader, timing=True):
+
+        self.reader = reader
+        self.timing = timing
+        self.position = 0
+        self.divergences = []
+        self.interrupts = []
+        self.bridgeActive = False
+        self.uartEscape = "+++UART0"
+        self.deviceID = ""
+
+        self._serviceTimes = reader.serviceTimes()
+
+        # The answer to each resync marker: the first one recorded, if there is any.
+        self._markerResponses = {}
+
+        for command in reader.commands:
+            for marker, reply in RESYNC_MARKERS:
+                if command.response is not None and command.response.startswith(reply + b" "):
+                    self._markerResponses.setdefault(marker.decode(), command.response.decode("utf-8"))
+
+        for marker, reply in RESYNC_MARKERS:
+            self._markerResponses.setdefault(marker.decode(), reply.decode() + " ")
+
+        self.deviceID = self._markerResponses["+ID"][4:]
+
+        for _, interrupt in reader.orphanInterrupts:
+            self.interrupts.append(interrupt.decode("utf-8"))
+
+    @property
+    def finished(self):
+        """ True once every recorded command has been replayed. """
+
+        return self.position >= len(self.reader.commands)
+
+    def execute(self, line):
+
+        commands = self.reader.commands
+
+        if self.finished or commands[self.position].command.decode("utf-8").strip() != line:
+            if line.split()[0] in self._markerResponses:
+                return self._markerResponses[line.split()[0]], 0.0
+
+            self.divergences.append((self.position, line))
+            return NG, 0.0
+
+        command = commands[self.position]
+        serviceTime = self._serviceTimes[self.position] if self.timing else 0.0
+        self.position += 1
+
+        for _, interrupt in command.interrupts:
+            self.interrupts.append(interrupt.decode("utf-8"))
+
+        if command.timedOut:
+            return None, serviceTime
+
+        return command.response.decode("utf-8"), serviceTime
+
+
+class TraceReplayer(SimulatedNova):
+    """
+    Plays a trace recorded with binhoComms.startTrace() back as a fake device, so that a
+    recorded session can be reproduced offline, e.g. ``binhoHostAdapter(port=replayer.port)``.
+
+    With timing enabled, every response is delayed by the time the device took to produce it in
+    the recording, so that slowdowns are reproduced along with the traffic. UART bridge data is
+    not part of traces, and is not replayed.
+
+    :param trace: A TraceReader, or the path of a trace file.
+    """
+
+    def __init__(self, trace, timing=True, **kwargs):
+
+        if not isinstance(trace, TraceReader):
+            trace = TraceReader(trace)
+
+        protocol = ReplayProtocol(trace, timing)
+
+        super().__init__(deviceID=protocol.deviceID or "0x00000000", busTiming=timing, **kwargs)
+        self.protocol = protocol
+
+    @property
+    def divergences(self):
+        """ The (position, command) pairs of the commands that didn't match the recording. """
+
+        return self.protocol.divergences
+
+    @property
+    def finished(self):
+
+        return self.protocol.finished
@@ -26,6 +26,7 @@ from . import binhoHostAdapter
 from .errors import DeviceNotFoundError
 
 
+from .comms.hotplug import DeviceMonitor
 from .comms.manager import binhoDeviceManager
 
 
@@ -517,11 +518,13 @@ class binhoArgumentParser(argparse.ArgumentParser):
         """ Connects to the Binho host adapter specified by the user's command line arguments. """
 
         device = None
+        monitor = None
         args = self.parse_args()
 
         # Loop until we have a device.
         # Conditions where we should abort are presented below.
         while device is None:
+            attempted = time.monotonic()
             try:
                 device = self._find_binhoHostAdapter(args)
 
@@ -550,7 +553,14 @@ class binhoArgumentParser(argparse.ArgumentParser):
                         print("No Binho host adapter found!", file=sys.stderr)
                     sys.exit(errno.ENODEV)
                 else:
-                    time.sleep(1)
+                    # Sleep until an adapter is plugged in, rather than polling for one.
+                    if monitor is None:
+                        monitor = DeviceMonitor(probe=False)
+                        monitor.start()
+                    monitor.wait("add", timeout=1, since=attempted)
+
+        if monitor is not None:
+            monitor.stop()
 
         return device
 
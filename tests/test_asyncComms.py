@@ -0,0 +1,20 @@
+import asyncio
+
+from binho.comms.asyncComms import AsyncBinhoComms
+from binho.comms.comms import ERROR_RESPONSE
+from binho.sim import SimulatedNova
+
+
+def test_late_response_is_not_handed_to_the_next_command():
+
+    async def exchange(port):
+        async with AsyncBinhoComms(port) as comms:
+            timedOut = await comms.waitResponse(await comms.submitCommand("+FWVER ?"), timeout=0.05)
+            hardwareVersion = await comms.execute("+HWVER ?", timeout=2.0)
+            return timedOut, hardwareVersion
+
+    with SimulatedNova(hardwareVersion="1.0", commandLatency={"+FWVER": 0.3}) as sim:
+        timedOut, hardwareVersion = asyncio.run(exchange(sim.port))
+
+    assert timedOut == ERROR_RESPONSE
+    assert hardwareVersion == "-HWVER 1.0"